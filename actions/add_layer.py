@@ -19,6 +19,7 @@ from qgis.PyQt.QtWidgets import QTabWidget
 import os
 from random import randrange
 from .. import utils_giswater
+from ..dao.ewkb import ewkb_to_wkb
 
 
 class AddLayer(object):
@@ -297,27 +298,11 @@ class AddLayer(object):
         # Enter editing mode
         virtual_layer.startEditing()
         if counter > 0:
-            for key, value in list(data[layer_type]['values'][0].items()):
-                # add columns
-                if str(key) != 'the_geom':
-                    prov.addAttributes([QgsField(str(key), QVariant.String)])
-
-        # Add features
-        for item in data[layer_type]['values']:
-            attributes = []
-            fet = QgsFeature()
-
-            for k, v in list(item.items()):
-                if str(k) != 'the_geom':
-                    attributes.append(v)
-                if str(k) in 'the_geom':
-                    sql = f"SELECT St_AsText('{v}')"
-                    row = self.controller.get_row(sql, log_sql=False)
-                    if row and row[0]:
-                        geometry = QgsGeometry.fromWkt(str(row[0]))
-                        fet.setGeometry(geometry)
-            fet.setAttributes(attributes)
-            prov.addFeatures([fet])
+            fields, features = self.get_vlayer_features(data[layer_type]['values'])
+            prov.addAttributes(fields)
+            virtual_layer.updateFields()
+            # Add all features at once
+            prov.addFeatures(features)
 
         # Commit changes
         virtual_layer.commitChanges()
@@ -330,6 +315,77 @@ class AddLayer(object):
         my_group.insertLayer(0, virtual_layer)
 
 
+    def get_vlayer_features(self, values):
+        """ Return fields and features of a memory layer from the rows of a JSON response
+        :param values: List of dicts (column name: value). Geometry is hex EWKB in column 'the_geom'
+        :return: Tuple (list of QgsField, list of QgsFeature)
+        """
+
+        fields = []
+        if not values:
+            return fields, []
+
+        field_names = [str(key) for key in values[0] if str(key) != 'the_geom']
+        for field_name in field_names:
+            field_type = self.get_field_type([item.get(field_name) for item in values])
+            fields.append(QgsField(field_name, field_type))
+
+        features = []
+        for item in values:
+            fet = QgsFeature()
+            attributes = []
+            for field in fields:
+                value = item.get(field.name())
+                if value is not None and field.type() == QVariant.String and not isinstance(value, str):
+                    value = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+                attributes.append(value)
+            fet.setAttributes(attributes)
+            geometry = self.get_geometry_from_ewkb(item.get('the_geom'))
+            if geometry is not None:
+                fet.setGeometry(geometry)
+            features.append(fet)
+
+        return fields, features
+
+
+    def get_field_type(self, values):
+        """ Return type (QVariant) of field that fits all @values of a JSON column. Default is String """
+
+        types = set(type(value) for value in values if value is not None)
+        if not types:
+            return QVariant.String
+        if types == {bool}:
+            return QVariant.Bool
+        if types == {int}:
+            if all(-2 ** 31 <= value < 2 ** 31 for value in values if value is not None):
+                return QVariant.Int
+            return QVariant.LongLong
+        if types <= {int, float}:
+            return QVariant.Double
+
+        return QVariant.String
+
+
+    def get_geometry_from_ewkb(self, value):
+        """ Return QgsGeometry from hex EWKB @value, decoded locally.
+        Values that can not be decoded (ie: WKT or unsupported types) are converted in the database """
+
+        if value in (None, ''):
+            return None
+
+        try:
+            return QgsGeometry.fromWkb(ewkb_to_wkb(str(value)))
+        except ValueError:
+            pass
+
+        sql = f"SELECT St_AsText('{value}')"
+        row = self.controller.get_row(sql, log_sql=False)
+        if row and row[0]:
+            return QgsGeometry.fromWkt(str(row[0]))
+
+        return None
+
+
     def delete_layer_from_toc(self, layer_name):
         """ Delete layer from toc if exist
          :param layer_name: Name's layer (string)
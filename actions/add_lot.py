@@ -8,7 +8,7 @@ or (at your option) any later version.
 from qgis.core import QgsPointXY
 from qgis.PyQt.QtCore import QStringListModel
 
-from qgis.PyQt.QtCore import QDate, QSortFilterProxyModel, Qt, QDateTime
+from qgis.PyQt.QtCore import QDate, QSortFilterProxyModel, Qt
 from qgis.PyQt.QtGui import QColor, QStandardItem, QStandardItemModel
 from qgis.PyQt.QtSql import QSqlTableModel
 from qgis.PyQt.QtWidgets import QAbstractItemView, QAction, QCheckBox, QComboBox, QCompleter, QFileDialog, QHBoxLayout
@@ -16,16 +16,17 @@ from qgis.PyQt.QtWidgets import QLineEdit, QTableView, QToolButton, QWidget, QDa
 from qgis.core import QgsFeatureRequest, QgsGeometry
 from qgis.gui import QgsRubberBand
 
-import csv
 import os
 import re
 from functools import partial
+from time import perf_counter
 import urllib.parse
 import webbrowser
 
 from .. import utils_giswater
 from .manage_visit import ManageVisit
 from .parent_manage import ParentManage
+from .table_model import ComboItemDelegate, LazyTableModel
 from ..ui_manager import AddLot
 from ..ui_manager import BasicTable
 from ..ui_manager import LotManagement
@@ -33,6 +34,10 @@ from ..ui_manager import Multirow_selector
 from ..ui_manager import UserManagement
 
 
+# Columns of table relations saved in 'om_visit_lot_x_<feature_type>', besides lot_id and <feature_type>_id
+RELATION_COLUMNS = ('code', 'status', 'observ', 'validate')
+
+
 class AddNewLot(ParentManage):
 
     def __init__(self, iface, settings, controller, plugin_dir):
@@ -55,6 +60,8 @@ class AddNewLot(ParentManage):
         self.remove_ids = False
         self.is_new_lot = is_new
         self.cmb_position = 15  # Variable used to set the position of the QCheckBox in the relations table
+        # Relations as saved in database: (feature_type, {feature_id: values}). Used to save only changes
+        self.relations_snapshot = (None, {})
 
         self.srid = self.controller.plugin_settings_value('srid')
         # Get layers of every geom_type
@@ -232,9 +239,9 @@ class AddNewLot(ParentManage):
         utils_giswater.set_combo_item_select_unselectable(self.dlg_lot.cmb_status, all_index, 0, (1 | 32))
         self.dlg_lot.btn_validate_all.setEnabled(True)
 
-        combo_list = self.dlg_lot.tbl_visit.findChildren(QComboBox)
-        for combo in combo_list:
-            combo.setEnabled(True)
+        model = self.dlg_lot.tbl_visit.model()
+        if isinstance(model, LazyTableModel):
+            model.set_read_only(False)
         self.dlg_lot.btn_delete_visit.setEnabled(True)
 
         # Disable options of QComboBox according combo selection
@@ -245,8 +252,8 @@ class AddNewLot(ParentManage):
         elif value in [6]:
             utils_giswater.set_combo_item_select_unselectable(self.dlg_lot.cmb_status, ['1', '2', '3', '4', '7'], 0)
             self.dlg_lot.btn_validate_all.setEnabled(False)
-            for combo in combo_list:
-                combo.setEnabled(False)
+            if isinstance(model, LazyTableModel):
+                model.set_read_only(True)
             self.dlg_lot.btn_delete_visit.setEnabled(False)
         self.disbale_actions(value)
 
@@ -288,13 +295,25 @@ class AddNewLot(ParentManage):
 
 
     def validate_all(self, qtable):
-        """ Set all QComboBox with validated option """
+        """ Set status of all visits with validated option """
 
         model = qtable.model()
+        if not isinstance(model, LazyTableModel):
+            return
+        status_column = model.column_index.get('status')
+        delegate = qtable.itemDelegateForColumn(status_column)
+        if not isinstance(delegate, ComboItemDelegate):
+            return
+
+        values = [elem for elem in delegate.values if str(elem[0]) == '5']
+        if not values:
+            return
+        model.fetch_all()
         for x in range(0, model.rowCount()):
-            index = qtable.model().index(x, self.cmb_position)
-            cmb = qtable.indexWidget(index)
-            utils_giswater.set_combo_itemData(cmb, '5', 0)
+            index = model.index(x, status_column)
+            model.setData(index, values[0][0])
+            if delegate.label_column is not None:
+                model.setData(index.sibling(x, delegate.label_column), values[0][1])
 
 
     def manage_team(self):
@@ -955,10 +974,6 @@ class AddNewLot(ParentManage):
         if visit_class_id == '':
             return
 
-        standard_model = QStandardItemModel()
-        self.dlg_lot.tbl_visit.setModel(standard_model)
-        self.dlg_lot.tbl_visit.horizontalHeader().setStretchLastSection(True)
-
         table_name = utils_giswater.get_item_data(self.dlg_lot, self.dlg_lot.cmb_visit_class, 3)
 
         if table_name is None:
@@ -977,44 +992,49 @@ class AddNewLot(ParentManage):
             expr_filter += f" AND lot_id='{lot_id}'"
 
         columns_name = self.controller.get_columns_list(table_name)
+        if not columns_name:
+            return
 
         # Get headers
         headers = []
         for x in columns_name:
             headers.append(x[0])
 
-        # Set headers to model
-        standard_model.setHorizontalHeaderLabels(headers)
+        # Rows are fetched in batches while the table is scrolled
+        columns = ", ".join(f'"{header}"' for header in headers)
+        sql = (f"SELECT {columns} FROM {table_name}"
+               f" WHERE lot_id ='{lot_id}'"
+               f" AND {expr_filter}")
+        self.close_visit_model()
+        self.visit_model = LazyTableModel(self.controller.dao, headers, sql, 'visit_id', editable_columns=('status', ),
+                                          cursor_name='gw_lot_visit_cursor')
+        self.visit_model.fetch_failed.connect(partial(self.controller.show_warning_detail, "Error reading visits"))
+        self.dlg_lot.tbl_visit.setModel(self.visit_model)
+        self.dlg_lot.tbl_visit.horizontalHeader().setStretchLastSection(True)
+        self.dlg_lot.tbl_visit.setEditTriggers(QAbstractItemView.SelectedClicked | QAbstractItemView.EditKeyPressed)
 
         # Hide columns
         self.set_table_columns(self.dlg_lot, self.dlg_lot.tbl_visit, table_name, isQStandardItemModel=True)
 
-        # Populate model visit
-        sql = (f"SELECT * FROM {table_name}"
-               f" WHERE lot_id ='{lot_id}'"
-               f" AND {expr_filter}")
-        rows = self.controller.get_rows(sql, commit=True)
-
-        if rows is None:
+        # Edit column 'status' with a QComboBox
+        self.visit_status_values = self.get_values_from_catalog('om_typevalue', 'visit_cat_status')
+        status_column = self.visit_model.column_index.get('status')
+        if self.visit_status_values is None or status_column is None:
             return
+        self.visit_model.set_labels('status', self.visit_status_values)
+        label_column = status_column + 1 if status_column + 1 < len(headers) else None
+        delegate = ComboItemDelegate(self.visit_status_values, self.dlg_lot.tbl_visit, label_column)
+        self.dlg_lot.tbl_visit.setItemDelegateForColumn(status_column, delegate)
+        lot_status = utils_giswater.get_item_data(self.dlg_lot, self.dlg_lot.cmb_status, 0)
+        self.visit_model.set_read_only(lot_status == 6)
 
-        for row in rows:
-            item = []
-            for value in row:
-                if value is not None:
-                    if type(value) != unicode:
-                        item.append(QStandardItem(str(value)))
-                    else:
-                        item.append(QStandardItem(value))
-                else:
-                    item.append(QStandardItem(None))
-            if len(row) > 0:
-                standard_model.appendRow(item)
 
-        combo_values = self.get_values_from_catalog('om_typevalue', 'visit_cat_status')
-        if combo_values is None:
-            return
-        self.put_combobox(self.dlg_lot.tbl_visit, rows, 'status', 15, combo_values)
+    def close_visit_model(self):
+        """ Close server-side cursor of the current model of table visits """
+
+        model = self.dlg_lot.tbl_visit.model()
+        if isinstance(model, LazyTableModel):
+            model.close()
 
 
     def put_combobox(self, qtable, rows, field, widget_pos, combo_values):
@@ -1064,6 +1084,9 @@ class AddNewLot(ParentManage):
             if len(row) > 0:
                 standard_model.appendRow(item)
 
+        model_rows = self.read_standaritemmodel(self.tbl_relation)
+        self.relations_snapshot = (feature_type, self.get_relation_values(model_rows, feature_type))
+
 
     def set_lot_headers(self):
 
@@ -1145,67 +1168,135 @@ class AddNewLot(ParentManage):
             self.manage_rejected()
 
 
-    def save_relations(self, lot, lot_id):
+    def get_relation_values(self, model_rows, feature_type):
+        """ Return dict {feature_id: tuple of values of RELATION_COLUMNS} of @model_rows """
+
+        id_column = f"{feature_type}_id"
+        relations = {}
+        for item in model_rows:
+            feature_id = item.get(id_column)
+            if feature_id in ('', None):
+                continue
+            relations[feature_id] = tuple(item.get(column) for column in RELATION_COLUMNS)
+
+        return relations
 
-        # Manage relations
-        sql = (f"DELETE FROM om_visit_lot_x_{lot['feature_type']} "
-               f"WHERE lot_id = '{lot_id}'; \n")
 
+    def save_relations(self, lot, lot_id):
+        """ Save differences between table relations and its values in database: bulk INSERT of new rows,
+        UPDATE FROM VALUES of modified rows and DELETE of removed ones, in one transaction """
+
+        feature_type = lot['feature_type']
+        table_name = f"om_visit_lot_x_{feature_type}"
+        id_column = f"{feature_type}_id"
         model_rows = self.read_standaritemmodel(self.tbl_relation)
 
         if model_rows is None:
             return
 
-        # Save relations
-        for item in model_rows:
-            keys = "lot_id, "
-            values = f"$${lot_id}$$, "
-            for key, value in list(item.items()):
-                if key in (lot['feature_type']+'_id', 'code', 'status', 'observ', 'validate'):
-                    if value not in('', None):
-                        keys += f"{key}, "
-                        # if type(value) in (int, bool):
-                        #     values += f"$$"+str(value)+"$$, "
-                        # else:
-                        #     values += "$$" + value + "$$, "
-                        values += f"$${value}$$, "
-            keys = keys[:-2]
-            values = values[:-2]
-            sql += (f"INSERT INTO om_visit_lot_x_{lot['feature_type']}({keys}) "
-                    f"VALUES ({values}); \n")
-        status = self.controller.execute_sql(sql)
-        return status
+        start = perf_counter()
+        current = self.get_relation_values(model_rows, feature_type)
+        snapshot_type, snapshot = self.relations_snapshot
+        if snapshot_type != feature_type:
+            # Rows of this table have not been loaded: replace all of them
+            snapshot = None
+
+        if snapshot is None:
+            inserted = list(current)
+            updated = []
+            deleted = None
+        else:
+            inserted = [feature_id for feature_id in current if feature_id not in snapshot]
+            updated = [feature_id for feature_id, values in current.items()
+                       if feature_id in snapshot and values != snapshot[feature_id]]
+            deleted = [feature_id for feature_id in snapshot if feature_id not in current]
+            if not inserted and not updated and not deleted:
+                return True
+
+        types = self.controller.get_column_types(table_name)
+        columns = (id_column, ) + RELATION_COLUMNS
+        dao = self.controller.dao
+        status = True
+        if snapshot is None:
+            sql = f"DELETE FROM {table_name} WHERE lot_id = '{lot_id}'"
+            status = dao.execute_sql(sql, commit=False)
+        elif deleted:
+            sql = (f"DELETE FROM {table_name} WHERE lot_id = '{lot_id}' "
+                   f"AND {id_column} = ANY(%s::{types.get(id_column, 'text')}[])")
+            status = dao.execute_sql(dao.mogrify(sql, (deleted, )), commit=False)
+
+        # New rows. Empty values are not inserted, so they get default value of its column
+        groups = {}
+        for feature_id in inserted:
+            values = dict(zip(RELATION_COLUMNS, current[feature_id]))
+            values[id_column] = feature_id
+            fields = tuple(column for column in columns if values[column] not in ('', None))
+            groups.setdefault(fields, []).append(tuple(values[column] for column in fields))
+        for fields, argslist in groups.items():
+            if not status:
+                break
+            template = "(%s, " + ", ".join(f"%s::{types.get(column, 'text')}" for column in fields) + ")"
+            sql = f"INSERT INTO {table_name} (lot_id, {', '.join(fields)}) VALUES %s"
+            argslist = [(lot_id, ) + values for values in argslist]
+            status = dao.execute_values(sql, argslist, template, commit=False)
+
+        # Modified rows
+        if status and updated:
+            template = "(" + ", ".join(f"%s::{types.get(column, 'text')}" for column in columns) + ")"
+            sql = (f"UPDATE {table_name} AS t "
+                   f"SET {', '.join(f'{column} = v.{column}' for column in RELATION_COLUMNS)} "
+                   f"FROM (VALUES %s) AS v({', '.join(columns)}) "
+                   f"WHERE t.lot_id = '{lot_id}' AND t.{id_column} = v.{id_column}")
+            argslist = [(feature_id, ) + tuple(None if value == '' else value for value in current[feature_id])
+                        for feature_id in updated]
+            status = dao.execute_values(sql, argslist, template, commit=False)
+
+        if not status:
+            dao.rollback()
+            self.controller.show_warning_detail("Undefined error", str(dao.last_error))
+            return False
+
+        dao.commit()
+        self.relations_snapshot = (feature_type, current)
+        deleted = 'all' if deleted is None else len(deleted)
+        self.controller.log_info(f"Save lot {lot_id} relations: {len(inserted)} inserted, {len(updated)} updated, "
+                                 f"{deleted} deleted in {perf_counter() - start:.3f} s")
+        return True
 
 
     def save_visits(self):
+        """ Save status of visits edited by the user with a single UPDATE FROM VALUES """
 
         # Manage visits
-        status = False
         table_name = utils_giswater.get_item_data(self.dlg_lot, self.dlg_lot.cmb_visit_class, 3)
 
-        model_rows = self.read_standaritemmodel(self.dlg_lot.tbl_visit)
-        if not model_rows:
+        model = self.dlg_lot.tbl_visit.model()
+        if not isinstance(model, LazyTableModel):
             return True
 
-        sql = ""
-        for item in model_rows:
-            visit_id = None
-            status = None
-            for key, value in list(item.items()):
-                if key=="visit_id":
-                    visit_id = str(value)
-                if key == "status":
-                    if value not in('', None):
-                        status = f"$${value}$$ "
+        argslist = []
+        for visit_id, values in model.get_dirty_rows():
+            value = values.get('status')
+            if value not in ('', None):
+                argslist.append((visit_id, value))
+        if not argslist:
+            return True
 
-            if visit_id and status:
-                sql += (f"UPDATE {table_name} "
-                        f"SET (status) = ({status}) "
-                        f"WHERE visit_id = '{visit_id}';\n")
-        if sql != "":
-            status = self.controller.execute_sql(sql)
+        start = perf_counter()
+        types = self.controller.get_column_types(table_name)
+        template = f"(%s::{types.get('visit_id', 'text')}, %s::{types.get('status', 'text')})"
+        sql = (f"UPDATE {table_name} AS t "
+               f"SET status = v.status "
+               f"FROM (VALUES %s) AS v(visit_id, status) "
+               f"WHERE t.visit_id = v.visit_id")
+        dao = self.controller.dao
+        if not dao.execute_values(sql, argslist, template):
+            self.controller.show_warning_detail("Undefined error", str(dao.last_error))
+            return False
 
-        return status
+        model.clear_edits()
+        self.controller.log_info(f"Save lot visits: {len(argslist)} updated in {perf_counter() - start:.3f} s")
+        return True
 
 
     def set_completers(self):
@@ -1272,7 +1363,7 @@ class AddNewLot(ParentManage):
         # Check expression
         (is_valid, expr) = self.check_expression(expr_filter)
         
-        self.select_features_by_ids(feature_type, expr)
+        self.select_features_by_ids(feature_type, expr, [feature_id])
         # self.iface.actionZoomToSelected().trigger()
         self.iface.actionZoomActualSize().trigger()
 
@@ -1300,6 +1391,7 @@ class AddNewLot(ParentManage):
     def manage_rejected(self):
 
         self.disconnect_signal_selection_changed()
+        self.close_visit_model()
         layer = self.iface.activeLayer()
         if layer:
             layer.removeSelection()
@@ -1642,47 +1734,17 @@ class AddNewLot(ParentManage):
             msg = "Select a valid path."
             self.controller.show_info_box(msg, "Info")
             return
-        all_rows = []
-        row = []
-        # Get headers from model
-        for h in range(0, qtable.model().columnCount()):
-            if qtable.model().headerData(h, Qt.Horizontal) not in columns:
-                row.append(str(qtable.model().headerData(h, Qt.Horizontal)))
-        all_rows.append(row)
-
-        # Get all rows from model
-        for r in range(0, qtable.model().rowCount()):
-            row = []
-            for c in range(0, qtable.model().columnCount()):
-                if qtable.model().headerData(c, Qt.Horizontal) not in columns:
-                    value = qtable.model().data(qtable.model().index(r, c))
-                    if str(value) == 'NULL':
-                        value = ''
-                    elif type(value) == QDate or type(value) == QDateTime:
-                        value = value.toString(date_format)
-                    row.append(value)
-            all_rows.append(row)
-
-        # Write list into csv file
-        try:
-            if os.path.exists(csv_path):
-                msg = "Are you sure you want to overwrite this file?"
-                answer = self.controller.ask_question(msg, "Overwrite")
-                if answer:
-                    self.write_to_csv(csv_path, all_rows)
-            else:
-                self.write_to_csv(csv_path, all_rows)
-        except:
-            msg = "File path doesn't exist or you dont have permission or file is opened"
-            self.controller.show_warning(msg)
-            pass
+        if os.path.exists(csv_path):
+            msg = "Are you sure you want to overwrite this file?"
+            answer = self.controller.ask_question(msg, "Overwrite")
+            if not answer:
+                return
+
+        self.export_models_to_csv(csv_path, [qtable.model()], columns, date_format, self.csv_exported)
 
 
-    def write_to_csv(self,  folder_path=None, all_rows=None):
+    def csv_exported(self, total):
 
-        with open(folder_path, "w") as output:
-            writer = csv.writer(output, lineterminator='\n')
-            writer.writerows(all_rows)
         message = "El fitxer csv ha estat exportat correctament"
         self.controller.show_info(message)
 
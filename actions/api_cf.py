@@ -68,12 +68,10 @@ class ApiCF(ApiParent, QObject):
         extras += '"srid":' + str(srid)
         body = self.create_body(extras=extras)
         # Get layers under mouse clicked
-        sql = f"SELECT gw_api_getlayersfromcoordinates($${{{body}}}$$)::text"
-        row = self.controller.get_row(sql, log_sql=True, commit=True)
-        if not row:
-            self.controller.show_message("NOT ROW FOR: " + sql, 2)
+        json_result = self.controller.get_api_json('gw_api_getlayersfromcoordinates', body, log_sql=True)
+        if not json_result:
             return False
-        complet_list = [json.loads(row[0], object_pairs_hook=OrderedDict)]
+        complet_list = [json_result]
 
         # hide QMenu identify if no feature under mouse
         len_layers = len(complet_list[0]['body']['data']['layersNames'])
@@ -236,7 +234,7 @@ class ApiCF(ApiParent, QObject):
             feature = f'"tableName":"{feature_cat.child_layer.lower()}"'
             extras += f', "coordinates":{{{point}}}'
             body = self.create_body(feature=feature, extras=extras)
-            sql = f"SELECT gw_api_getfeatureinsert($${{{body}}}$$)"
+            function_name = 'gw_api_getfeatureinsert'
         # IF click over canvas
         elif point:
             visible_layer = self.get_visible_layers(as_list=True)
@@ -249,46 +247,45 @@ class ApiCF(ApiParent, QObject):
             extras += f', "projecRole":"{self.qgis_project_role}"'
             extras += f', "coordinates":{{"epsg":{self.srid}, "xcoord":{point.x()},"ycoord":{point.y()}, "zoomRatio":{scale_zoom}}}'
             body = self.create_body(extras=extras)
-            sql = f"SELECT gw_api_getinfofromcoordinates($${{{body}}}$$)"
+            function_name = 'gw_api_getinfofromcoordinates'
         # IF come from QPushButtons node1 or node2 from custom form or RightButton
         elif feature_id:
             feature = f'"tableName":"{table_name}", "id":"{feature_id}"'
             body = self.create_body(feature=feature, extras=extras)
-            sql = f"SELECT gw_api_getinfofromid($${{{body}}}$$)"
+            function_name = 'gw_api_getinfofromid'
 
-        row = self.controller.get_row(sql, log_sql=True, commit=True)
-        if not row:
-            self.controller.show_message("NOT ROW FOR: " + sql, 2)
+        json_result = self.controller.get_api_json(function_name, body, log_sql=True)
+        if not json_result:
             return False, None
 
         # When something is wrong
-        if row[0]['message']:
+        if json_result['message']:
             level = 1
-            if 'level' in row[0]['message']:
-                level = int(row[0]['message']['level'])
-            self.controller.show_message(row[0]['message']['text'], level)
+            if 'level' in json_result['message']:
+                level = int(json_result['message']['level'])
+            self.controller.show_message(json_result['message']['text'], level)
             return False, None
 
         # When insert feature failed
-        if row[0]['status'] == "Failed":
-            self.controller.show_message(row[0]['message']['text'], 2)
+        if json_result['status'] == "Failed":
+            self.controller.show_message(json_result['message']['text'], 2)
             return False, None
 
         # Control fail when insert new feature
-        if 'status' in row[0]['body']['data']['fields']:
-            if row[0]['body']['data']['fields']['status'].lower() == 'failed':
-                msg = row[0]['body']['data']['fields']['message']['text']
+        if 'status' in json_result['body']['data']['fields']:
+            if json_result['body']['data']['fields']['status'].lower() == 'failed':
+                msg = json_result['body']['data']['fields']['message']['text']
                 level = 1
-                if 'level' in row[0]['body']['data']['fields']['message']:
-                    level = int(row[0]['body']['data']['fields']['message']['level'])
+                if 'level' in json_result['body']['data']['fields']['message']:
+                    level = int(json_result['body']['data']['fields']['message']['level'])
                 self.controller.show_message(msg, message_level=level)
                 return False, None
 
-        self.complet_result = row
+        self.complet_result = [json_result]
 
-        result = row[0]['body']['data']
+        result = json_result['body']['data']
         if 'fields' not in result:
-            self.controller.show_message("NOT fileds in result FOR: " + sql, 2)
+            self.controller.show_message("NOT fileds in result FOR: " + function_name, 2)
             return False, None
 
         if self.complet_result[0]['body']['form']['template'] == 'GENERIC':
@@ -2313,14 +2310,10 @@ class ApiCF(ApiParent, QObject):
         id_name = complet_result[0]['body']['feature']['idName']
         feature = f'"tableName":"{self.tablename}", "idName":"{id_name}", "id":"{self.feature_id}"'
         body = self.create_body(form, feature,  filter_fields)
-        sql = f"SELECT gw_api_getlist($${{{body}}}$$)::text"
-        row = self.controller.get_row(sql, log_sql=True, commit=True)
-
-        if row is None or row[0] is None:
-            self.controller.show_message("NOT ROW FOR: " + sql, 2)
+        json_result = self.controller.get_api_json('gw_api_getlist', body, log_sql=True)
+        if json_result is None:
             return False
-        # Parse string to order dict into List
-        complet_list = [json.loads(row[0],  object_pairs_hook=OrderedDict)]
+        complet_list = [json_result]
 
         return complet_list
 
@@ -2408,16 +2401,14 @@ class ApiCF(ApiParent, QObject):
             feature += f'"idName":"{self.field_id}", '
             feature += f'"id":"{self.feature_id}"'
             body = self.create_body(form, feature, filter_fields='')
-            sql = f"SELECT gw_api_getinfoplan($${{{body}}}$$)::text"
-            row = self.controller.get_row(sql, log_sql=False, commit=True)
-            if not row:
-                self.controller.show_message("NOT ROW FOR: " + sql, 2)
+            json_result = self.controller.get_api_json('gw_api_getinfoplan', body)
+            if not json_result:
                 return False
 
-            complet_list = [json.loads(row[0], object_pairs_hook=OrderedDict)]
+            complet_list = [json_result]
             result = complet_list[0]['body']['data']
             if 'fields' not in result:
-                self.controller.show_message("No listValues for: " + row[0]['body']['data'], 2)
+                self.controller.show_message("No listValues for: " + str(result), 2)
             else:
                 for field in complet_list[0]['body']['data']['fields']:
                     if field['widgettype'] == 'formDivider':
@@ -2451,12 +2442,11 @@ class ApiCF(ApiParent, QObject):
         body += '"form":{"formName":"new_workcat", "tabName":"data", "editable":"TRUE"}, '
         body += '"feature":{}, '
         body += '"data":{}'
-        sql = f"SELECT gw_api_getcatalog($${{{body}}}$$)::text"
-        row = self.controller.get_row(sql, log_sql=True, commit=True)
-        if not row:
+        json_result = self.controller.get_api_json('gw_api_getcatalog', body, log_sql=True, show_message=False)
+        if not json_result:
             return
 
-        complet_list = [json.loads(row[0], object_pairs_hook=OrderedDict)]
+        complet_list = [json_result]
 
         self.dlg_new_workcat = ApiBasicInfo()
         self.load_settings(self.dlg_new_workcat)
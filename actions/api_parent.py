@@ -669,12 +669,10 @@ class ApiParent(ParentAction):
         extras += f', "textToSearch":"{utils_giswater.getWidgetText(dialog, widget)}"'
         body = self.create_body(extras=extras)
         # Get layers under mouse clicked
-        sql = f"SELECT gw_api_gettypeahead($${{{body}}}$$)::text"
-        row = self.controller.get_row(sql, commit=True)
-        if not row:
-            self.controller.show_message("NOT ROW FOR: " + sql, 2)
+        json_result = self.controller.get_api_json('gw_api_gettypeahead', body)
+        if not json_result:
             return False
-        complet_list = [json.loads(row[0], object_pairs_hook=OrderedDict)]
+        complet_list = [json_result]
         # if 'fields' not in result:
         #     return
         list_items = []
@@ -1636,11 +1634,10 @@ class ApiParent(ParentAction):
         main_tab = dialog.findChild(QTabWidget, 'main_tab')
         extras = f'"selector_type":{selector_type}'
         body = self.create_body(extras=extras)
-        sql = ("SELECT gw_api_getselectors($${" + body + "}$$)::text")
-        row = self.controller.get_row(sql, commit=True, log_sql=True)
-        if not row:
+        json_result = self.controller.get_api_json('gw_api_getselectors', body, log_sql=True, show_message=False)
+        if not json_result:
             return
-        complet_result = [json.loads(row[0], object_pairs_hook=OrderedDict)]
+        complet_result = [json_result]
         for form_tab in complet_result[0]['body']['form']['formTabs']:
             # Create one tab for each form_tab and add to QTabWidget
             tab_widget = QWidget(main_tab)
@@ -1681,8 +1678,8 @@ class ApiParent(ParentAction):
         extras += f'"result_name":"{widget.objectName()}", '
         extras += f'"result_value":"{widget.isChecked()}"'
         body = self.create_body(extras=extras)
-        sql = ("SELECT gw_api_setselectors($${" + body + "}$$)::text")
-        row = self.controller.get_row(sql, log_sql=True, commit=True)
-        complet_result = json.loads(row[0], object_pairs_hook=OrderedDict)
+        complet_result = self.controller.get_api_json('gw_api_setselectors', body, log_sql=True)
+        if not complet_result:
+            return
         for layer_name in complet_result['body']['data']['indexingLayers'][selector_type]:
             self.controller.indexing_spatial_layer(layer_name)
@@ -16,7 +16,6 @@ from qgis.PyQt.QtSql import QSqlTableModel
 from qgis.PyQt.QtWidgets import QAbstractItemView, QComboBox, QCompleter, QFileDialog, QGridLayout, QLabel, QLineEdit
 from qgis.PyQt.QtWidgets import QSizePolicy, QSpacerItem, QTableView, QTabWidget, QWidget
 
-import csv
 import json
 import operator
 import os
@@ -546,55 +545,23 @@ class ApiSearch(ApiParent):
             return
         if folder_path.find('.csv') == -1:
             folder_path += '.csv'
-        if qtable_1:
-            model_1 = qtable_1.model()
-        else:
+        if qtable_1 is None:
             return
-        if qtable_2:
-            model_2 = qtable_2.model()
-
-        # Convert qtable values into list
-        all_rows = []
-        headers = []
-        for i in range(0, model_1.columnCount()):
-            headers.append(str(model_1.headerData(i, Qt.Horizontal)))
-        all_rows.append(headers)
-        for rows in range(0, model_1.rowCount()):
-            row = []
-            for col in range(0, model_1.columnCount()):
-                row.append(str(model_1.data(model_1.index(rows, col))))
-            all_rows.append(row)
+        models = [qtable_1.model()]
         if qtable_2 is not None:
-            headers = []
-            for i in range(0, model_2.columnCount()):
-                headers.append(str(model_2.headerData(i, Qt.Horizontal)))
-            all_rows.append(headers)
-            for rows in range(0, model_2.rowCount()):
-                row = []
-                for col in range(0, model_2.columnCount()):
-                    row.append(str(model_2.data(model_2.index(rows, col))))
-                all_rows.append(row)
-
-        # Write list into csv file
-        try:
-            if os.path.exists(folder_path):
-                msg = "Are you sure you want to overwrite this file?"
-                answer = self.controller.ask_question(msg, "Overwrite")
-                if answer:
-                    self.write_to_csv(dialog, folder_path, all_rows)
-            else:
-                self.write_to_csv(dialog, folder_path, all_rows)
-        except:
-            msg = "File path doesn't exist or you dont have permission or file is opened"
-            self.controller.show_warning(msg)
-            pass
+            models.append(qtable_2.model())
+
+        if os.path.exists(folder_path):
+            msg = "Are you sure you want to overwrite this file?"
+            answer = self.controller.ask_question(msg, "Overwrite")
+            if not answer:
+                return
+
+        self.export_models_to_csv(folder_path, models, on_finished=partial(self.csv_exported, dialog))
 
 
-    def write_to_csv(self, dialog, folder_path=None, all_rows=None):
+    def csv_exported(self, dialog, total):
 
-        with open(folder_path, "w") as output:
-            writer = csv.writer(output, lineterminator='\n')
-            writer.writerows(all_rows)
         self.controller.plugin_settings_set_value("search_csv_path", utils_giswater.getWidgetText(dialog, 'txt_path'))
         message = "Values has been updated"
         self.controller.show_info(message)
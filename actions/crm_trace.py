@@ -5,8 +5,8 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
-from qgis.core import QgsProject, QgsFeature, QgsGeometry, QgsVectorLayer, QgsField
-from qgis.PyQt.QtCore import Qt, QVariant
+from qgis.core import QgsProject, QgsVectorLayer
+from qgis.PyQt.QtCore import Qt
 
 import json
 import os
@@ -238,28 +238,11 @@ class CrmTrace(ApiParent):
         # Enter editing mode
         data_provider = virtual_layer.dataProvider()
         virtual_layer.startEditing()
-        columns = data[layer_type]['values'][0]
-        for key, value in list(columns.items()):
-            # add columns
-            if str(key) != 'the_geom':
-                data_provider.addAttributes([QgsField(str(key), QVariant.String)])
-
-        # Add features
-        for item in data[layer_type]['values']:
-            attributes = []
-            fet = QgsFeature()
-            for k, v in list(item.items()):
-                if str(k) != 'the_geom':
-                    attributes.append(v)
-                if str(k) in 'the_geom':
-                    sql = f"SELECT St_AsText('{v}')"
-                    row = self.controller.get_row(sql, log_sql=False)
-                    if row:
-                        wkt = str(row[0])
-                        geometry = QgsGeometry.fromWkt(wkt)
-                        fet.setGeometry(geometry)
-            fet.setAttributes(attributes)
-            data_provider.addFeatures([fet])
+        fields, features = self.add_layer.get_vlayer_features(data[layer_type]['values'])
+        data_provider.addAttributes(fields)
+        virtual_layer.updateFields()
+        # Add all features at once
+        data_provider.addFeatures(features)
 
         # Commit changes
         virtual_layer.commitChanges()
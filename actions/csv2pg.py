@@ -0,0 +1,252 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+import io
+import os
+import re
+
+
+# Numbers glued by a negative sign, ie: 12.50-3.25
+RE_GLUED_NUMBERS = re.compile(r'[0-9][-]\d{1,2}[.]]*')
+# Columns overlapped one against other, ie: 0.00859373.7500
+RE_OVERLAPPED = re.compile(r'(\d\..*\.\d)')
+RE_TIME = re.compile(r'^([012]?[0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]$')
+RE_INP_SEPARATOR = re.compile(r'[ \t]')
+
+# INP sections whose lines are imported as a single field
+INP_RAW_SECTIONS = ('[TRANSECTS]', '[CONTROLS]', '[RULES]')
+# INP sections whose lines are imported as key and value
+INP_KEY_VALUE_SECTIONS = ('[EVAPORATION]', '[TEMPERATURE]')
+INP_DISCARDED_TOKENS = ('', ';', '; ')
+
+# Tabs appended to every INP field according to its length (fields of 20 or more characters get none)
+INP_FIELD_WIDTH = 20
+INP_FIELD_PADDING = tuple("\t" * (5 - length // 4) for length in range(INP_FIELD_WIDTH))
+
+# Characters that must be escaped in COPY text format
+COPY_ESCAPE = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+COPY_NULL = '\\N'
+
+
+class RptFormatError(Exception):
+    """ Raised when the RPT file can not be imported """
+
+    def __init__(self, line_number, fields):
+        self.line_number = line_number
+        self.fields = fields
+        super().__init__(f"Error near line {line_number} -> {fields}")
+
+
+class Csv2PgCopyWriter(object):
+    """ Buffer rows of table temp_csv2pg and send them in bounded chunks through COPY FROM STDIN """
+
+    def __init__(self, dao, csv2pgcat_id, fixed_columns=('source', ), chunk_size=5000, tablename='temp_csv2pg'):
+        """
+        :param dao: PgDao used to execute COPY (its transaction is not committed here)
+        :param fixed_columns: Columns filled before 'csv1..csvN' in every row
+        """
+
+        self.dao = dao
+        self.csv2pgcat_id = str(csv2pgcat_id)
+        self.fixed_columns = list(fixed_columns)
+        self.chunk_size = chunk_size
+        self.tablename = tablename
+        self.rows = []
+        self.max_fields = 0
+        self.total = 0
+        self.last_error = None
+
+
+    def add_row(self, fields, fixed_values=()):
+        """ Add row to the current chunk. Flush it when it is full. Return False if COPY failed """
+
+        self.rows.append((fixed_values, fields))
+        if len(fields) > self.max_fields:
+            self.max_fields = len(fields)
+        if len(self.rows) >= self.chunk_size:
+            return self.flush()
+
+        return True
+
+
+    def flush(self):
+        """ Send buffered rows to the database """
+
+        if not self.rows:
+            return True
+
+        num_fields = self.max_fields
+        columns = ['csv2pgcat_id'] + self.fixed_columns + [f"csv{x + 1}" for x in range(num_fields)]
+        buffer = io.StringIO()
+        for fixed_values, fields in self.rows:
+            values = [self.csv2pgcat_id]
+            values.extend(copy_value(value) for value in fixed_values)
+            values.extend(copy_value(value) for value in fields)
+            values.extend([COPY_NULL] * (num_fields - len(fields)))
+            buffer.write('\t'.join(values))
+            buffer.write('\n')
+
+        buffer.seek(0)
+        sql = f"COPY {self.tablename} ({', '.join(columns)}) FROM STDIN"
+        error = self.dao.copy_expert(sql, buffer)
+        if error:
+            self.last_error = error
+            return False
+
+        self.total += len(self.rows)
+        self.rows = []
+        self.max_fields = 0
+        return True
+
+
+def copy_value(value):
+    """ Format @value for COPY text format """
+
+    if value is None or value == '':
+        return COPY_NULL
+    return str(value).translate(COPY_ESCAPE)
+
+
+def format_inp_line(row):
+    """ Format @row (csv1..csvN values) as a line of INP file """
+
+    parts = []
+    for value in row:
+        if value is None:
+            continue
+        value = str(value)
+        parts.append(value)
+        if len(value) < INP_FIELD_WIDTH:
+            parts.append(INP_FIELD_PADDING[len(value)])
+
+    return "".join(parts).rstrip() + "\n"
+
+
+def write_inp_file(path, rows, task=None, check_every=1000, buffer_size=1024 * 1024):
+    """ Write @rows into INP file @path through a buffered writer. Return number of lines written or None
+    if @task has been cancelled """
+
+    total = 0
+    with open(path, "w", buffering=buffer_size) as _file:
+        for total, row in enumerate(rows, 1):
+            _file.write(format_inp_line(row))
+            if task is not None and total % check_every == 0 and task.isCanceled():
+                return None
+
+    return total
+
+
+def iter_lines(path, task=None, check_every=1000):
+    """ Generator over lines of file @path, reporting progress and stopping if @task is cancelled """
+
+    file_size = os.path.getsize(path) or 1
+    read_size = 0
+    with open(path, "r") as _file:
+        for line_number, line in enumerate(_file, 1):
+            read_size += len(line)
+            if task is not None and line_number % check_every == 0:
+                if task.isCanceled():
+                    return
+                task.setProgress(min(100, read_size * 100 / file_size))
+            yield line_number, line
+
+
+def get_rpt_sources(rows):
+    """ Create dict {target: tablename} from rows of table 'sys_csv2pg_config' """
+
+    sources = {}
+    for row in rows:
+        targets = row[1].replace('{', '').replace('}', '')
+        for target in targets.split(','):
+            sources[target.strip()] = row[0].strip()
+
+    return sources
+
+
+def split_rpt_line(line, line_number):
+    """ Split RPT @line into fields, separating numbers glued by negative sign """
+
+    fields = []
+    tokens = [token for token in line.rstrip().split(' ') if token != '']
+    for token in tokens:
+        if RE_GLUED_NUMBERS.search(token):
+            last_index = 0
+            for i, c in enumerate(token):
+                if c == '-':
+                    fields.append(token[last_index:i])
+                    last_index = i
+            fields.append(token[last_index:])
+        elif RE_OVERLAPPED.search(token):
+            if 'Version' not in tokens and 'VERSION' not in tokens:
+                raise RptFormatError(line_number, tokens)
+        else:
+            fields.append(token)
+
+    return fields
+
+
+def iter_rpt_rows(path, sources, task=None):
+    """ Generator over rows of RPT file @path. Yield tuples (source, csv40, fields).
+    Source and csv40 keep their last value until a new section header is found
+    :param sources: Dict {target: tablename} (see get_rpt_sources)
+    :raises RptFormatError: When columns of the file are overlapped
+    """
+
+    source = None
+    csv40 = None
+    for line_number, line in iter_lines(path, task):
+        if '**' in line or '--' in line:
+            continue
+
+        fields = split_rpt_line(line, line_number)
+        if not fields:
+            continue
+
+        # Find section header and set source column
+        if len(fields) > 1:
+            tablename = sources.get(f'{fields[0]} {fields[1]}')
+            if tablename is None:
+                tablename = sources.get(fields[0])
+            if tablename is not None:
+                source = tablename
+                if len(fields) > 3 and RE_TIME.search(fields[3]):
+                    csv40 = fields[3]
+
+        yield source, csv40, fields
+
+
+def split_inp_line(line, section):
+    """ Split INP @line of @section into fields. Every field is stripped, as values are stored without
+    the padding used to align columns """
+
+    if section in INP_RAW_SECTIONS:
+        return [line.strip()]
+    if section in INP_KEY_VALUE_SECTIONS:
+        return [token.strip() for token in RE_INP_SEPARATOR.split(line, 1)]
+    if line[0] == ';':
+        tokens = [line]
+    else:
+        tokens = RE_INP_SEPARATOR.split(line)
+
+    return [token.strip() for token in tokens
+            if token not in INP_DISCARDED_TOKENS and '**' not in token and '--' not in token]
+
+
+def iter_inp_rows(path, task=None):
+    """ Generator over rows of INP file @path. Yield tuples (section, fields) """
+
+    section = ""
+    for line_number, line in iter_lines(path, task):
+        line = line.rstrip()
+        if len(line) == 0:
+            continue
+        if line[0] == '[':
+            section = line
+
+        fields = split_inp_line(line, section)
+        if fields:
+            yield section, fields
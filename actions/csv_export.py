@@ -0,0 +1,167 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.PyQt.QtCore import QDate, QDateTime, QModelIndex, Qt
+from qgis.PyQt.QtSql import QSqlQueryModel
+
+import csv
+
+from .table_model import LazyTableModel
+
+
+class CsvExportCanceled(Exception):
+    """ Raised inside COPY to stop it when the export task is cancelled """
+    pass
+
+
+class CopyProgressWriter(object):
+    """ Binary file wrapper used as destination of COPY TO STDOUT. It counts lines written to report progress
+    and stops COPY (raising CsvExportCanceled) if @task is cancelled """
+
+    def __init__(self, _file, total_lines=0, task=None):
+
+        self.file = _file
+        self.total_lines = total_lines or 1
+        self.lines = 0
+        self.task = task
+
+
+    def write(self, data):
+
+        if self.task is not None:
+            if self.task.isCanceled():
+                raise CsvExportCanceled()
+            self.lines += data.count(b'\n')
+            self.task.setProgress(min(100, self.lines * 100 / self.total_lines))
+        return self.file.write(data)
+
+
+def get_model_sql(model):
+    """ Return query of SQL backed @model, or None if its data must be read from the model itself """
+
+    if isinstance(model, LazyTableModel):
+        # Edited values are only in the model
+        if model.edits:
+            return None
+        return get_labeled_sql(model)
+    if isinstance(model, QSqlQueryModel):
+        sql = model.query().lastQuery()
+        return sql.rstrip().rstrip(';') or None
+
+    return None
+
+
+def quote_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def get_labeled_sql(model):
+    """ Return query of LazyTableModel @model replacing values of columns with labels by them, as the model
+    shows them, so exported content does not depend on the path used to export it """
+
+    sql = model.get_sql()
+    if not model.labels:
+        return sql
+
+    fields = []
+    for i, name in enumerate(model.columns):
+        labels = model.labels.get(i)
+        if labels:
+            cases = " ".join(f"WHEN {quote_literal(value)} THEN {quote_literal(label)}"
+                             for value, label in labels.items())
+            fields.append(f'CASE t."{name}"::text {cases} ELSE t."{name}"::text END AS "{name}"')
+        else:
+            fields.append(f't."{name}"')
+
+    return f"SELECT {', '.join(fields)} FROM ({sql}) AS t"
+
+
+def get_model_columns(model, excluded=()):
+    """ Return list of tuples (column index, field name, header) of @model, skipping headers in @excluded """
+
+    columns = []
+    for i in range(0, model.columnCount()):
+        header = model.headerData(i, Qt.Horizontal)
+        if header in excluded:
+            continue
+        if isinstance(model, LazyTableModel):
+            field_name = model.columns[i]
+        elif isinstance(model, QSqlQueryModel):
+            field_name = model.record().fieldName(i)
+        else:
+            field_name = None
+        columns.append((i, field_name, str(header)))
+
+    return columns
+
+
+def get_copy_sql(sql, columns):
+    """ Return COPY statement writing @columns of query @sql as CSV with headers """
+
+    fields = ", ".join(f'"{field_name}" AS "{header}"' for i, field_name, header in columns)
+    return f"COPY (SELECT {fields} FROM ({sql}) AS t) TO STDOUT WITH (FORMAT csv, HEADER)"
+
+
+def iter_model_rows(model, columns, date_format='yyyy-MM-dd'):
+    """ Generator over rows of @model (only @columns), as lists of values ready to be written into CSV """
+
+    data = model.data
+    index = model.index
+    for r in range(0, model.rowCount()):
+        row = []
+        for c, field_name, header in columns:
+            value = data(index(r, c))
+            if value is None or str(value) == 'NULL':
+                value = ''
+            elif type(value) == QDate or type(value) == QDateTime:
+                value = value.toString(date_format)
+            row.append(value)
+        yield row
+
+
+def write_models_csv(path, models, excluded=(), date_format='yyyy-MM-dd'):
+    """ Write rows of @models into CSV file @path walking them (Qt models must be read from main thread).
+    Rows not fetched yet by lazy models are fetched first. Return number of rows written """
+
+    total = 0
+    with open(path, "w") as output:
+        writer = csv.writer(output, lineterminator='\n')
+        for model in models:
+            while model.canFetchMore(QModelIndex()):
+                model.fetchMore(QModelIndex())
+            columns = get_model_columns(model, excluded)
+            writer.writerow([header for i, field_name, header in columns])
+            for row in iter_model_rows(model, columns, date_format):
+                writer.writerow(row)
+                total += 1
+
+    return total
+
+
+def copy_queries_csv(dao, path, queries, task=None):
+    """ Write result of @queries (list of tuples (sql, columns)) into CSV file @path with COPY TO STDOUT.
+    :return: Number of rows written, or None if it failed (see dao.last_error) or @task was cancelled
+    """
+
+    total = 0
+    for sql, columns in queries:
+        row = dao.get_row(f"SELECT count(*) FROM ({sql}) AS t")
+        if row is None:
+            return None
+        total += row[0]
+
+    with open(path, "wb") as output:
+        writer = CopyProgressWriter(output, total + len(queries), task)
+        for sql, columns in queries:
+            error = dao.copy_expert(get_copy_sql(sql, columns), writer)
+            if error:
+                dao.last_error = None if isinstance(error, CsvExportCanceled) else error
+                dao.rollback()
+                return None
+
+    return total
+
@@ -7,7 +7,7 @@ or (at your option) any later version.
 # -*- coding: utf-8 -*-
 
 
-from qgis.core import Qgis, QgsApplication
+from qgis.core import Qgis, QgsApplication, QgsTask
 from qgis.PyQt.QtCore import QDate, QStringListModel, QTime,  Qt
 from qgis.PyQt.QtWidgets import QAbstractItemView, QWidget, QCheckBox, QDateEdit, QTimeEdit, QComboBox, QCompleter, \
     QFileDialog, QMessageBox
@@ -15,7 +15,6 @@ from qgis.PyQt.QtWidgets import QAbstractItemView, QWidget, QCheckBox, QDateEdit
 import csv
 import json
 import os
-import re
 import subprocess
 import sys
 
@@ -25,6 +24,7 @@ from functools import partial
 from .. import utils_giswater
 from .api_go2epa_options import Go2EpaOptions
 from .api_parent import ApiParent
+from .csv2pg import Csv2PgCopyWriter, RptFormatError, get_rpt_sources, iter_rpt_rows, write_inp_file
 from .gw_task import GwTask
 from .update_sql import UpdateSQL
 from ..ui_manager import EpaResultCompareSelector, EpaResultManager, FileManager, HydrologySelector, Multirow_selector
@@ -106,6 +106,9 @@ class Go2Epa(ApiParent):
 
         self.counter = self.iterations
         self.imports_canceled = True
+        if getattr(self, 'task_rpt_to_db', None) and self.task_rpt_to_db.status() in \
+                (QgsTask.Queued, QgsTask.OnHold, QgsTask.Running):
+            self.task_rpt_to_db.cancel()
 
 
     def active_recurrent(self, state):
@@ -443,138 +446,169 @@ class Go2Epa(ApiParent):
         utils_giswater.setWidgetText(self.dlg_go2epa, self.dlg_go2epa.txt_file_rpt, self.file_rpt)
 
 
-    def insert_into_inp(self, folder_path=None, all_rows=None):
+    def insert_into_inp(self, folder_path=None, all_rows=None, task=None):
+        """ Write @all_rows (any iterable, it is consumed only once) into INP file @folder_path """
 
-        progress = 0
-        row_count = sum(1 for rows in all_rows)  # @UnusedVariable
-        file1 = open(folder_path, "w")
-        for row in all_rows:
-            progress += 1
-            line = ""
-            for x in range(0, len(row)):
-                if row[x] is not None:
-                    line += str(row[x])
-                    if len(row[x]) < 4:
-                        line += "\t\t\t\t\t"
-                    elif len(row[x]) < 8:
-                        line += "\t\t\t\t"
-                    elif len(row[x]) < 12:
-                        line += "\t\t\t"
-                    elif len(row[x]) < 16:
-                        line += "\t\t"
-                    elif len(row[x]) < 20:
-                        line += "\t"
+        return write_inp_file(folder_path, all_rows, task)
 
-            line = line.rstrip() + "\n"
-            file1.write(line)
 
-        file1.close()
-        del file1
+    def export_inp(self, folder_path, dao=None, task=None):
+        """ Export records of temp_csv2pg into INP file @folder_path using a server-side cursor.
+        Peak memory does not depend on network size, so it can be used from a background task with its own @dao
+        :return: Number of lines written, None if it failed or False if @task has been cancelled
+        """
+
+        if dao is None:
+            dao = self.controller.dao
+
+        sql = ("SELECT csv1, csv2, csv3, csv4, csv5, csv6, csv7, csv8, csv9, csv10, csv11, csv12, csv13, "
+               "csv14, csv15, csv16, csv17, csv18, csv19, csv20, csv21, csv22, csv23, csv24, csv25 "
+               "FROM temp_csv2pg "
+               "WHERE csv2pgcat_id=10 AND user_name = current_user ORDER BY id")
+        rows = dao.get_rows_iter(sql, itersize=5000, cursor_name='gw_export_inp')
+        total = self.insert_into_inp(folder_path, rows, task)
+        if dao.last_error:
+            dao.rollback()
+            self.controller.last_error = dao.last_error
+            return None
 
+        if total is None:
+            # Cancelled: file is incomplete and nothing has to be committed
+            dao.rollback()
+            return False
 
-    def insert_rpt_into_db(self, folder_path=None):
+        dao.commit()
+        return total
 
-        _file = open(folder_path, "r+")
-        full_file = _file.readlines()
-        progress = 0
 
-        # Create dict with sources
+    def get_rpt_sources(self):
+        """ Create dict with sources of RPT sections """
+
         sql = (f"SELECT tablename, target FROM sys_csv2pg_config "
                f"WHERE pg2csvcat_id = '11';")
         rows = self.controller.get_rows(sql, commit=True)
-        sources = {}
-        for row in rows:
-            aux = row[1].replace('{','').replace('}', '')
-            item = aux.split(',')
-            for i in item:
-                sources[i.strip()]=row[0].strip()
-
-        # While we don't find a match with the source, source and csv40 must be null
-        source = "null"
-        csv40 = "null"
-        sql = ""
-        row_count = sum(1 for rows in full_file)  # @UnusedVariable
-        self.task_rpt_to_db = GwTask('Import RPT to database')
-        QgsApplication.taskManager().addTask(self.task_rpt_to_db)
-        for line_number, row in enumerate(full_file):
-            self.task_rpt_to_db.setProgress((line_number * 100) / row_count)
-            progress += 1
-            if '**' in row or '--' in row:
-                continue
-
-            row = row.rstrip()
-            dirty_list = row.split(' ')
-
-            # Clean unused items
-            for x in range(len(dirty_list) - 1, -1, -1):
-                if dirty_list[x] == '':
-                    dirty_list.pop(x)
-
-            sp_n = []
-            if len(dirty_list) > 0:
-                for x in range(0, len(dirty_list)):
-                    if bool(re.search('[0-9][-]\d{1,2}[.]]*', str(dirty_list[x]))):
-                        last_index = 0
-                        for i, c in enumerate(dirty_list[x]):
-                            if "-" == c:
-                                aux = dirty_list[x][last_index:i]
-                                last_index = i
-                                sp_n.append(aux)
-                        aux = dirty_list[x][last_index:i]
-                        sp_n.append(aux)
-
-                    elif bool(re.search('(\d\..*\.\d)', str(dirty_list[x]))):
-                        # when -> 0.00859373.7500
-                        if 'Version' not in dirty_list and 'VERSION' not in dirty_list:
-                            self.controller.log_info(f"Error near line {line_number+1} -> {dirty_list}")
-                            message = ("The rpt file has a heavy inconsistency. As a result it's not posible to import it. " 
-                                  "Columns are overlaped one againts other, this is a not valid simulation. " 
-                                  "Please ckeck and fix it before continue")
-                            self.controller.show_message(message, 1)
-                            _file.close()
-                            del _file
-                            return False
-                    else:
-                        sp_n.append(dirty_list[x])
-
-            # Find strings into dict and set source column
-            for k, v in sources.items():
-                try:
-                    if k in (f'{sp_n[0]} {sp_n[1]}', f'{sp_n[0]}'):
-                        source = "'" + v + "'"
-                        _time = re.compile('^([012]?[0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]$')
-                        if _time.search(sp_n[3]):
-                            csv40 = "'" + sp_n[3] + "'"
-                except IndexError:
-                    pass
-                except Exception as e:
-                    self.controller.log_info(type(e).__name__)
-
-            if len(sp_n) > 0:
-                sql += f"INSERT INTO temp_csv2pg (csv2pgcat_id, source, csv40, "
-                values = f"VALUES(11, {source}, {csv40}, "
-                for x in range(0, len(sp_n)):
-                    if "''" not in sp_n[x]:
-                        sql += f"csv{x + 1}, "
-                        value = "'" + sp_n[x].strip().replace("\n", "") + "', "
-                        values += value.replace("''", "null")
-                    else:
-                        sql += f"csv{x + 1}, "
-                        values = "VALUES(null, "
-                sql = sql[:-2] + ") "
-                values = values[:-2] + ");\n"
-                sql += values
-            if progress % 500 == 0:
-                self.controller.execute_sql(sql, commit=True)
-                sql = ""
-        if sql != "":
-            self.controller.execute_sql(sql, commit=True)
+        if not rows:
+            return None
+
+        return get_rpt_sources(rows)
+
+
+    def insert_rpt_into_db(self, folder_path, sources, task=None):
+        """ Import RPT file @folder_path into table temp_csv2pg using a dedicated connection.
+        Rows are streamed through COPY in bounded chunks. If @task is set, it is used to report progress
+        and to check for cancellation. Previous records of the user are deleted in the same transaction
+        """
+
+        with self.controller.get_task_dao() as dao:
+            sql = ("DELETE FROM temp_csv2pg "
+                   "WHERE user_name = current_user AND csv2pgcat_id = 11")
+            if not dao.execute_sql(sql, commit=False):
+                self.rpt_error = dao.last_error
+                return False
+
+            writer = Csv2PgCopyWriter(dao, 11, fixed_columns=('source', 'csv40'))
+            try:
+                for source, csv40, fields in iter_rpt_rows(folder_path, sources, task):
+                    if not writer.add_row(fields, (source, csv40)):
+                        break
+                else:
+                    writer.flush()
+            except RptFormatError as e:
+                dao.rollback()
+                self.rpt_error = e
+                return False
+
+            if writer.last_error or (task and task.isCanceled()):
+                dao.rollback()
+                self.rpt_error = writer.last_error
+                return False
+
+            dao.commit()
 
-        _file.close()
-        del _file
         return True
 
 
+    def import_rpt(self, is_iterative, _continue, counter, common_msg):
+        """ Import RPT file as a background task. Function gw_fct_rpt2pg_main is called when it finishes """
+
+        self.rpt_error = None
+        sources = self.get_rpt_sources()
+        if sources is None:
+            self.check_result_id()
+            return
+
+        self.task_rpt_to_db = GwTask('Import RPT to database',
+            function=partial(self.insert_rpt_into_db, self.file_rpt, sources),
+            on_finished=partial(self.import_rpt_finished, is_iterative, _continue, counter, common_msg))
+        QgsApplication.taskManager().addTask(self.task_rpt_to_db)
+
+
+    def import_rpt_finished(self, is_iterative, _continue, counter, common_msg, task, result):
+
+        if not result:
+            self.manage_rpt_error(task)
+            self.check_result_id()
+            return
+
+        message = self.exec_rpt2pg_main(is_iterative, _continue, counter)
+        if message is None:
+            return
+
+        common_msg += "Import RPT finished."
+        if self.imports_canceled is False:
+            self.controller.show_info(common_msg)
+            self.controller.show_info_box(message)
+
+        self.check_result_id()
+
+
+    def manage_rpt_error(self, task=None):
+        """ Show why RPT import was not successful """
+
+        if task is not None and task.exception is not None:
+            self.rpt_error = task.exception
+
+        if isinstance(self.rpt_error, RptFormatError):
+            self.controller.log_info(str(self.rpt_error))
+            message = ("The rpt file has a heavy inconsistency. As a result it's not posible to import it. "
+                       "Columns are overlaped one againts other, this is a not valid simulation. "
+                       "Please ckeck and fix it before continue")
+            self.controller.show_message(message, 1)
+        elif self.rpt_error is not None:
+            self.controller.show_warning_detail("Import RPT failed", str(self.rpt_error))
+        elif task is not None and task.isCanceled():
+            self.controller.show_info("Import RPT canceled")
+
+
+    def exec_rpt2pg_main(self, is_iterative, _continue, counter):
+        """ Call function gw_fct_rpt2pg_main and return its message """
+
+        function_name = 'gw_fct_rpt2pg_main'
+        extras = '"iterative":"disabled"'
+        if is_iterative and _continue:
+            extras = '"iterative":"enabled"'
+        extras += f', "resultId":"{self.result_name}"'
+        extras += f', "currentStep":"{counter}"'
+        extras += f', "continue":"{_continue}"'
+        body = self.create_body(extras=extras)
+        sql = f"SELECT {function_name}($${{{body}}}$$)::text"
+        row = self.controller.get_row(sql, commit=True)
+        if not row or row[0] is None:
+            self.controller.show_warning("NOT ROW FOR: " + sql)
+            message = "Import failed"
+            self.controller.show_info_box(message)
+            return None
+
+        rpt_result = [json.loads(row[0], object_pairs_hook=OrderedDict)]
+        if 'status' in rpt_result[0]:
+            if rpt_result[0]['status'] == "Accepted":
+                if 'body' in rpt_result[0]:
+                    if 'data' in rpt_result[0]['body']:
+                        self.add_temp_layer(self.dlg_go2epa, rpt_result[0]['body']['data'], 'RPT results', True, True, 1, False)
+
+        return rpt_result[0]['message']['text']
+
+
     def show_widgets(self, visible=False):
         self.dlg_go2epa.progressBar.setVisible(visible)
         self.dlg_go2epa.lbl_counter.setVisible(visible)
@@ -667,16 +701,15 @@ class Go2Epa(ApiParent):
                 message = complet_result[0]['message']['text']
 
                 # Get values from temp_csv2pg and insert into INP file
-                sql = ("SELECT csv1, csv2, csv3, csv4, csv5, csv6, csv7, csv8, csv9, csv10, csv11, csv12, csv13, "
-                       "csv14, csv15, csv16, csv17, csv18, csv19, csv20, csv21, csv22, csv23, csv24, csv25 "
-                       "FROM temp_csv2pg "
-                       "WHERE csv2pgcat_id=10 AND user_name = current_user ORDER BY id")
-                rows = self.controller.get_rows(sql, commit=True)
-                if rows is None:
-                    self.controller.show_message("NOT ROW FOR: " + sql, 2)
+                total = self.export_inp(self.file_inp)
+                if total is False:
+                    self.controller.show_info("Export INP cancelled")
+                    return
+                if total is None:
+                    self.controller.show_warning_detail("Export INP failed", str(self.controller.last_error))
                     return
 
-                self.insert_into_inp(self.file_inp, rows)
+                self.controller.log_info(f"Export INP: {total} lines")
                 common_msg += "Export INP finished. "
 
             # Execute epa
@@ -702,41 +735,23 @@ class Go2Epa(ApiParent):
             if import_result is True:
                 if os.path.exists(self.file_rpt):
 
-                    # delete previous values of user on temp table
-                    sql = ("DELETE FROM temp_csv2pg "
-                           "WHERE user_name = current_user AND csv2pgcat_id = 11")
-                    self.controller.execute_sql(sql)
+                    # Last (or single) import is executed in background. Task will finish the process
+                    if not _continue:
+                        self.import_rpt(is_iterative, _continue, counter, common_msg)
+                        return
 
                     # Importing file to temporal table
-                    status = self.insert_rpt_into_db(self.file_rpt)
+                    self.rpt_error = None
+                    sources = self.get_rpt_sources()
+                    status = sources is not None and self.insert_rpt_into_db(self.file_rpt, sources)
                     if not status:
+                        self.manage_rpt_error()
                         self.check_result_id()
                         return
 
-                    # Call function gw_fct_rpt2pg_main
-                    function_name = 'gw_fct_rpt2pg_main'
-                    extras = '"iterative":"disabled"'
-                    if is_iterative and _continue:
-                        extras = '"iterative":"enabled"'
-                    extras += f', "resultId":"{self.result_name}"'
-                    extras += f', "currentStep":"{counter}"'
-                    extras += f', "continue":"{_continue}"'
-                    body = self.create_body(extras=extras)
-                    sql = f"SELECT {function_name}($${{{body}}}$$)::text"
-                    row = self.controller.get_row(sql, commit=True)
-                    if not row or row[0] is None:
-                        self.controller.show_warning("NOT ROW FOR: " + sql)
-                        message = "Import failed"
-                        self.controller.show_info_box(message)
+                    message = self.exec_rpt2pg_main(is_iterative, _continue, counter)
+                    if message is None:
                         return
-                    else:
-                        rpt_result = [json.loads(row[0], object_pairs_hook=OrderedDict)]
-                        if 'status' in rpt_result[0]:
-                            if rpt_result[0]['status'] == "Accepted":
-                                if 'body' in rpt_result[0]:
-                                    if 'data' in rpt_result[0]['body']:
-                                        self.add_temp_layer(self.dlg_go2epa, rpt_result[0]['body']['data'], 'RPT results', True, True, 1, False)
-                        message = rpt_result[0]['message']['text']
 
                     # final message
                     common_msg += "Import RPT finished."
@@ -9,11 +9,23 @@ MESSAGE_CATEGORY = 'giswater'
 class GwTask(QgsTask, QObject):
     """This shows how to subclass QgsTask"""
     fake_progress = pyqtSignal()
-    def __init__(self, description, duration=0):
+    # Text reported by function while it runs (received in the main thread)
+    message = pyqtSignal(str)
+    def __init__(self, description, duration=0, function=None, on_finished=None, on_cancel=None):
+        """
+        :param function: Callable executed in run(), receives this task as its only parameter. Its return value
+                         is stored in self.function_result and the task succeeds if it is truthy
+        :param on_finished: Callable executed in the main thread when the task ends (task, result)
+        :param on_cancel: Callable executed in the main thread when the task is cancelled (task)
+        """
         QObject.__init__(self)
         super().__init__(description, QgsTask.CanCancel)
         self.exception = None
         self.duration = duration
+        self.function = function
+        self.function_result = None
+        self.on_finished = on_finished
+        self.on_cancel = on_cancel
 
 
     def run(self):
@@ -25,6 +37,14 @@ class GwTask(QgsTask, QObject):
         """
 
         QgsMessageLog.logMessage(f'Started task {self.description()}', MESSAGE_CATEGORY, Qgis.Info)
+        if self.function is not None:
+            try:
+                self.function_result = self.function(self)
+            except Exception as e:
+                self.exception = e
+                return False
+            return bool(self.function_result) and not self.isCanceled()
+
         if self.duration is 0:
             if self.isCanceled():
                 return False
@@ -72,9 +92,16 @@ class GwTask(QgsTask, QObject):
             else:
                 QgsMessageLog.logMessage(f'Task {self.description()} Exception: {self.exception}',
                                          MESSAGE_CATEGORY, Qgis.Critical)
-                raise self.exception
+                # Callback is in charge of managing the exception
+                if self.on_finished is None:
+                    raise self.exception
+
+        if self.on_finished is not None:
+            self.on_finished(self, result)
 
 
     def cancel(self):
         QgsMessageLog.logMessage(f'Task {self.description()} was cancelled', MESSAGE_CATEGORY, Qgis.Info)
         super().cancel()
+        if self.on_cancel is not None:
+            self.on_cancel(self)
@@ -5,24 +5,57 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: latin-1 -*-
-from qgis.core import QgsProject
+from qgis.core import QgsApplication, QgsProject
 from qgis.gui import QgsDateTimeEdit
-from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtCore import Qt, QTimer
 from qgis.PyQt.QtGui import QColor, QIcon, QStandardItemModel, QStandardItem
 from qgis.PyQt.QtWidgets import QSpinBox, QDoubleSpinBox, QTextEdit, QWidget, QLabel, QLineEdit, QComboBox, QCheckBox
-from qgis.PyQt.QtWidgets import QGridLayout, QRadioButton, QAbstractItemView, QPushButton
+from qgis.PyQt.QtWidgets import QGridLayout, QRadioButton, QAbstractItemView, QPushButton, QTableWidgetItem
 
 import os
 import json
 from collections import OrderedDict
 from functools import partial
+from time import time
 
 from .. import utils_giswater
 from .add_layer import AddLayer
 from .api_parent import ApiParent
+from .gw_task import GwTask
 from ..ui_manager import ApiDlgToolbox, ApiFunctionTb
 
 
+class ToolboxJob(object):
+    """ Toolbox function executed in a background task. Jobs wait in queue until there is a free slot """
+
+    def __init__(self, dialog, function_name, alias, sql, on_finished):
+        """
+        :param on_finished: Callable executed in the main thread if the function ends successfully (job)
+        """
+
+        self.dialog = dialog
+        self.function_name = function_name
+        self.alias = alias
+        self.sql = sql
+        self.on_finished = on_finished
+        self.status = 'Queued'
+        self.task = None
+        self.dao = None
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+
+    def get_elapsed(self):
+        """ Return seconds running. Jobs that have not started yet return 0 """
+
+        if self.started_at is None:
+            return 0
+        end = self.finished_at if self.finished_at is not None else time()
+        return end - self.started_at
+
+
 class GwToolBox(ApiParent):
 
     def __init__(self, iface, settings, controller, plugin_dir):
@@ -34,6 +67,12 @@ class GwToolBox(ApiParent):
         self.rbt_checked = {}
         self.is_paramtetric = True
         self.no_clickable_items = ['Giswater']
+        self.dlg_toolbox = None
+        # Jobs of current session, newest first
+        self.jobs = []
+        self.job_timer = QTimer()
+        self.job_timer.setInterval(1000)
+        self.job_timer.timeout.connect(self.populate_jobs)
 
 
     def set_project_type(self, project_type):
@@ -52,6 +91,10 @@ class GwToolBox(ApiParent):
         self.iface.addDockWidget(Qt.RightDockWidgetArea, self.dlg_toolbox)
         self.dlg_toolbox.trv.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.dlg_toolbox.trv.setHeaderHidden(True)
+        self.dlg_toolbox.tbl_jobs.horizontalHeader().setStretchLastSection(True)
+        self.dlg_toolbox.btn_cancel_job.clicked.connect(partial(self.cancel_job))
+        self.dlg_toolbox.btn_clear_jobs.clicked.connect(partial(self.clear_jobs))
+        self.populate_jobs()
         extras = '"isToolbox":true'
         body = self.create_body(extras=extras)
         sql = f"SELECT gw_api_gettoolbox($${{{body}}}$$)::text"
@@ -262,10 +305,6 @@ class GwToolBox(ApiParent):
         # If function is not parametrized, call function(old) without json
         if self.is_paramtetric is False:
             self.execute_no_parametric(dialog, function_name)
-            dialog.progressBar.setVisible(False)
-            dialog.progressBar.setMinimum(0)
-            dialog.progressBar.setMaximum(1)
-            dialog.progressBar.setValue(1)
             return
 
         if function[0]['input_params']['featureType']:
@@ -354,8 +393,14 @@ class GwToolBox(ApiParent):
 
         body = self.create_body(feature=feature_field, extras=extras)
         sql = f"SELECT {function_name}($${{{body}}}$$)::text"
-        row = self.controller.get_row(sql, log_sql=True, commit=True)
-        if not row or row[0] in (None, ''):
+        self.add_job(dialog, function_name, sql, partial(self.execute_function_finished, dialog, function_name))
+
+
+    def execute_function_finished(self, dialog, function_name, job):
+        """ Load result of toolbox function executed by @job """
+
+        sql = job.sql
+        if job.result in (None, ''):
             self.controller.show_message(f"Function : {function_name} executed with no result ", 3)
             dialog.progressBar.setVisible(False)
             dialog.progressBar.setMinimum(0)
@@ -363,9 +408,9 @@ class GwToolBox(ApiParent):
             dialog.progressBar.setValue(1)
             return True
 
-        complet_result = [json.loads(row[0], object_pairs_hook=OrderedDict)]
+        complet_result = [json.loads(job.result, object_pairs_hook=OrderedDict)]
 
-        self.add_layer.add_temp_layer(dialog, complet_result[0]['body']['data'], self.alias_function,True, True, 1, True)
+        self.add_layer.add_temp_layer(dialog, complet_result[0]['body']['data'], job.alias, True, True, 1, True)
 
         dialog.progressBar.setFormat(f"Function {function_name} has finished.")
         dialog.progressBar.setAlignment(Qt.AlignCenter)
@@ -404,23 +449,174 @@ class GwToolBox(ApiParent):
         dialog.progressBar.setMinimum(0)
         dialog.progressBar.setFormat(f"Running function: {function_name}")
         dialog.progressBar.setAlignment(Qt.AlignCenter)
-        dialog.progressBar.setFormat("")
 
         sql = f"SELECT {function_name}()::text"
-        row = self.controller.get_row(sql, log_sql=True, commit=True)
+        self.add_job(dialog, function_name, sql, partial(self.execute_no_parametric_finished, dialog, function_name))
 
-        if not row or row[0] is None:
+        return True
+
+
+    def execute_no_parametric_finished(self, dialog, function_name, job):
+
+        dialog.progressBar.setVisible(False)
+        dialog.progressBar.setMinimum(0)
+        dialog.progressBar.setMaximum(1)
+        dialog.progressBar.setValue(1)
+        if job.result is None:
             self.controller.show_message(f"Function : {function_name} executed with no result ", 3)
             return True
 
-        complet_result = [json.loads(row[0], object_pairs_hook=OrderedDict)]
-        self.add_temp_layer(dialog, complet_result[0]['body']['data'], self.alias_function)
+        complet_result = [json.loads(job.result, object_pairs_hook=OrderedDict)]
+        self.add_temp_layer(dialog, complet_result[0]['body']['data'], job.alias)
         dialog.progressBar.setFormat(f"Function {function_name} has finished.")
         dialog.progressBar.setAlignment(Qt.AlignCenter)
 
         return True
 
 
+    def add_job(self, dialog, function_name, sql, on_finished):
+        """ Queue execution of @sql. Result is loaded by @on_finished when it ends """
+
+        self.controller.log_info(sql)
+        job = ToolboxJob(dialog, function_name, self.alias_function, sql, on_finished)
+        self.jobs.insert(0, job)
+        dialog.progressBar.setFormat(f"Waiting in queue: {function_name}")
+        self.start_jobs()
+
+
+    def start_jobs(self):
+        """ Start jobs waiting in queue, in order, while there are free slots """
+
+        max_jobs = self.settings.value('system_variables/toolbox_max_jobs')
+        max_jobs = max(1, int(max_jobs)) if max_jobs else 1
+        running = len([job for job in self.jobs if job.status == 'Running'])
+        for job in reversed(self.jobs):
+            if running >= max_jobs:
+                break
+            if job.status != 'Queued':
+                continue
+
+            job.status = 'Running'
+            job.started_at = time()
+            job.dialog.progressBar.setFormat(f"Running function: {job.function_name}")
+            job.task = GwTask(f"Toolbox: {job.alias}", function=partial(self.run_job, job),
+                              on_finished=partial(self.job_finished, job), on_cancel=partial(self.job_canceled, job))
+            QgsApplication.taskManager().addTask(job.task)
+            running += 1
+
+        if running > 0:
+            self.job_timer.start()
+        else:
+            self.job_timer.stop()
+        self.populate_jobs()
+
+
+    def run_job(self, job, task):
+        """ Execute function of @job with a dedicated connection. Executed by a background task """
+
+        with self.controller.get_task_dao() as dao:
+            job.dao = dao
+            if task.isCanceled():
+                job.dao = None
+                return False
+            row = dao.get_row(job.sql)
+            job.dao = None
+            if dao.last_error is not None:
+                job.error = dao.last_error
+                dao.rollback()
+                return False
+            # Cancel requested before the statement started does not stop it, so check it again
+            if task.isCanceled():
+                dao.rollback()
+                return False
+            dao.commit()
+
+        job.result = row[0] if row else None
+        return True
+
+
+    def job_canceled(self, job, task):
+        """ Cancel statement being executed by @job. Its transaction is rolled back """
+
+        dao = job.dao
+        if dao is not None:
+            dao.cancel()
+
+
+    def job_finished(self, job, task, result):
+
+        job.finished_at = time()
+        if result:
+            job.status = 'Finished'
+        elif task.isCanceled():
+            job.status = 'Cancelled'
+        else:
+            job.status = 'Failed'
+            if task.exception is not None:
+                job.error = task.exception
+
+        self.start_jobs()
+        if job.status == 'Finished':
+            job.on_finished(job)
+            return
+
+        dialog = job.dialog
+        dialog.progressBar.setFormat(f"Function {job.function_name} {job.status.lower()}")
+        dialog.progressBar.setMinimum(0)
+        dialog.progressBar.setMaximum(1)
+        dialog.progressBar.setValue(1)
+        if job.status == 'Failed':
+            self.controller.show_warning(f"Function {job.function_name} failed", parameter=str(job.error))
+
+
+    def cancel_job(self):
+        """ Cancel job selected in jobs table. Jobs waiting in queue are just removed from it """
+
+        row = self.dlg_toolbox.tbl_jobs.currentRow()
+        if row < 0 or row >= len(self.jobs):
+            self.controller.show_warning("Any job selected")
+            return
+
+        job = self.jobs[row]
+        if job.status == 'Running':
+            job.task.cancel()
+        elif job.status == 'Queued':
+            job.status = 'Cancelled'
+            job.dialog.progressBar.setFormat(f"Function {job.function_name} cancelled")
+            job.dialog.progressBar.setMinimum(0)
+            job.dialog.progressBar.setMaximum(1)
+            job.dialog.progressBar.setValue(1)
+            self.populate_jobs()
+
+
+    def clear_jobs(self):
+        """ Remove jobs that are not queued or running from jobs table """
+
+        self.jobs = [job for job in self.jobs if job.status in ('Queued', 'Running')]
+        self.populate_jobs()
+
+
+    def populate_jobs(self):
+        """ Show jobs of current session and its elapsed time """
+
+        if self.dlg_toolbox is None:
+            return
+
+        tbl_jobs = self.dlg_toolbox.tbl_jobs
+        tbl_jobs.setRowCount(len(self.jobs))
+        for row, job in enumerate(self.jobs):
+            elapsed = int(job.get_elapsed())
+            values = (job.alias, job.status, f"{elapsed // 60:02d}:{elapsed % 60:02d}")
+            for column, value in enumerate(values):
+                item = tbl_jobs.item(row, column)
+                if item is None:
+                    tbl_jobs.setItem(row, column, QTableWidgetItem(str(value)))
+                else:
+                    item.setText(str(value))
+            if job.error is not None:
+                tbl_jobs.item(row, 1).setToolTip(str(job.error))
+
+
     def populate_functions_dlg(self, dialog, result):
 
         status = False
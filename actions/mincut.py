@@ -25,6 +25,7 @@ from .gw_task import GwTask
 from .. import utils_giswater
 from .parent import ParentAction
 from .mincut_config import MincutConfig
+from ..dao.address_index import get_address_index
 from .multiple_selection import MultipleSelection
 from ..map_tools.snapping_utils_v3 import SnappingConfigManager
 from ..ui_manager import BasicInfo
@@ -954,17 +955,13 @@ class MincutParent(ParentAction):
         self.reload_table_hydro(expr_filter)
 
 
-    def select_features_group_layers(self, expr):
-        """ Select features of the layers filtering by @expr """
+    def select_features_group_layers(self, expr, ids=None):
+        """ Select features of the layers filtering by @expr, or by @ids of connecs if they are set """
         
         # Iterate over all layers of type 'connec'
         # Select features and them to 'connec_list'
         for layer in self.layers_connec:
-            it = layer.getFeatures(QgsFeatureRequest(expr))
-            # Build a list of feature id's from the previous result
-            id_list = [i.id() for i in it]
-            # Select features with these id's
-            layer.selectByIds(id_list)
+            self.select_connecs(layer, expr, ids)
             if layer.selectedFeatureCount() > 0:
                 # Get selected features of the layer
                 features = layer.selectedFeatures()
@@ -999,7 +996,7 @@ class MincutParent(ParentAction):
                 return     
     
             # Select features of the layers filtering by @expr
-            self.select_features_group_layers(expr)         
+            self.select_features_group_layers(expr, self.connec_list)
                                                         
             # Reload table
             self.reload_table_connec(expr_filter)
@@ -1029,7 +1026,7 @@ class MincutParent(ParentAction):
                 return     
 
             # Select features of the layers filtering by @expr
-            self.select_features_group_layers(expr)
+            self.select_features_group_layers(expr, self.connec_list)
 
 
         #self.hydro_list = []
@@ -1117,10 +1114,7 @@ class MincutParent(ParentAction):
                 
             # Select features with previous filter
             for layer in self.layers_connec:
-                # Build a list of feature id's and select them
-                it = layer.getFeatures(QgsFeatureRequest(expr))
-                id_list = [i.id() for i in it]
-                layer.selectByIds(id_list)
+                self.select_connecs(layer, expr, self.connec_list)
     
         # Reload contents of table 'connec'
         self.reload_table_connec(expr_filter)
@@ -1128,6 +1122,19 @@ class MincutParent(ParentAction):
         self.connect_signal_selection_changed("mincut_connec")   
         
 
+    def select_connecs(self, layer, expr, ids=None):
+        """ Select connecs of @layer with 'connec_id' in @ids using the feature id index.
+        If @ids is not set (or layer has no field 'connec_id'), select features filtering by @expr """
+
+        if ids is not None and self.controller.select_by_business_ids(layer, ids, 'connec_id') is not None:
+            return
+
+        # Build a list of feature id's and select them
+        it = layer.getFeatures(QgsFeatureRequest(expr))
+        id_list = [i.id() for i in it]
+        layer.selectByIds(id_list)
+
+
     def get_connec_id_from_customer_code(self, customer_code):
         """ Get 'connec_id' from @customer_code """
                    
@@ -1273,10 +1280,7 @@ class MincutParent(ParentAction):
 
         # Reload selection
         for layer in self.layers_connec:
-            # Build a list of feature id's and select them
-            it = layer.getFeatures(QgsFeatureRequest(expr))
-            id_list = [i.id() for i in it]
-            layer.selectByIds(id_list)
+            self.select_connecs(layer, expr, self.connec_list)
             
         self.connect_signal_selection_changed("mincut_connec")               
 
@@ -2033,8 +2037,6 @@ class MincutParent(ParentAction):
             self.controller.show_warning(message, parameter=self.params[field_name])
             return    
             
-        it = layer.getFeatures()
-
         if layername == 'street_layer':
 
             # Get 'expl_id'
@@ -2042,41 +2044,51 @@ class MincutParent(ParentAction):
             expl_id = elem[0]
             records = [[-1, '']]
 
-            # Set filter expression
-            expr_filter = f"{self.street_field_expl[0]} = '{expl_id}'"
+            # Streets are read from the address index (built once per session)
+            address_index = self.address_get_index()
+            if address_index is None:
+                return False
+            for value_code, value_name in address_index.get_streets(expl_id):
+                records.append([value_code, value_name])
 
-            # Check filter and existence of fields
-            expr = QgsExpression(expr_filter)
-            if expr.hasParserError():
-                message = f"{expr.parserErrorString()}: {expr_filter}"
-                self.controller.show_warning(message)
-                return
-
-            it = layer.getFeatures(QgsFeatureRequest(expr))
-
-        # Iterate over features
-        for feature in it:
-            geom = feature.geometry()
-            attrs = feature.attributes()
-            value_code = attrs[idx_field_code]
-            value_name = attrs[idx_field_name]
-            if value_code is not None and geom is not None:
-                elem = [value_code, value_name, geom.asWkt()]
-            else:
-                elem = [value_code, value_name, None]
-            records.append(elem)
+        else:
+            request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+            request.setSubsetOfAttributes([idx_field_code, idx_field_name])
+            for feature in layer.getFeatures(request):
+                attrs = feature.attributes()
+                records.append([attrs[idx_field_code], attrs[idx_field_name]])
 
         # Fill combo
         combo.blockSignals(True)
         combo.clear()
-        records_sorted = sorted(records, key=operator.itemgetter(1))
+        records_sorted = sorted(records, key=lambda x: str(x[1]))
         for record in records_sorted:
-            combo.addItem(record[1], record)
+            combo.addItem(str(record[1]), record)
         combo.blockSignals(False)
 
         return True
 
 
+    def address_get_index(self):
+        """ Return index of streets and portals of the address layers, or None if they are not available """
+
+        if 'street_layer' not in self.layers or 'portal_layer' not in self.layers:
+            return None
+
+        street_layer = self.layers['street_layer']
+        portal_layer = self.layers['portal_layer']
+        street_fields = (self.params['street_field_code'], self.params['street_field_name'], self.street_field_expl[0])
+        portal_fields = (self.params['portal_field_code'], self.params['portal_field_number'])
+        for layer, fields in ((street_layer, street_fields), (portal_layer, portal_fields)):
+            for field_name in fields:
+                if layer.fields().indexFromName(field_name) < 0:
+                    message = "Adress configuration. Field not found"
+                    self.controller.show_warning(message, parameter=field_name)
+                    return None
+
+        return get_address_index(self.controller, street_layer, street_fields, portal_layer, portal_fields)
+
+
     def address_get_numbers(self, dialog, combo, field_code, fill_combo=False, zoom=True):
         """ Populate civic numbers depending on value of selected @combo. 
             Build an expression with @field_code
@@ -2118,27 +2130,33 @@ class MincutParent(ParentAction):
         
         dialog.address_number.blockSignals(True)
         dialog.address_number.clear()
+        dialog.address_number.blockSignals(False)
+        if field_code != self.params['portal_field_code'] or not (fill_combo or zoom):
+            return
+
+        # Portals of the street are read from the address index
+        address_index = self.address_get_index()
+        if address_index is None:
+            return
+        numbers = address_index.get_numbers(code)
         if fill_combo:
-            it = layer.getFeatures(QgsFeatureRequest(expr))
-            for feature in it:
-                attrs = feature.attributes()
-                field_number = attrs[idx_field_number]
-                if field_number is not None:
-                    elem = [code, field_number]
-                    records.append(elem)
-        
-            # Fill numbers combo
-            records_sorted = sorted(records, key=operator.itemgetter(1))
-            for record in records_sorted:
+            dialog.address_number.blockSignals(True)
+            for record in records:
                 dialog.address_number.addItem(record[1], record)
+            for field_number, fid in numbers:
+                dialog.address_number.addItem(str(field_number), [code, field_number, fid])
             dialog.address_number.blockSignals(False)
 
         if zoom:
-            # Select features of @layer applying @expr
-            self.select_features_by_expr(layer, expr)
-    
-            # Zoom to selected feature of the layer
-            self.zoom_to_selected_features(layer, 'arc')
+            if numbers:
+                # Select portals of the street and zoom to them
+                layer.selectByIds([fid for field_number, fid in numbers])
+                self.zoom_to_selected_features(layer, 'arc')
+            else:
+                extent = address_index.get_street_extent(code)
+                if extent is not None:
+                    self.iface.mapCanvas().setExtent(extent)
+                    self.iface.mapCanvas().refresh()
 
 
     def zoom_to_selected_features(self, layer, geom_type=None, zoom=None):
@@ -2262,22 +2280,9 @@ class MincutParent(ParentAction):
             self.controller.show_warning(message, parameter=civic)
             return
 
-        # select this feature in order to copy to memory layer
-        aux = (f"{self.params['portal_field_code']} = '{elem[0]}'"
-               f" AND {self.params['portal_field_number']} = '{elem[1]}'")
-        expr = QgsExpression(aux)
-        if expr.hasParserError():
-            message = expr.parserErrorString()
-            self.controller.show_warning(message, parameter=aux)
-            return
-
-            # Get a featureIterator from an expression
-        # Build a list of feature Ids from the previous result
-        # Select featureswith the ids obtained
+        # Select portal by its feature id, taken from the address index
         layer = self.layers['portal_layer']
-        it = self.layers['portal_layer'].getFeatures(QgsFeatureRequest(expr))
-        ids = [i.id() for i in it]
-        layer.selectByIds(ids)
+        layer.selectByIds([elem[2]])
 
         # Zoom to selected feature of the layer
         self.zoom_to_selected_features(self.layers['portal_layer'], 'node')
@@ -8,7 +8,7 @@ or (at your option) any later version.
 
 from qgis.PyQt.QtCore import QStringListModel
 from qgis.PyQt.QtSql import QSqlTableModel
-from qgis.PyQt.QtWidgets import QTableView, QMenu, QPushButton, QLineEdit, QCompleter, QAbstractItemView
+from qgis.PyQt.QtWidgets import QTableView, QMenu, QPushButton, QLineEdit, QCompleter, QAbstractItemView, QGridLayout
 
 import datetime
 import json
@@ -21,6 +21,7 @@ from functools import partial
 from .. import utils_giswater
 
 from .api_parent import ApiParent
+from .mincut_criticality import MincutCriticality
 from .parent import ParentAction
 from ..ui_manager import ApiSelector, Mincut_edit
 
@@ -37,6 +38,7 @@ class MincutConfig(ParentAction):
         self.schema_name = self.controller.schema_name
         self.settings = self.mincut.settings
         self.api_parent = ApiParent(mincut.iface, self.settings, self.controller, self.plugin_dir)
+        self.mincut_criticality = MincutCriticality(mincut)
 
 
     def mg_mincut_management(self):
@@ -93,6 +95,15 @@ class MincutConfig(ParentAction):
         except KeyError as e:
             self.btn_notify.setVisible(False)
 
+        # Button to compute mincut of all arcs of a sector (there is no widget for it in the form)
+        self.btn_criticality = QPushButton("Criticality")
+        self.btn_criticality.setToolTip("Compute mincut of every arc of a sector and export affected connecs "
+                                        "and hydrometers")
+        self.btn_criticality.clicked.connect(self.mincut_criticality.criticality_analysis)
+        layout = self.dlg_min_edit.findChild(QGridLayout, "verticalLayout_3")
+        if layout is not None:
+            layout.addWidget(self.btn_criticality, 5, 14)
+
         self.populate_combos()
         self.dlg_min_edit.state_edit.activated.connect(partial(self.filter_by_id, self.tbl_mincut_edit))
 
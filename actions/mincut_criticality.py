@@ -0,0 +1,250 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.core import QgsApplication, QgsFeature, QgsField, QgsGeometry, QgsVectorFileWriter, QgsVectorLayer
+from qgis.PyQt.QtCore import QVariant
+from qgis.PyQt.QtWidgets import QFileDialog, QInputDialog
+
+import csv
+import io
+import os
+from functools import partial
+
+from .csv2pg import copy_value
+from .gw_task import GwTask
+from .parent import ParentAction
+from ..dao.mincut_graph import MincutGraph, compute_mincuts
+
+
+# Columns of table 'anl_mincut_criticality' filled by the analysis
+CRITICALITY_COLUMNS = ('arc_id', 'sector_id', 'arcs', 'valves', 'connecs', 'hydrometers', 'length', 'valve_ids')
+
+
+class MincutCriticality(ParentAction):
+    """ Batch mincut: compute isolation zone of every arc of a sector to rank its criticality
+    (connecs and hydrometers affected by a break of the arc) """
+
+    def __init__(self, mincut):
+        """ Class constructor """
+
+        self.mincut = mincut
+        self.canvas = mincut.canvas
+        self.plugin_dir = mincut.plugin_dir
+        self.controller = self.mincut.controller
+        self.settings = self.mincut.settings
+        self.task_criticality = None
+        self.criticality_error = None
+        # Reason shown to the user when there is nothing to analyze
+        self.criticality_message = None
+
+
+    def criticality_analysis(self):
+        """ Ask for sector and output file, then start the analysis as a background task """
+
+        if self.task_criticality is not None and self.task_criticality.isActive():
+            self.controller.show_warning("Criticality analysis is already running")
+            return
+
+        # Table is created by the processes that create and update the schema
+        if not self.controller.check_table('anl_mincut_criticality'):
+            message = "Table not found. Please, update the project schema"
+            self.controller.show_warning(message, parameter='anl_mincut_criticality')
+            return
+
+        sql = "SELECT sector_id, name FROM sector WHERE sector_id > 0 ORDER BY name"
+        rows = self.controller.get_rows(sql, commit=True)
+        if not rows:
+            self.controller.show_warning("Any sector found")
+            return
+
+        items = [f"{row[1]} ({row[0]})" for row in rows]
+        item, accepted = QInputDialog.getItem(None, "Criticality analysis", "Sector:", items, 0, False)
+        if not accepted:
+            return
+        sector_id = rows[items.index(item)][0]
+
+        message = "Save criticality analysis as"
+        path, filter_ = QFileDialog.getSaveFileName(None, message, "", 'CSV (*.csv);;GeoPackage (*.gpkg)')
+        if not path:
+            return
+        if os.path.splitext(path)[1].lower() not in ('.csv', '.gpkg'):
+            path += '.gpkg' if 'gpkg' in filter_ else '.csv'
+
+        self.criticality_error = None
+        self.criticality_message = None
+        processes = self.settings.value('system_variables/mincut_processes')
+        processes = int(processes) if processes else None
+        self.task_criticality = GwTask(f'Mincut criticality analysis of sector {sector_id}',
+            function=partial(self.run_criticality, sector_id, path, processes),
+            on_finished=partial(self.criticality_finished, sector_id, path))
+        QgsApplication.taskManager().addTask(self.task_criticality)
+
+
+    def run_criticality(self, sector_id, path, processes=None, task=None):
+        """ Load network, compute isolation zones of arcs of @sector_id and save them.
+        Executed by a background task using a dedicated connection
+        :return: List of result rows (see CRITICALITY_COLUMNS) or None if failed or cancelled
+        """
+
+        with self.controller.get_task_dao() as dao:
+            mincut_graph = self.load_mincut_graph(dao)
+            if mincut_graph is None:
+                return None
+
+            sql = (f"SELECT arc_id FROM v_edit_arc "
+                   f"WHERE sector_id = {sector_id} AND node_1 IS NOT NULL AND node_2 IS NOT NULL")
+            rows = dao.get_rows(sql)
+            if rows is None:
+                self.criticality_error = dao.last_error
+                return None
+
+            arc_indexes = [mincut_graph.get_arc_index(row[0]) for row in rows]
+            arc_indexes = [index for index in arc_indexes if index is not None]
+            if not arc_indexes:
+                self.criticality_message = "Any arc found in sector"
+                return None
+            results = compute_mincuts(mincut_graph, arc_indexes, processes, task=task)
+            if results is None:
+                return None
+
+            arc_ids = mincut_graph.graph.edge_ids
+            node_ids = mincut_graph.graph.node_ids
+            results.sort(key=lambda result: (-result[4], -result[3], arc_ids[result[0]]))
+            rows = [(arc_ids[arc_index], sector_id, arcs, len(valves), connecs, hydrometers, round(length, 3),
+                     ','.join(node_ids[node] for node in valves))
+                    for arc_index, arcs, length, connecs, hydrometers, valves in results]
+
+            if not self.save_criticality(dao, sector_id, rows):
+                return None
+
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='') as _file:
+                writer = csv.writer(_file, delimiter=';')
+                writer.writerow(CRITICALITY_COLUMNS)
+                writer.writerows(rows)
+
+        return rows
+
+
+    def load_mincut_graph(self, dao):
+        """ Load arcs, valves, connecs and hydrometers of the network into a MincutGraph """
+
+        sql = ("SELECT arc_id, node_1, node_2, ST_Length(the_geom) FROM v_edit_arc "
+               "WHERE node_1 IS NOT NULL AND node_2 IS NOT NULL")
+        arcs = dao.get_rows(sql)
+        if arcs is None:
+            self.criticality_error = dao.last_error
+            return None
+        if not arcs:
+            self.criticality_message = "Any arc found"
+            return None
+
+        # Broken valves can not be closed, so they are considered as regular nodes
+        sql = ("SELECT node_id, closed FROM man_valve "
+               "JOIN v_edit_node USING (node_id) "
+               "WHERE node_type IN (SELECT id FROM anl_mincut_selector_valve) AND broken IS NOT TRUE")
+        rows = dao.get_rows(sql)
+        if rows is None:
+            self.criticality_error = dao.last_error
+            return None
+        if not rows:
+            self.criticality_message = "Any valve found"
+            return None
+        valves = {row[0]: row[1] is True for row in rows}
+
+        sql = ("SELECT arc_id, count(*) FROM v_edit_connec "
+               "WHERE arc_id IS NOT NULL GROUP BY arc_id")
+        rows = dao.get_rows(sql)
+        connecs = {row[0]: row[1] for row in rows or []}
+
+        sql = ("SELECT arc_id, count(*) FROM rtc_hydrometer_x_connec "
+               "JOIN v_edit_connec USING (connec_id) "
+               "WHERE arc_id IS NOT NULL GROUP BY arc_id")
+        rows = dao.get_rows(sql)
+        hydrometers = {row[0]: row[1] for row in rows or []}
+
+        return MincutGraph().build(arcs, valves, connecs, hydrometers)
+
+
+    def save_criticality(self, dao, sector_id, rows):
+        """ Replace results of @sector_id of current user in table 'anl_mincut_criticality' using COPY """
+
+        sql = f"DELETE FROM anl_mincut_criticality WHERE sector_id = {sector_id} AND cur_user = current_user"
+        if not dao.execute_sql(sql, commit=False):
+            self.criticality_error = dao.last_error
+            dao.rollback()
+            return False
+
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(copy_value(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        sql = f"COPY anl_mincut_criticality ({', '.join(CRITICALITY_COLUMNS)}) FROM STDIN"
+        error = dao.copy_expert(sql, buffer)
+        if error:
+            self.criticality_error = error
+            dao.rollback()
+            return False
+
+        dao.commit()
+        return True
+
+
+    def criticality_finished(self, sector_id, path, task, result):
+        """ Export GeoPackage (it needs the main thread) and show result of the analysis """
+
+        if not result:
+            if task.exception is not None:
+                self.criticality_error = task.exception
+            if self.criticality_error is not None:
+                self.controller.show_warning_detail("Criticality analysis failed", str(self.criticality_error))
+            elif task.isCanceled():
+                self.controller.show_info("Criticality analysis canceled")
+            elif self.criticality_message is not None:
+                self.controller.show_warning(self.criticality_message, parameter=f"sector_id: {sector_id}")
+            return
+
+        rows = task.function_result
+        if path.lower().endswith('.gpkg') and not self.export_geopackage(sector_id, path, rows):
+            return
+
+        message = f"Criticality analysis finished: {len(rows)} arcs analyzed"
+        self.controller.show_info(message, parameter=path)
+
+
+    def export_geopackage(self, sector_id, path, rows):
+        """ Write result @rows with the geometry of its arcs into GeoPackage @path """
+
+        sql = f"SELECT arc_id, ST_AsText(the_geom) FROM v_edit_arc WHERE sector_id = {sector_id}"
+        geometries = {row[0]: row[1] for row in self.controller.get_rows(sql, commit=True) or []}
+        srid = self.controller.plugin_settings_value('srid')
+
+        vlayer = QgsVectorLayer(f"LineString?crs=epsg:{srid}", "mincut_criticality", "memory")
+        types = (QVariant.String, QVariant.Int, QVariant.Int, QVariant.Int, QVariant.Int, QVariant.Int,
+                 QVariant.Double, QVariant.String)
+        provider = vlayer.dataProvider()
+        provider.addAttributes([QgsField(name, type_) for name, type_ in zip(CRITICALITY_COLUMNS, types)])
+        vlayer.updateFields()
+
+        features = []
+        for row in rows:
+            feature = QgsFeature(vlayer.fields())
+            feature.setAttributes(list(row))
+            wkt = geometries.get(row[0])
+            if wkt:
+                feature.setGeometry(QgsGeometry.fromWkt(wkt))
+            features.append(feature)
+        provider.addFeatures(features)
+
+        error = QgsVectorFileWriter.writeAsVectorFormat(vlayer, path, "UTF-8", vlayer.crs(), "GPKG")
+        if error[0] != QgsVectorFileWriter.NoError:
+            self.controller.show_warning_detail("Error exporting GeoPackage", str(error))
+            return False
+
+        return True
+
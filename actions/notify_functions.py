@@ -6,22 +6,25 @@ or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
 from qgis.core import QgsEditorWidgetSetup, QgsFieldConstraints, QgsMessageLog, QgsLayerTreeLayer, QgsProject
-from qgis.PyQt.QtCore import Qt
+from qgis.PyQt.QtCore import Qt, QTimer
 from qgis.PyQt.QtWidgets import QMessageBox
 
 import json
-import threading
 from collections import OrderedDict
+from time import monotonic
 
 from .parent import ParentAction
+from ..dao.network_graph import invalidate_graphs
+from ..dao.pg_listener import PgListener
 
 
 class NotifyFunctions(ParentAction):
-    # :var conn_failed: some times, when user click so fast 2 actions, LISTEN channel is stopped, and we need to
-    #                   re-LISTEN all channels
 
-    conn_failed = False
-    list_channels = None
+    # Functions whose calls are queued and merged during the coalescing window, in order of execution
+    coalesced_functions = ('indexing_spatial_layer', 'refresh_attribute_table', 'refresh_canvas', 'refreshCanvas')
+    # Coalesced functions that receive a list of layers as parameter 'tableName'
+    layer_functions = ('indexing_spatial_layer', 'refresh_attribute_table')
+
     def __init__(self, iface, settings, controller, plugin_dir):
         """ Class to control notify from PostgresSql """
 
@@ -31,18 +34,34 @@ class NotifyFunctions(ParentAction):
         self.settings = settings
         self.controller = controller
         self.plugin_dir = plugin_dir
+        self.list_channels = None
+        self.listener = None
+
+        # Queue of coalesced functions: {function_name: OrderedDict {layer_name (or None): True}}
+        self.pending_functions = OrderedDict()
+        self.pending_since = None
+        self.notify_stats = {'received': 0, 'merged': 0, 'executed': 0}
+        try:
+            self.coalesce_window = int(self.settings.value('system_variables/notify_coalesce_ms', 250))
+        except (TypeError, ValueError):
+            self.coalesce_window = 250
+        self.flush_timer = QTimer()
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.flush_functions)
 
 
     def start_listening(self, list_channels):
-        """
+        """ Listen @list_channels on a dedicated connection. Its worker thread is restarted if already exists
         :param list_channels: List of channels to be listened
         """
-        self.list_channels = list_channels
-        for channel_name in list_channels:
-            self.controller.execute_sql(f'LISTEN "{channel_name}";')
 
-        thread = threading.Thread(target=self.wait_notifications)
-        thread.start()
+        if self.listener is not None:
+            self.stop_listening(self.list_channels)
+
+        self.list_channels = list_channels
+        self.listener = PgListener(self.controller.dao.conn_string, list_channels)
+        self.listener.notification_received.connect(self.receive_notification)
+        self.listener.start()
 
 
     def task_stopped(self, task):
@@ -71,45 +90,35 @@ class NotifyFunctions(ParentAction):
             raise exception
 
 
-    def stop_listening(self, list_channels):
-        """
-        :param list_channels: List of channels to be unlistened
+    def stop_listening(self, list_channels=None):
+        """ Stop worker thread. Channels are unlistened when its connection is closed
+        :param list_channels: List of channels to be unlistened (kept for compatibility)
         """
 
-        for channel_name in list_channels:
-            self.controller.execute_sql(f'UNLISTEN "{channel_name}";')
+        self.flush_timer.stop()
+        self.pending_functions.clear()
+        if self.listener is None:
+            return
 
+        self.listener.notification_received.disconnect(self.receive_notification)
+        self.listener.stop()
+        self.listener = None
 
-    def wait_notifications(self):
 
-        try:
-            if self.conn_failed:
-                for channel_name in self.list_channels:
-                    self.controller.execute_sql(f'LISTEN "{channel_name}";')
-
-                self.conn_failed = False
-
-            # Initialize thread
-            thread = threading.Timer(interval=0.1, function=self.wait_notifications)
-            thread.start()
-
-            # Check if any notification to process
-            dao = self.controller.dao
-            dao.get_poll()
-            while dao.conn.notifies:
-                notify = dao.conn.notifies.pop()
-                msg = f'<font color="blue"><bold>Got NOTIFY: </font>'
-                msg += f'<font color="black"><bold>{notify.pid}, {notify.channel}, {notify.payload} </font>'
-                self.controller.log_info(msg)
-                if notify.payload:
-                    try:
-                        complet_result = json.loads(notify.payload, object_pairs_hook=OrderedDict)
-                        self.execute_functions(complet_result)
-                    except Exception as e:
-                        pass
+    def receive_notification(self, channel, pid, payload):
+        """ Manage notification sent by the listener. Always called in the main thread """
+
+        msg = f'<font color="blue"><bold>Got NOTIFY: </font>'
+        msg += f'<font color="black"><bold>{pid}, {channel}, {payload} </font>'
+        self.controller.log_info(msg)
+        if not payload:
+            return
 
-        except AttributeError:
-            self.conn_failed = True
+        try:
+            complet_result = json.loads(payload, object_pairs_hook=OrderedDict)
+            self.execute_functions(complet_result)
+        except Exception as e:
+            self.controller.log_warning(f"Exception error: {e}")
 
 
     def execute_functions(self, complet_result):
@@ -124,6 +133,9 @@ class NotifyFunctions(ParentAction):
         for function in complet_result['functionAction']['functions']:
             function_name = function['name']
             params = function['parameters']
+            if function_name in self.coalesced_functions:
+                self.queue_function(function_name, params)
+                continue
             try:
                 getattr(self, function_name)(**params)
             except AttributeError as e:
@@ -131,15 +143,76 @@ class NotifyFunctions(ParentAction):
                 self.controller.log_warning(f"Exception error: {e}")
 
 
-    # Functions called by def wait_notifications(...)
+    def queue_function(self, function_name, params):
+        """ Queue call of @function_name. Duplicated calls (same function and layer) are merged and executed
+        once when no notification has been received during the coalescing window """
+
+        if function_name in self.layer_functions:
+            layers_name = params.get('tableName') if params else None
+            if not layers_name:
+                return
+            if type(layers_name) == str:
+                layers_name = [layers_name]
+        else:
+            layers_name = [None]
+
+        pending = self.pending_functions.setdefault(function_name, OrderedDict())
+        for layer_name in layers_name:
+            self.notify_stats['received'] += 1
+            if layer_name in pending:
+                self.notify_stats['merged'] += 1
+            else:
+                pending[layer_name] = True
+
+        # Debounce, but never delay queued functions more than 4 windows
+        if self.pending_since is None:
+            self.pending_since = monotonic()
+        elif (monotonic() - self.pending_since) * 1000 > 4 * self.coalesce_window:
+            return
+        self.flush_timer.start(self.coalesce_window)
+
+
+    def flush_functions(self):
+        """ Execute queued functions, once per function and layer """
+
+        pending = self.pending_functions
+        self.pending_functions = OrderedDict()
+        self.pending_since = None
+        for function_name in self.coalesced_functions:
+            layers = pending.get(function_name)
+            if not layers:
+                continue
+            try:
+                if function_name in self.layer_functions:
+                    getattr(self, function_name)(tableName=list(layers.keys()))
+                    self.notify_stats['executed'] += len(layers)
+                else:
+                    getattr(self, function_name)()
+                    self.notify_stats['executed'] += 1
+            except Exception as e:
+                self.controller.log_warning(f"Exception error: {e}")
+
+        self.controller.log_info(f"Notify functions: {self.notify_stats}")
+
+
+    def get_notify_stats(self):
+        """ Return counters of coalesced functions: received, merged and executed """
+        return dict(self.notify_stats)
+
+
+    # Functions called by def receive_notification(...)
     def indexing_spatial_layer(self, **kwargs):
         """ Force reload dataProvider of layer """
-        """ Function called in def wait_notifications(...) -->  getattr(self, function_name)(**params) """
+        """ Function called in def receive_notification(...) -->  getattr(self, function_name)(**params) """
 
         # Get list of layer names
         layers_name_list = kwargs['tableName']
         if not layers_name_list:
             return
+
+        # Network has been edited: graphs loaded in memory are not valid anymore
+        invalidate_graphs()
+
         if type(layers_name_list) == str:
             self.controller.indexing_spatial_layer(layers_name_list)
         if type(layers_name_list) == list:
@@ -148,7 +221,7 @@ class NotifyFunctions(ParentAction):
 
 
     def refresh_attribute_table(self, **kwargs):
-        """ Function called in def wait_notifications(...) -->  getattr(self, function_name)(**params) """
+        """ Function called in def receive_notification(...) -->  getattr(self, function_name)(**params) """
         """ Set layer fields configured according to client configuration.
             At the moment manage:
                 Column names as alias, combos and typeahead as ValueMap"""
@@ -217,7 +290,7 @@ class NotifyFunctions(ParentAction):
 
 
     def refresh_canvas(self, **kwargs):
-        """ Function called in def wait_notifications(...) -->  getattr(self, function_name)(**params) """
+        """ Function called in def receive_notification(...) -->  getattr(self, function_name)(**params) """
         # Note: canvas.refreshAllLayers() mysteriously that leaves the layers broken
         # self.canvas.refreshAllLayers()
 
@@ -334,7 +407,7 @@ class NotifyFunctions(ParentAction):
 
 
     def raise_notice(self, **kwargs):
-        """ Function called in def wait_notifications(...) -->  getattr(self, function_name)(**params)
+        """ Function called in def receive_notification(...) -->  getattr(self, function_name)(**params)
             Used to show raise notices sent by postgresql
         """
 
@@ -5,8 +5,8 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
-from qgis.core import QgsVectorLayerExporter, QgsDataSourceUri, QgsExpression, QgsFeature, QgsFeatureRequest, QgsField, QgsGeometry, QgsProject, QgsRectangle, QgsVectorLayer
-from qgis.PyQt.QtCore import Qt, QDate, QStringListModel, QVariant
+from qgis.core import QgsApplication, QgsVectorLayerExporter, QgsDataSourceUri, QgsExpression, QgsFeatureRequest, QgsProject, QgsRectangle, QgsVectorLayer
+from qgis.PyQt.QtCore import Qt, QDate, QStringListModel
 from qgis.PyQt.QtWidgets import QGroupBox, QAbstractItemView, QTableView, QFileDialog, QApplication, QCompleter, QAction, QWidget, QSpacerItem, QLabel, QComboBox, QCheckBox, QSizePolicy, QPushButton, QLineEdit, QDoubleSpinBox, QTextEdit, QTabWidget, QGridLayout
 from qgis.PyQt.QtGui import QIcon, QCursor, QPixmap
 from qgis.PyQt.QtSql import QSqlTableModel, QSqlQueryModel
@@ -20,6 +20,8 @@ from functools import partial
 
 from .. import utils_giswater
 from .add_layer import AddLayer
+from .csv_export import copy_queries_csv, get_model_columns, get_model_sql, write_models_csv
+from .gw_task import GwTask
 from ..ui_manager import BasicInfo, GwDialog, GwMainWindow
 
 from qgis.core import *
@@ -877,27 +879,11 @@ class ParentAction(object):
         # Enter editing mode
         virtual_layer.startEditing()
         if counter > 0:
-            for key, value in list(data[layer_type]['values'][0].items()):
-                # add columns
-                if str(key) != 'the_geom':
-                    prov.addAttributes([QgsField(str(key), QVariant.String)])
-
-        # Add features
-        for item in data[layer_type]['values']:
-            attributes = []
-            fet = QgsFeature()
-
-            for k, v in list(item.items()):
-                if str(k) != 'the_geom':
-                    attributes.append(v)
-                if str(k) in 'the_geom':
-                    sql = f"SELECT St_AsText('{v}')"
-                    row = self.controller.get_row(sql, log_sql=False)
-                    if row and row[0]:
-                        geometry = QgsGeometry.fromWkt(str(row[0]))
-                        fet.setGeometry(geometry)
-            fet.setAttributes(attributes)
-            prov.addFeatures([fet])
+            fields, features = self.add_layer.get_vlayer_features(data[layer_type]['values'])
+            prov.addAttributes(fields)
+            virtual_layer.updateFields()
+            # Add all features at once
+            prov.addFeatures(features)
 
         # Commit changes
         virtual_layer.commitChanges()
@@ -984,6 +970,68 @@ class ParentAction(object):
                 widget_to.setDate(current_date)
 
 
+    def export_models_to_csv(self, path, models, excluded_columns=(), date_format='yyyy-MM-dd', on_finished=None):
+        """ Export rows of @models into CSV file @path, one after the other.
+        If all models are SQL backed, its queries are exported with COPY in a background task that can be
+        cancelled. Otherwise models are walked in the main thread, writing rows as they are read
+        :param excluded_columns: Headers of the columns not to export
+        :param on_finished: Callable executed with the number of rows exported when the export succeeds
+        """
+
+        queries = []
+        for model in models:
+            sql = get_model_sql(model)
+            if sql is None:
+                queries = None
+                break
+            queries.append((sql, get_model_columns(model, excluded_columns)))
+
+        if queries is None:
+            try:
+                total = write_models_csv(path, models, excluded_columns, date_format)
+            except OSError:
+                msg = "File path doesn't exist or you dont have permission or file is opened"
+                self.controller.show_warning(msg)
+                return
+            if on_finished:
+                on_finished(total)
+            return
+
+        self.csv_export_error = None
+        self.csv_export_total = None
+        self.task_csv_export = GwTask(f'Export {os.path.basename(path)}',
+            function=partial(self.copy_models_to_csv, path, queries),
+            on_finished=partial(self.export_models_to_csv_finished, on_finished))
+        QgsApplication.taskManager().addTask(self.task_csv_export)
+
+
+    def copy_models_to_csv(self, path, queries, task=None):
+        """ Write @queries into CSV file @path using a dedicated connection. Executed by a background task """
+
+        with self.controller.get_task_dao() as dao:
+            self.csv_export_total = copy_queries_csv(dao, path, queries, task)
+            self.csv_export_error = dao.last_error
+
+        return self.csv_export_total is not None
+
+
+    def export_models_to_csv_finished(self, on_finished, task, result):
+
+        if result:
+            if on_finished:
+                on_finished(self.csv_export_total)
+            return
+
+        if isinstance(task.exception, OSError):
+            msg = "File path doesn't exist or you dont have permission or file is opened"
+            self.controller.show_warning(msg)
+        elif task.exception is not None or self.csv_export_error is not None:
+            error = task.exception if task.exception is not None else self.csv_export_error
+            self.controller.show_warning_detail("Export CSV failed", str(error))
+        elif task.isCanceled():
+            self.controller.show_info("Export CSV canceled")
+
+
     def get_values_from_catalog(self, table_name, typevalue, order_by='id'):
 
         sql = (f"SELECT id, idval"
@@ -513,7 +513,7 @@ class ParentManage(ParentAction, object):
             return None
 
         # Select features of layers applying @expr
-        self.select_features_by_ids(geom_type, expr)
+        self.select_features_by_ids(geom_type, expr, list_ids)
         
         return expr_filter
 
@@ -613,18 +613,22 @@ class ParentManage(ParentAction, object):
         self.lazy_init_function = init_function
 
 
-    def select_features_by_ids(self, geom_type, expr):
-        """ Select features of layers of group @geom_type applying @expr """
+    def select_features_by_ids(self, geom_type, expr, ids=None):
+        """ Select features of layers of group @geom_type applying @expr.
+        If @ids (values of field '@geom_type_id') are set, features are selected through the feature id index """
 
         # Build a list of feature id's and select them
+        field_id = geom_type + "_id"
         for layer in self.layers[geom_type]:
             if expr is None:
-                layer.removeSelection()  
-            else:                
+                layer.removeSelection()
+            elif ids is not None and self.controller.select_by_business_ids(layer, ids, field_id) is not None:
+                continue
+            else:
                 it = layer.getFeatures(QgsFeatureRequest(expr))
                 id_list = [i.id() for i in it]
                 if len(id_list) > 0:
-                    layer.selectByIds(id_list)   
+                    layer.selectByIds(id_list)
                 else:
                     layer.removeSelection()             
         
@@ -715,7 +719,7 @@ class ParentManage(ParentAction, object):
 
         # Select features with previous filter
         # Build a list of feature id's and select them
-        self.select_features_by_ids(self.geom_type, expr)
+        self.select_features_by_ids(self.geom_type, expr, self.ids)
 
         if query:
             self.remove_selection()
@@ -805,7 +809,7 @@ class ParentManage(ParentAction, object):
             if not is_valid:
                 return                                           
                           
-            self.select_features_by_ids(geom_type, expr)
+            self.select_features_by_ids(geom_type, expr, self.ids)
                         
         # Reload contents of table 'tbl_@table_object_x_@geom_type'
         if query:
@@ -888,12 +892,7 @@ class ParentManage(ParentAction, object):
             return
 
         # Select features with previous filter
-        # Build a list of feature id's and select them
-        for layer in self.layers[self.geom_type]:
-            it = layer.getFeatures(QgsFeatureRequest(expr))
-            id_list = [i.id() for i in it]
-            if len(id_list) > 0:
-                layer.selectByIds(id_list)
+        self.select_features_by_ids(self.geom_type, expr, self.ids)
 
         # Reload contents of table 'tbl_???_x_@geom_type'
         if query:
@@ -0,0 +1,287 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+# Update several project schemas to the version of the plugin without QGIS, in parallel.
+# Run it from the folder that contains the plugin folder, ie:
+#     python -m giswater.actions.schema_update_runner --service gis_db --all --jobs 4
+# Every schema is updated in its own connection and transaction: it is committed only if all its files
+# are executed without errors, otherwise it is rolled back and the rest of schemas go on
+import argparse
+import configparser
+import csv
+import logging
+import os
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+
+from .sql_process import SqlProcess
+from ..dao.pg_dao import PgDao
+
+
+class SchemaUpdateJob(SqlProcess):
+    """ Update of one project schema, executed by the command line runner """
+
+    def __init__(self, schema_name, plugin_dir, sql_dir=None, read_all_updates=False, skip_applied_sql=True,
+                 report_folder=None, super_users=None):
+
+        SqlProcess.__init__(self)
+        self.schema_name = schema_name
+        self.plugin_dir = plugin_dir
+        self.sql_dir = sql_dir or os.path.join(plugin_dir, 'sql')
+        self.read_all_updates = 'TRUE' if read_all_updates else 'FALSE'
+        self.skip_applied_sql = 'TRUE' if skip_applied_sql else 'FALSE'
+        self.report_folder = report_folder
+        self.super_users = super_users or []
+        # Schema is committed or rolled back as a whole, so a failing file always stops the process
+        self.dev_commit = 'FALSE'
+        self.title = 'null'
+        self.version_metadata = get_plugin_version(plugin_dir)
+        self.project_data_schema_version = '0'
+        self.project_type = None
+        self.project_type_selected = None
+        self.locale = 'EN'
+        self.filter_srid_value = ''
+
+        # Declare all file variables
+        self.file_pattern_tablect = "tablect"
+        self.file_pattern_ddl = "ddl"
+        self.file_pattern_dml = "dml"
+        self.file_pattern_fct = "fct"
+        self.file_pattern_trg = "trg"
+        self.file_pattern_ftrg = "ftrg"
+        self.file_pattern_ddlview = "ddlview"
+        self.file_pattern_ddlrule = "ddlrule"
+
+        # Declare all directorys
+        self.folderSoftware = None
+        self.folderLocale = None
+        self.folderUtils = self.sql_dir + os.sep + 'utils' + os.sep
+        self.folderUpdates = self.sql_dir + os.sep + 'updates' + os.sep
+        self.folderExemple = self.sql_dir + os.sep + 'example' + os.sep
+        self.folderPath = ''
+        self.folderUpdatesApi = self.sql_dir + os.sep + 'api' + os.sep + 'updates' + os.sep
+        self.folderApi = self.sql_dir + os.sep + 'api' + os.sep
+
+
+    def load_version(self):
+        """ Read version, language, SRID and project type of the schema from its table 'version' """
+
+        sql = (f'SELECT giswater, language, epsg, lower(wsoftware) FROM "{self.schema_name}".version '
+               f'ORDER BY id DESC LIMIT 1')
+        row = self.sql_dao.get_row(sql)
+        if not row:
+            self.sql_last_error = self.sql_dao.last_error or "Table 'version' is empty"
+            return False
+
+        self.project_data_schema_version = row[0]
+        self.locale = str(row[1] or 'EN').upper()
+        self.filter_srid_value = str(row[2])
+        self.project_type = row[3]
+        self.project_type_selected = row[3]
+        self.folderSoftware = self.sql_dir + os.sep + self.project_type + os.sep
+        self.folderLocale = self.sql_dir + os.sep + 'i18n' + os.sep + self.locale + os.sep
+        return True
+
+
+    def run(self, dao):
+        """ Update schema using @dao, a connection used only by this job. Return dict with the result """
+
+        self.sql_dao = dao
+        start = time()
+        counts = {'applied': 0, 'skipped': 0, 'failed': 0}
+        try:
+            status = self.load_version()
+            if status:
+                self.log_process_info("Updating from version", parameter=self.project_data_schema_version)
+                status = self.load_updates_process(self.project_type, self.schema_name)
+                if self.ledger is not None:
+                    for timing in self.ledger.timings:
+                        counts[timing[1]] += 1
+
+            status = status is not False and self.error_count == 0
+            if status:
+                dao.commit()
+            else:
+                dao.rollback()
+        except Exception as e:
+            self.sql_last_error = e
+            self.error_count += 1
+            dao.rollback()
+            status = False
+        finally:
+            self.finish_ledger()
+            self.sql_dao = None
+
+        result = {'schema': self.schema_name, 'status': 'OK' if status else 'FAILED',
+                  'from_version': self.project_data_schema_version, 'duration': round(time() - start, 3),
+                  'error_count': self.error_count, 'error': '' if status else str(self.sql_last_error or '')}
+        result.update(counts)
+        return result
+
+
+    def get_report_folder(self):
+        return self.report_folder
+
+
+    def log_process_info(self, text, parameter=None):
+        SqlProcess.log_process_info(self, f"[{self.schema_name}] {text}", parameter)
+
+
+    def log_process_warning(self, text, parameter=None):
+        SqlProcess.log_process_warning(self, f"[{self.schema_name}] {text}", parameter)
+
+
+def get_plugin_version(plugin_dir):
+    """ Get plugin version from metadata.txt file """
+
+    metadata = configparser.ConfigParser()
+    metadata.read(os.path.join(plugin_dir, 'metadata.txt'))
+    return metadata.get('general', 'version', fallback=None)
+
+
+def get_super_users(plugin_dir):
+    """ Get super users from file 'config/giswater.config' """
+
+    config = configparser.ConfigParser(inline_comment_prefixes=(';',), interpolation=None, strict=False)
+    try:
+        config.read(os.path.join(plugin_dir, 'config', 'giswater.config'))
+    except configparser.Error:
+        return []
+
+    super_users = config.get('system_variables', 'super_users', fallback='')
+    return [user.strip() for user in super_users.split(',') if user.strip()]
+
+
+def get_project_schemas(dao):
+    """ Return name of the schemas of the database with a Giswater table 'version' """
+
+    sql = ("SELECT DISTINCT table_schema FROM information_schema.columns "
+           "WHERE table_name = 'version' AND column_name = 'wsoftware' "
+           "ORDER BY table_schema")
+    rows = dao.get_rows(sql)
+    if rows is None:
+        return None
+
+    return [row[0] for row in rows]
+
+
+def update_schema(dao, job):
+    """ Execute @job in a connection of the pool of @dao """
+
+    try:
+        with dao.get_task_dao() as task_dao:
+            return job.run(task_dao)
+    except Exception as e:
+        job.error_count += 1
+        return {'schema': job.schema_name, 'status': 'FAILED', 'from_version': job.project_data_schema_version,
+                'duration': 0.0, 'applied': 0, 'skipped': 0, 'failed': 0, 'error_count': job.error_count,
+                'error': str(e)}
+
+
+def write_report(path, results):
+
+    fields = ['schema', 'status', 'from_version', 'duration', 'applied', 'skipped', 'failed', 'error_count',
+              'error']
+    with open(path, 'w', newline='') as output:
+        writer = csv.DictWriter(output, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def print_report(results):
+
+    print(f"{'schema':30} {'status':7} {'seconds':>9} {'applied':>8} {'skipped':>8} {'failed':>7}  error")
+    for result in results:
+        print(f"{result['schema']:30} {result['status']:7} {result['duration']:9.2f} {result['applied']:8} "
+              f"{result['skipped']:8} {result['failed']:7}  {result['error'].splitlines()[0] if result['error'] else ''}")
+
+    failed = [result['schema'] for result in results if result['status'] != 'OK']
+    total = sum(result['duration'] for result in results)
+    print(f"{len(results)} schemas updated in {total:.2f} s of work, {len(failed)} failed"
+          + (f": {', '.join(failed)}" if failed else ""))
+
+
+def get_parser():
+
+    parser = argparse.ArgumentParser(description="Update Giswater project schemas to the version of the plugin")
+    parser.add_argument('schemas', nargs='*', help="Schemas to update")
+    parser.add_argument('--all', action='store_true', help="Update all Giswater schemas of the database")
+    parser.add_argument('--service', help="Connection service (pg_service.conf)")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', default='5432')
+    parser.add_argument('--dbname')
+    parser.add_argument('--user')
+    parser.add_argument('--password', help="If not set, PGPASSWORD or .pgpass are used")
+    parser.add_argument('--sslmode')
+    parser.add_argument('--jobs', type=int, default=2, help="Number of schemas updated at the same time")
+    parser.add_argument('--sql-dir', help="Folder 'sql' to read files from. By default the one of the plugin")
+    parser.add_argument('--read-all-updates', action='store_true',
+                        help="Read also updates newer than the plugin version")
+    parser.add_argument('--no-skip', action='store_true',
+                        help="Execute files already applied with the same content (see audit_migration_ledger)")
+    parser.add_argument('--report', help="CSV file where the result of every schema is written")
+    parser.add_argument('--timing-dir', help="Folder where the timing of the files of every schema is written")
+    parser.add_argument('--verbose', action='store_true', help="Log every file executed")
+    return parser
+
+
+def main(args=None):
+
+    args = get_parser().parse_args(args)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(message)s")
+
+    if not args.schemas and not args.all:
+        print("Set schemas to update or parameter --all", file=sys.stderr)
+        return 2
+
+    jobs = max(1, args.jobs)
+    dao = PgDao()
+    if args.service:
+        dao.set_service(args.service)
+    elif args.dbname:
+        dao.set_params(args.host, args.port, args.dbname, args.user, args.password, args.sslmode)
+    else:
+        print("Set parameter --service or --dbname", file=sys.stderr)
+        return 2
+
+    # One connection for every job plus the one used to discover the schemas
+    if not dao.init_pool(1, jobs + 1):
+        print(f"Error connecting to database: {dao.last_error}", file=sys.stderr)
+        return 2
+
+    try:
+        schemas = args.schemas
+        if args.all:
+            schemas = get_project_schemas(dao)
+            if schemas is None:
+                print(f"Error reading schemas: {dao.last_error}", file=sys.stderr)
+                return 2
+            dao.rollback()
+
+        plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        super_users = get_super_users(plugin_dir)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(update_schema, dao, SchemaUpdateJob(
+                schema_name, plugin_dir, args.sql_dir, args.read_all_updates, not args.no_skip, args.timing_dir,
+                super_users)) for schema_name in schemas]
+            results = [future.result() for future in futures]
+    finally:
+        dao.close_db()
+
+    print_report(results)
+    if args.report:
+        write_report(args.report, results)
+
+    return 0 if all(result['status'] == 'OK' for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
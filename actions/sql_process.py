@@ -0,0 +1,1102 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+import logging
+import os
+from time import strftime, time
+
+from ..dao.migration_ledger import MigrationLedger
+
+
+# Tables used only by tools of the plugin, created by the processes that create and update schemas.
+# They do not belong to any version, so schemas already updated to current version also get them
+PLUGIN_TABLES = {
+    'ws': [
+        # Results of the batch mincut criticality analysis (one row per arc, sector and user)
+        ('CREATE TABLE IF NOT EXISTS "{schema_name}".anl_mincut_criticality ('
+         'id serial PRIMARY KEY, arc_id varchar(16), sector_id integer, arcs integer, valves integer, '
+         'connecs integer, hydrometers integer, length numeric(12,3), valve_ids text, '
+         'cur_user text DEFAULT current_user, tstamp timestamp DEFAULT now());\n'
+         'CREATE INDEX IF NOT EXISTS anl_mincut_criticality_sector_user '
+         'ON "{schema_name}".anl_mincut_criticality (sector_id, cur_user)'),
+    ],
+}
+
+
+class SqlProcess(object):
+    """ Processes that execute the SQL files of folder 'sql' (create and update schemas).
+    It does not depend on Qt, so it is shared by the 'Database management' dialog and the
+    command line runner of module 'schema_update_runner'. Subclasses provide settings
+    (sql_dir, folders, file patterns, project type, locale...) and may override methods
+    get_sql_dao, get_schema_name, get_current_user, get_report_folder and the log methods """
+
+    def __init__(self):
+
+        self.process_logger = logging.getLogger('giswater')
+        self.schema = None
+        self.ledger = None
+        # If True, files already applied are executed again (see MigrationLedger)
+        self.force_sql = False
+        self.error_count = 0
+        # State of the background process
+        self.process_task = None
+        self.sql_dao = None
+        self.sql_dry_run = False
+        self.sql_files_total = 0
+        self.sql_files_done = 0
+        self.sql_last_error = None
+
+
+    def get_schema_name(self):
+        """ Return name of the schema where files are executed """
+        return self.schema
+
+
+    def get_current_user(self):
+        return self.get_sql_dao().get_row("SELECT current_user")[0]
+
+
+    def get_report_folder(self):
+        """ Return folder where SQL timing reports are written. If None, they are not written """
+        return None
+
+
+    def log_process_info(self, text, parameter=None):
+
+        if parameter is not None:
+            text = f"{text}: {parameter}"
+        self.process_logger.info(text)
+
+
+    def log_process_warning(self, text, parameter=None):
+
+        if parameter is not None:
+            text = f"{text}: {parameter}"
+        self.process_logger.warning(text)
+
+
+    def load_base(self, project_type=False):
+
+        if str(project_type) in ('ws', 'ud'):
+
+            folder = self.folderUtils + self.file_pattern_ddl
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderUtils + self.file_pattern_dml
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderUtils + self.file_pattern_fct
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+            folder = self.folderUtils + self.file_pattern_ftrg
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_ddl
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_ddlrule
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_dml
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_tablect
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_fct
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_ftrg
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderUtils + self.file_pattern_tablect
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderUtils + self.file_pattern_ddlrule
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            if self.process_folder(self.folderLocale, '') is False:
+                if self.process_folder(self.sql_dir + os.sep + 'i18n' + os.sep, 'EN') is False:
+                    return False
+                else:
+                    status = self.executeFiles(self.sql_dir + os.sep + 'i18n' + os.sep + 'EN', True)
+                    if status is False and self.dev_commit == 'FALSE':
+                        return False
+            else:
+                status = self.executeFiles(self.folderLocale, True)
+                if status is False and self.dev_commit == 'FALSE':
+                    return False
+
+        elif str(project_type) in ('pl', 'tm'):
+
+            folder = self.folderSoftware + self.file_pattern_ddl
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_ddlrule
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_dml
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_fct
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_ftrg
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_tablect
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            cmb_locale = self.locale
+            folder_i18n = self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'i18n'
+            if self.process_folder(folder_i18n + os.sep + self.locale + os.sep, '') is False:
+                if self.process_folder(folder_i18n + os.sep, 'EN') is False:
+                    return False
+                else:
+                    status = self.executeFiles(folder_i18n + os.sep + 'EN', True)
+                    if status is False and self.dev_commit == 'FALSE':
+                        return False
+            else:
+                status = self.executeFiles(folder_i18n + os.sep + cmb_locale + os.sep, True)
+                if status is False and self.dev_commit == 'FALSE':
+                    return False
+
+        return True
+
+
+    def update_31to39(self, new_project=False, project_type=False, no_ct=False):
+
+        if str(project_type) in ('ws', 'ud'):
+
+            if not os.path.exists(self.folderUpdates):
+                self.show_process_message("The update folder was not found in sql folder.", 1)
+                self.error_count = self.error_count + 1
+                return
+            folders = sorted(os.listdir(self.folderUpdates + ''))
+            for folder in folders:
+                sub_folders = sorted(os.listdir(self.folderUpdates + folder))
+                for sub_folder in sub_folders:
+                    if new_project:
+                        if self.read_all_updates == 'TRUE':
+                            if str(sub_folder) > '31100':
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep):
+                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep, no_ct=no_ct)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep, ''):
+                                    status = self.load_sql(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep, no_ct=no_ct)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                        self.locale + os.sep), '') is True:
+                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), True)
+                                    if status is False:
+                                        return False
+                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN'):
+                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
+                                    if status is False:
+                                        return False
+
+                        else:
+                            if str(sub_folder) > '31100' and str(sub_folder) <= str(self.version_metadata).replace('.', ''):
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder,  os.sep + 'utils' + os.sep):
+                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep, no_ct=no_ct)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep, ''):
+                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep, no_ct=no_ct)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), ''):
+                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), True)
+                                    if status is False:
+                                        return False
+                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN'):
+                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
+                                    if status is False:
+                                        return False
+
+                    else:
+                        if self.read_all_updates == 'TRUE':
+                            if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) > '31100':
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
+                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep,
+                                        '') is True:
+                                    status = self.load_sql(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
+                                        '') is True:
+                                    status = self.executeFiles(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                            self.locale + os.sep), True)
+                                    if status is False:
+                                        return False
+                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
+                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
+                                    if status is False:
+                                        return False
+
+                        else:
+                            if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) > '31100' and str(sub_folder) <= str(self.version_metadata).replace('.', ''):
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
+                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep,
+                                        '') is True:
+                                    status = self.load_sql(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),'') is True:
+                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), True)
+                                    if status is False:
+                                        return False
+                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
+                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
+                                    if status is False:
+                                        return False
+
+        else:
+
+            if not os.path.exists(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + ''):
+                return
+            folders = sorted(os.listdir(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + ''))
+            for folder in folders:
+                sub_folders = sorted(os.listdir(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder))
+                for sub_folder in sub_folders:
+                    if new_project:
+                        if self.read_all_updates == 'TRUE':
+                            if str(sub_folder) > '31100':
+                                if self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), '') is True:
+                                    status = self.executeFiles(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), True)
+                                    if status is False:
+                                        return False
+                                elif self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', '') is True:
+                                    status = self.executeFiles(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
+                                    if status is False:
+                                        return False
+
+                        else:
+                            if str(sub_folder) > '31100' and str(sub_folder) <= str(self.version_metadata).replace('.',''):
+                                if self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder,
+                                                       '') is True:
+                                    status = self.load_sql(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                        self.locale + os.sep), '') is True:
+                                    status = self.executeFiles(self.sql_dir + os.sep + str(
+                                        project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                        self.locale + os.sep), True)
+                                elif self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
+                                    status = self.executeFiles(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'EN', True)
+                                    if status is False:
+                                        return False
+
+                    else:
+                        if self.read_all_updates == 'TRUE':
+                            if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) > '31100':
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
+                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type + os.sep,
+                                        '') is True:
+                                    status = self.load_sql(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type + os.sep)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),'') is True:
+                                    status = self.executeFiles(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                            self.locale + os.sep), True)
+                                    if status is False:
+                                        return False
+                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
+                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
+                                    if status is False:
+                                        return False
+
+                        else:
+                            if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) > '31100' and str(sub_folder) <= str(self.version_metadata).replace('.', ''):
+                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
+                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type + os.sep,
+                                        '') is True:
+                                    status = self.load_sql(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type + os.sep)
+                                    if status is False:
+                                        return False
+                                if self.process_folder(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
+                                        '') is True:
+                                    status = self.executeFiles(
+                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                            self.locale + os.sep), True)
+                                    if status is False:
+                                        return False
+                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
+                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
+                                    if status is False:
+                                        return False
+
+        return True
+
+
+    def load_views(self, project_type=False):
+
+        if str(project_type) == 'ws' or str(project_type) == 'ud':
+            folder = self.folderSoftware + self.file_pattern_ddlview
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderUtils + self.file_pattern_ddlview
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+        else:
+            folder = self.folderSoftware + self.file_pattern_ddlview
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+        return True
+
+
+    def update_30to31(self, new_project=False, project_type=False):
+
+        if str(project_type) == 'ws' or str(project_type) == 'ud':
+
+            if not os.path.exists(self.folderUpdates):
+                self.show_process_message("The update folder was not found in sql folder.", 1)
+                self.error_count = self.error_count + 1
+                return True
+
+            folders = sorted(os.listdir(self.folderUpdates + ''))
+            for folder in folders:
+                sub_folders = sorted(os.listdir(self.folderUpdates + folder))
+                for sub_folder in sub_folders:
+                    if new_project:
+                        if str(sub_folder) <= '31100':
+                            if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
+                                status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
+                                if status is False:
+                                    return False
+                            if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep, '') is True:
+                                status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep)
+                                if status is False:
+                                    return False
+                            if self.process_folder(
+                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
+                                    '') is True:
+                                status = self.executeFiles(
+                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                        self.locale + os.sep), True)
+                                if status is False:
+                                    return False
+                            elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is False:
+                                status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
+                                if status is False:
+                                    return False
+                    else:
+                        if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) <= '31100':
+                            if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
+                                status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
+                                if status is False:
+                                    return False
+                            if self.process_folder(
+                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep,
+                                    '') is True:
+                                status = self.load_sql(
+                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep)
+                                if status is False:
+                                    return False
+                            if self.process_folder(
+                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
+                                    '') is True:
+                                status = self.executeFiles(
+                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                        self.locale + os.sep), True)
+                                if status is False:
+                                    return False
+                            elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', '') is True:
+                                status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
+                                if status is False:
+                                    return False
+
+        else:
+
+            if not os.path.exists(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + ''):
+                return True
+
+            folders = sorted(os.listdir(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + ''))
+            for folder in folders:
+                sub_folders = sorted(os.listdir(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder))
+                for sub_folder in sub_folders:
+                    if new_project:
+                        if str(sub_folder) <= '31100':
+                            if self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder, '') is True:
+                                status = self.load_sql(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + '')
+                                if status is False:
+                                    return False
+                            if self.process_folder(
+                                    self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
+                                    '') is True:
+                                status = self.executeFiles(self.sql_dir + os.sep + str(
+                                    project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                    self.locale + os.sep), True)
+                                if status is False:
+                                    return False
+                            elif self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
+                                status = self.executeFiles(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep, True)
+                                if status is False:
+                                    return False
+
+                    else:
+                        if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) <= '31100':
+                            if self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder, '') is True:
+                                status = self.load_sql(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + '')
+                                if status is False:
+                                    return False
+                            if self.process_folder(
+                                    self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
+                                    '') is True:
+                                status = self.executeFiles(self.sql_dir + os.sep + str(
+                                    project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                    self.locale + os.sep), True)
+                                if status is False:
+                                    return False
+                            elif self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
+                                status = self.executeFiles(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep, True)
+                                if status is False:
+                                    return False
+
+        return True
+
+
+    def load_sample_data(self, project_type=False):
+
+        sql = 'UPDATE ' + self.schema + '.version SET sample=True ' \
+              'WHERE id = (SELECT id FROM ' + self.schema + '.version ORDER BY id DESC LIMIT 1)'
+        self.execute_process_sql(sql)
+
+        if str(project_type) == 'ws' or str(project_type) == 'ud':
+            folder = self.folderExemple + 'user' + os.sep+project_type
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+        else:
+            folder = self.folderSoftware + 'example' + os.sep + 'user' + os.sep
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+        return True
+
+
+    def load_dev_data(self, project_type=False):
+
+        if str(project_type) == 'ws' or str(project_type) == 'ud':
+            folder = self.folderExemple + 'dev' + os.sep + project_type
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+        else:
+            folder = self.folderSoftware + 'example' + os.sep + 'dev' + os.sep
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+        return True
+
+
+    def load_fct_ftrg(self, project_type=False):
+
+        if str(project_type) == 'ws' or str(project_type) == 'ud':
+            folder = self.folderUtils + self.file_pattern_fct
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderUtils + self.file_pattern_ftrg
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_fct
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_ftrg
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+        else:
+            folder = self.folderSoftware + self.file_pattern_fct
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_ftrg
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+        return True
+
+
+    def load_tablect(self, project_type=False):
+
+        if str(project_type) == 'ws' or str(project_type) == 'ud':
+            folder = self.folderSoftware + self.file_pattern_tablect
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderUtils + self.file_pattern_tablect
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+        else:
+            folder = self.folderSoftware + self.file_pattern_tablect
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+        return True
+
+
+    def load_trg(self, project_type=False):
+
+        if str(project_type) == 'ws' or str(project_type) == 'ud':
+            folder = self.folderUtils + self.file_pattern_trg
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+            folder = self.folderSoftware + self.file_pattern_trg
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+        else:
+            folder = self.folderSoftware + self.file_pattern_trg
+            status = self.executeFiles(folder)
+            if not status and self.dev_commit == 'FALSE':
+                return False
+
+        return True
+
+
+    def load_sql(self, path_folder, no_ct=False):
+
+        for (path, ficheros, archivos) in os.walk(path_folder):
+            status = self.executeFiles(path, no_ct=no_ct)
+            if not status:
+                return False
+
+        return True
+
+
+    def api(self, new_api=False, project_type=False):
+
+        folder = self.folderApi + self.file_pattern_ftrg
+        status = self.executeFiles(folder)
+        if not status and self.dev_commit == 'FALSE':
+            return False
+
+        folder = self.folderApi + self.file_pattern_fct
+        status = self.executeFiles(folder)
+        if not status and self.dev_commit == 'FALSE':
+            return False
+
+        if not os.path.exists(self.folderUpdatesApi):
+            self.show_process_message("The api folder was not found in sql folder.", 1)
+            self.error_count = self.error_count + 1
+            return
+
+        folders = sorted(os.listdir(self.folderUpdatesApi + ''))
+        self.log_process_info(str(folders))
+        for folder in folders:
+            sub_folders = sorted(os.listdir(self.folderUpdatesApi + folder))
+            for sub_folder in sub_folders:
+                if new_api:
+                    if self.read_all_updates == 'TRUE':
+                        if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep, '') is True:
+                            status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep + '')
+                            if status is False:
+                                return False
+                        if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep, '') is True:
+                            status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep + '')
+                            if status is False:
+                                return False
+                        if self.process_folder(
+                                self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
+                                '') is True:
+                            status = self.executeFiles(
+                                self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                    self.locale + os.sep), True)
+                            if status is False:
+                                return False
+                        elif self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
+                            status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep, True)
+                            if status is False:
+                                return False
+                        if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_trg) is True:
+                            status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_trg)
+                            if status is False:
+                                return False
+                        if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_tablect) is True:
+                            status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_tablect)
+                            if status is False:
+                                return False
+                    else:
+                        if str(sub_folder) <= str(self.version_metadata).replace('.', ''):
+                            if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep,
+                                                   '') is True:
+                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep + '')
+                                if status is False:
+                                    return False
+                            if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep,
+                                                   '') is True:
+                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep + '')
+                                if status is False:
+                                    return False
+                            if self.process_folder(
+                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                        self.locale + os.sep),
+                                    '') is True:
+                                status = self.executeFiles(
+                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                        self.locale + os.sep), True)
+                                if status is False:
+                                    return False
+                            elif self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep,
+                                                   'EN') is True:
+                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep,
+                                    True)
+                                if status is False:
+                                    return False
+                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_trg) is True:
+                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_trg)
+                                if status is False:
+                                    return False
+                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_tablect) is True:
+                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_tablect)
+                                if status is False:
+                                    return False
+
+                else:
+                    if self.read_all_updates == 'TRUE':
+                        if str(sub_folder) > str(self.project_data_schema_version).replace('.', ''):
+                            if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep, '') is True:
+                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep + '')
+                                if status is False:
+                                    return False
+                            if self.process_folder(
+                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep,
+                                    '') is True:
+                                status = self.executeFiles(
+                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep + '')
+                                if status is False:
+                                    return False
+                            if self.process_folder(
+                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
+                                    '') is True:
+                                status = self.executeFiles(
+                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                        self.locale + os.sep), True)
+                                if status is False:
+                                    return False
+                            elif self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
+                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep, True)
+                                if status is False:
+                                    return False
+                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_trg) is True:
+                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_trg)
+                                if status is False:
+                                    return False
+                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_tablect) is True:
+                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_tablect)
+                                if status is False:
+                                    return False
+                    else:
+                        if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) <= str(self.version_metadata).replace('.',''):
+                            if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep,
+                                                   '') is True:
+                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep + '')
+                                if status is False:
+                                    return False
+                            if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep,
+                                                   '') is True:
+                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep + '')
+                                if status is False:
+                                    return False
+                            if self.process_folder(
+                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                        self.locale + os.sep),
+                                    '') is True:
+                                status = self.executeFiles(
+                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
+                                        self.locale + os.sep), True)
+                                if status is False:
+                                    return False
+                            elif self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep,
+                                                   'EN') is True:
+                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep,
+                                    True)
+                                if status is False:
+                                    return False
+                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_trg) is True:
+                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_trg)
+                                if status is False:
+                                    return False
+                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_tablect) is True:
+                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_tablect)
+                                if status is False:
+                                    return False
+
+        return True
+
+
+    def execute_last_process(self, new_project=False, schema_name='', schema_type='', locale=False):
+        """ Execute last process function """
+
+        if new_project is True:
+            extras = '"isNewProject":"' + str('TRUE') + '", '
+        else:
+            extras = '"isNewProject":"' + str('FALSE') + '", '
+        extras += '"gwVersion":"' + str(self.version_metadata) + '", '
+        extras += '"projectType":"' + str(schema_type).upper() + '", '
+        extras += '"epsg":' + str(self.filter_srid_value).replace('"', '')
+        if new_project is True:
+            if str(self.title) != 'null':
+                extras += ', ' + '"title":"' + str(self.title) + '"'
+            extras += ', ' + '"author":"' + str(self.get_current_user()) + '"'
+            current_date = strftime('%d-%m-%Y')
+            extras += ', ' + '"date":"' + str(current_date) + '"'
+
+        extras += ', "superUsers":' + str(self.super_users).replace("'",'"') + ''
+
+        self.schema_name = schema_name
+
+        # Get current locale
+        if locale:
+            locale = ''
+        else:
+            locale = self.locale
+
+        client = '"client":{"device":9, "lang":"'+locale+'"}, '
+        data = '"data":{' + extras + '}'
+        body = "" + client + data
+        function_name = 'gw_fct_admin_schema_lastprocess'
+        if schema_name:
+            # Files skipped by the ledger do not set search_path, so it may point to another schema
+            self.set_process_search_path(schema_name)
+            function_name = f'"{schema_name}".{function_name}'
+        sql = ("SELECT " + function_name + "($${" + body + "}$$)::text")
+        self.log_process(sql)
+        status = self.execute_process_sql(sql)
+        if status is False:
+            self.error_count = self.error_count + 1
+            self.log_process("Last process error", parameter=self.sql_last_error)
+
+        return status
+
+
+    def load_updates_process(self, project_type, schema_name):
+        """ Execute files of functions and updates newer than current version of @schema_name """
+
+        self.schema = schema_name
+        try:
+            status = self.set_process_search_path(schema_name)
+            if status:
+                status = self.load_fct_ftrg(project_type=project_type)
+            if status:
+                status = self.update_30to31(project_type=project_type)
+            if status:
+                status = self.update_31to39(project_type=project_type)
+            if status:
+                status = self.api(project_type=project_type)
+            if status:
+                status = self.execute_last_process(schema_name=schema_name, locale=True)
+            if status:
+                status = self.create_plugin_tables(project_type, schema_name)
+        finally:
+            # Next processes read schema from main dialog again
+            self.schema = None
+
+        return status
+
+
+    def create_plugin_tables(self, project_type, schema_name):
+        """ Create tables of PLUGIN_TABLES of @project_type in @schema_name if they do not exist """
+
+        for sql in PLUGIN_TABLES.get(str(project_type), []):
+            sql = sql.format(schema_name=schema_name)
+            self.log_process(sql)
+            status = self.execute_process_sql(sql)
+            if status is False:
+                self.error_count = self.error_count + 1
+                self.log_process("Error creating plugin table", parameter=self.sql_last_error)
+                return False
+
+        return True
+
+
+    def set_process_search_path(self, schema_name):
+        """ Set search_path of the process connection to @schema_name """
+
+        sql = f'SET search_path = "{schema_name}", public'
+        status = self.execute_process_sql(sql)
+        if status is False:
+            self.error_count = self.error_count + 1
+            self.log_process("Error setting search_path", parameter=self.sql_last_error)
+
+        return status
+
+
+    def execute_process_sql(self, sql):
+        """ Execute @sql without commit. Background processes use its own connection """
+
+        if self.sql_dry_run:
+            return True
+
+        dao = self.get_sql_dao()
+        status = dao.execute_sql(sql, commit=False)
+        self.sql_last_error = dao.last_error
+
+        return status
+
+
+    def get_sql_dao(self):
+        """ Return dao where files are executed """
+        return self.sql_dao
+
+
+    def log_process(self, text, parameter=None):
+        """ Write @text into log, and into the log dialog if a background process is running """
+
+        if self.sql_dry_run:
+            return
+
+        self.log_process_info(text, parameter=parameter)
+        if self.sql_dao is not None and self.process_task is not None:
+            if parameter is not None:
+                text = f"{text}: {parameter}"
+            self.process_task.message.emit(str(text))
+
+
+    def show_process_message(self, text, message_level=1):
+        """ Show @text to the user. By default it is written into the log """
+        self.log_process_warning(text)
+
+
+    def process_folder(self, folderPath, filePattern):
+
+        try:
+            self.log_process_info(str(sorted(os.listdir(folderPath + filePattern))))
+            return True
+        except Exception:
+            return False
+
+
+    def executeFiles(self, filedir, i18n=False, no_ct=False):
+
+        if not os.path.exists(filedir):
+            self.log_process("Folder not found", parameter=filedir)
+            return True
+
+        self.log_process("Processing folder", parameter=filedir)
+        filelist = sorted(os.listdir(filedir))
+        status = True
+        schema_name = str(self.get_schema_name()).replace('"', '')
+
+        filter_srid_value = str(self.filter_srid_value).replace('"', '')
+        if i18n:
+            for file in filelist:
+                if self.is_process_canceled():
+                    return False
+                if "utils.sql" in file :
+                    self.log_process(str(filedir + os.sep + 'utils.sql'))
+                    status = self.read_execute_file(filedir, os.sep + 'utils.sql', schema_name, filter_srid_value)
+                elif str(self.project_type_selected) + ".sql" in file:
+                    self.log_process(str(filedir + os.sep + str(self.project_type_selected) + '.sql'))
+                    status = self.read_execute_file(filedir, os.sep + str(self.project_type_selected) + '.sql', schema_name, filter_srid_value)
+                if not status and self.dev_commit == 'FALSE':
+                    return False
+        else:
+            for file in filelist:
+                if self.is_process_canceled():
+                    return False
+                if ".sql" in file:
+                    if (no_ct is True and "tablect.sql" not in file) or no_ct is False:
+                        self.log_process(str(filedir + os.sep + file))
+                        status = self.read_execute_file(filedir, file, schema_name, filter_srid_value)
+                        if not status and self.dev_commit == 'FALSE':
+                            return False
+
+        return status
+
+
+    def read_execute_file(self, filedir, file, schema_name, filter_srid_value):
+
+        if self.sql_dry_run:
+            self.sql_files_total += 1
+            return True
+
+        status = False
+        f = None
+        file_path = os.path.relpath(filedir + os.sep + file, self.sql_dir).replace(os.sep, '/')
+        ledger = self.get_ledger(schema_name)
+        dao = self.get_sql_dao()
+        try:
+            f = open(filedir + os.sep + file, 'r')
+            if f:
+                f_to_read = str(f.read().replace("SCHEMA_NAME", schema_name).replace("SRID_VALUE", filter_srid_value))
+                file_hash = ledger.get_hash(f_to_read)
+                if ledger.is_applied(file_path, file_hash):
+                    ledger.skip(file_path)
+                    status = True
+                    return status
+
+                start = time()
+                status = self.execute_process_sql(str(f_to_read))
+                duration = time() - start
+                if status is False:
+                    ledger.fail(file_path, duration)
+                    self.error_count = self.error_count + 1
+                    self.log_process(str("read_execute_file error"), parameter=filedir + os.sep + file)
+                    self.log_process(str('Message: ' + str(self.sql_last_error)))
+                    if self.dev_commit == 'TRUE':
+                        dao.rollback()
+                    return False
+
+                # Ledger row is written in the same transaction than the file
+                if not ledger.record(file_path, file_hash, duration):
+                    self.log_process_warning("Error writing migration ledger", parameter=file_path)
+                    self.log_process_info(str(dao.last_error))
+
+                if self.dev_commit == 'TRUE':
+                    dao.commit()
+
+        except Exception as e:
+            self.error_count = self.error_count + 1
+            self.log_process(str("read_execute_file exception"), parameter=file)
+            self.log_process(str(e))
+            if self.dev_commit == 'TRUE':
+                dao.rollback()
+            status = False
+        finally:
+            if f:
+                f.close()
+            self.set_file_progress()
+            return status
+
+
+    def set_file_progress(self):
+        """ Report progress of the background process after executing a file """
+
+        self.sql_files_done += 1
+        if self.sql_dao is not None and self.process_task is not None and self.sql_files_total > 0:
+            self.process_task.setProgress(min(100, self.sql_files_done * 100 / self.sql_files_total))
+
+
+    def is_process_canceled(self):
+        """ Check if background process has been cancelled """
+        return self.sql_dao is not None and self.process_task is not None and self.process_task.isCanceled()
+
+
+    def get_ledger(self, schema_name):
+        """ Return MigrationLedger of @schema_name used by current process """
+
+        if self.ledger is None or self.ledger.schema_name != schema_name:
+            self.finish_ledger()
+            enabled = self.skip_applied_sql == 'TRUE' and not self.force_sql
+            dao = self.get_sql_dao()
+            self.ledger = MigrationLedger(dao, schema_name, self.version_metadata, enabled)
+            if not self.ledger.load():
+                self.log_process_warning("Error reading migration ledger", parameter=schema_name)
+                self.log_process_info(str(dao.last_error))
+
+        return self.ledger
+
+
+    def finish_ledger(self):
+        """ Log timing of files executed by current process and write them into log folder.
+        Ledger is read again by next process, as its changes may have been rolled back """
+
+        if self.ledger is None:
+            return
+
+        ledger = self.ledger
+        self.ledger = None
+        if not ledger.timings:
+            return
+
+        self.log_process_info(ledger.get_summary())
+        folder = self.get_report_folder()
+        if folder:
+            path = ledger.write_report(folder)
+            if path:
+                self.log_process_info("SQL timing report", parameter=path)
+
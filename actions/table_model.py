@@ -0,0 +1,287 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.PyQt.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+from qgis.PyQt.QtWidgets import QComboBox, QStyledItemDelegate
+
+from itertools import islice
+
+from .. import utils_giswater
+
+
+class LazyTableModel(QAbstractTableModel):
+    """ Read-mostly table model for big query results.
+    Rows are kept as tuples and fetched in batches from a server-side cursor when the view needs them
+    (canFetchMore/fetchMore). Edited values are stored apart, by primary key, so only dirty rows are saved
+    and edits survive sorting """
+
+    # Error reading rows from the cursor (received in the main thread)
+    fetch_failed = pyqtSignal(str)
+
+    def __init__(self, dao, columns, sql, pk_column, editable_columns=(), batch_size=500,
+                 cursor_name='gw_table_model_cursor'):
+        """
+        :param dao: PgDao used to open the server-side cursor
+        :param columns: Names of the columns returned by @sql, in order
+        :param sql: Query without ORDER BY clause
+        :param pk_column: Column that identifies every row
+        """
+
+        QAbstractTableModel.__init__(self)
+        self.dao = dao
+        self.columns = list(columns)
+        self.column_index = {name: i for i, name in enumerate(self.columns)}
+        self.headers = {}
+        self.sql = sql
+        self.pk_index = self.column_index[pk_column]
+        self.editable = set(self.column_index[name] for name in editable_columns if name in self.column_index)
+        self.read_only = False
+        self.batch_size = batch_size
+        self.cursor_name = cursor_name
+        self.order_by = None
+        # Values shown instead of the stored ones, by column: {column index: {value: label}}
+        self.labels = {}
+        self.rows = []
+        self.edits = {}
+        self.iterator = None
+        self.exhausted = False
+        self.last_error = None
+
+
+    def set_labels(self, column_name, values):
+        """ Show column @column_name using pairs (value, label) of @values (ie: rows id, idval) """
+
+        index = self.column_index.get(column_name)
+        if index is not None:
+            self.labels[index] = {str(value): label for value, label in values}
+
+
+    def set_read_only(self, read_only):
+        """ Enable or disable edition of editable columns """
+        self.read_only = read_only
+
+
+    def rowCount(self, parent=QModelIndex()):
+
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+
+    def columnCount(self, parent=QModelIndex()):
+
+        if parent.isValid():
+            return 0
+        return len(self.columns)
+
+
+    def get_value(self, row, column):
+        """ Return current value of cell (edited value or the one fetched from database) """
+
+        values = self.rows[row]
+        edits = self.edits.get(values[self.pk_index])
+        if edits and column in edits:
+            return edits[column]
+        return values[column]
+
+
+    def data(self, index, role=Qt.DisplayRole):
+
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+
+        value = self.get_value(index.row(), index.column())
+        if value is None:
+            return None
+        value = str(value)
+        if role == Qt.DisplayRole and index.column() in self.labels:
+            return self.labels[index.column()].get(value, value)
+        return value
+
+
+    def setData(self, index, value, role=Qt.EditRole):
+
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+
+        pk = self.rows[index.row()][self.pk_index]
+        if pk is None:
+            return False
+        original = self.rows[index.row()][index.column()]
+        edits = self.edits.setdefault(pk, {})
+        if value == original or (original is not None and str(value) == str(original)):
+            edits.pop(index.column(), None)
+            if not edits:
+                del self.edits[pk]
+        else:
+            edits[index.column()] = value
+        self.dataChanged.emit(index, index)
+        return True
+
+
+    def flags(self, index):
+
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.isValid() and not self.read_only and index.column() in self.editable:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Vertical:
+            return section + 1
+        return self.headers.get(section, self.columns[section])
+
+
+    def setHeaderData(self, section, orientation, value, role=Qt.EditRole):
+
+        if orientation != Qt.Horizontal or value in (None, ''):
+            return False
+        self.headers[section] = value
+        self.headerDataChanged.emit(orientation, section, section)
+        return True
+
+
+    def canFetchMore(self, parent=QModelIndex()):
+
+        if parent.isValid():
+            return False
+        return not self.exhausted
+
+
+    def fetchMore(self, parent=QModelIndex()):
+
+        if parent.isValid() or self.exhausted:
+            return
+
+        if self.iterator is None:
+            # Cursor WITH HOLD survives commits done in the same connection while rows are being fetched
+            self.iterator = self.dao.get_rows_iter(self.get_sql(), self.batch_size, self.cursor_name, withhold=True,
+                                                   raise_error=True)
+
+        try:
+            batch = list(islice(self.iterator, self.batch_size))
+        except Exception as e:
+            # Error of this cursor has aborted the transaction of the connection
+            self.last_error = e
+            self.exhausted = True
+            self.close()
+            self.dao.rollback()
+            self.fetch_failed.emit(str(e))
+            return
+
+        if len(batch) < self.batch_size:
+            self.exhausted = True
+            self.close()
+        if not batch:
+            return
+
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+        self.rows.extend(tuple(row) for row in batch)
+        self.endInsertRows()
+
+
+    def get_sql(self):
+        """ Return query of the model, sorted as set by method 'sort' """
+
+        sql = self.sql
+        if self.order_by is not None:
+            column, order = self.order_by
+            direction = "DESC" if order == Qt.DescendingOrder else "ASC"
+            sql += f" ORDER BY {column + 1} {direction}"
+        return sql
+
+
+    def fetch_all(self):
+        """ Fetch all pending rows """
+
+        while self.canFetchMore():
+            self.fetchMore()
+
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """ Sort in database and fetch again. Edited values are kept """
+
+        if self.order_by == (column, order):
+            return
+        self.order_by = (column, order)
+        self.refresh()
+
+
+    def refresh(self):
+        """ Discard fetched rows and query them again """
+
+        self.beginResetModel()
+        self.close()
+        self.rows = []
+        self.exhausted = False
+        self.endResetModel()
+
+
+    def close(self):
+        """ Close server-side cursor """
+
+        if self.iterator is not None:
+            self.iterator.close()
+            self.iterator = None
+
+
+    def get_dirty_rows(self):
+        """ Return list of tuples (pk, {column name: value}) of edited rows """
+
+        return [(pk, {self.columns[column]: value for column, value in edits.items()})
+                for pk, edits in self.edits.items()]
+
+
+    def clear_edits(self):
+        """ Forget edited values (ie: after saving them) """
+        self.edits = {}
+
+
+class ComboItemDelegate(QStyledItemDelegate):
+    """ Edit a column of a table with a QComboBox. Only one editor exists at a time, instead of one widget
+    per row """
+
+    def __init__(self, values, parent=None, label_column=None):
+        """
+        :param values: Rows (id, idval) to populate the combo
+        :param label_column: If set, idval of the selected item is also written into this column
+        """
+
+        QStyledItemDelegate.__init__(self, parent)
+        self.values = values
+        self.label_column = label_column
+
+
+    def createEditor(self, parent, option, index):
+
+        combo = QComboBox(parent)
+        utils_giswater.set_item_data(combo, self.values, 1)
+        combo.activated.connect(lambda: self.commitData.emit(combo))
+        return combo
+
+
+    def setEditorData(self, editor, index):
+
+        value = index.data(Qt.EditRole)
+        if not utils_giswater.set_combo_itemData(editor, str(value), 0):
+            utils_giswater.set_combo_itemData(editor, str(value), 1)
+
+
+    def setModelData(self, editor, model, index):
+
+        elem = editor.itemData(editor.currentIndex())
+        if not elem:
+            return
+        model.setData(index, elem[0])
+        if self.label_column is not None:
+            model.setData(index.sibling(index.row(), self.label_column), elem[1])
+
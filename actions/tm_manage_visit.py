@@ -341,19 +341,23 @@ class TmManageVisit(TmParentManage, QObject):
 
         # for each showed element of a specific geom_type create an db entry
         column_name = self.geom_type + "_id"
+        next_id = db_record.max_pk() + 1
+        records = []
         for row in range(self.tbl_relation.model().rowCount()):
             # get modelIndex to get data
             index = self.tbl_relation.model().index(row, 0)
 
             # set common fields
-            db_record.id = db_record.max_pk() + 1
-            db_record.visit_id = int(self.visit_id.text())
+            record = db_record.__class__(self.controller)
+            record.id = next_id + row
+            record.visit_id = int(self.visit_id.text())
 
             # set value for column <geom_type>_id
-            setattr(db_record, column_name, index.data())
+            setattr(record, column_name, index.data())
+            records.append(record)
 
-            # than save the showed records
-            db_record.upsert(commit=self.autocommit)
+        # than save the showed records in a single transaction
+        db_record.upsert_many(self.controller, records, commit=self.autocommit)
 
 
     def manage_tab_changed(self, index):
@@ -464,7 +468,7 @@ class TmManageVisit(TmParentManage, QObject):
         # do selection allowing the tbl_relation to be linked to canvas selectionChanged
         self.disconnect_signal_selection_changed()
         self.connect_signal_selection_changed(self.tbl_relation)
-        self.select_features_by_ids(self.geom_type, expr)
+        self.select_features_by_ids(self.geom_type, expr, ids)
         self.disconnect_signal_selection_changed()
 
 
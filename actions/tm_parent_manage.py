@@ -175,13 +175,17 @@ class TmParentManage(TmParentAction, object):
         self.lazy_init_function = init_function
         
 
-    def select_features_by_ids(self, geom_type, expr):
-        """ Select features of layers of group @geom_type applying @expr """
+    def select_features_by_ids(self, geom_type, expr, ids=None):
+        """ Select features of layers of group @geom_type applying @expr.
+        If @ids (values of field '@geom_type_id') are set, features are selected through the feature id index """
 
         # Build a list of feature id's and select them
+        field_id = geom_type + "_id"
         for layer in self.layers[geom_type]:
             if expr is None:
                 layer.removeSelection()
+            elif ids is not None and self.controller.select_by_business_ids(layer, ids, field_id) is not None:
+                continue
             else:
                 it = layer.getFeatures(QgsFeatureRequest(expr))
                 id_list = [i.id() for i in it]
@@ -261,7 +265,7 @@ class TmParentManage(TmParentAction, object):
 
         # Select features with previous filter
         # Build a list of feature id's and select them
-        self.select_features_by_ids(self.geom_type, expr)
+        self.select_features_by_ids(self.geom_type, expr, self.ids)
 
         # Update list
         self.list_ids[self.geom_type] = self.ids
@@ -322,7 +326,7 @@ class TmParentManage(TmParentAction, object):
             if not is_valid:
                 return
 
-            self.select_features_by_ids(geom_type, expr)
+            self.select_features_by_ids(geom_type, expr, self.ids)
 
         # Reload contents of table 'tbl_@table_object_x_@geom_type'
         self.reload_table(qtable, self.geom_type, expr_filter)
@@ -375,12 +379,7 @@ class TmParentManage(TmParentAction, object):
             return
 
         # Select features with previous filter
-        # Build a list of feature id's and select them
-        for layer in self.layers[self.geom_type]:
-            it = layer.getFeatures(QgsFeatureRequest(expr))
-            id_list = [i.id() for i in it]
-            if len(id_list) > 0:
-                layer.selectByIds(id_list)
+        self.select_features_by_ids(self.geom_type, expr, self.ids)
 
         # Reload contents of table 'tbl_???_x_@geom_type'
         self.reload_table(table_object, self.geom_type, expr_filter)
@@ -236,13 +236,17 @@ class TmPlanningUnit(TmParentAction):
         self.iface.actionPan().trigger()
 
 
-    def select_features_by_ids(self, geom_type, expr):
-        """ Select features of layers of group @geom_type applying @expr """
+    def select_features_by_ids(self, geom_type, expr, ids=None):
+        """ Select features of layers of group @geom_type applying @expr.
+        If @ids (values of field '@geom_type_id') are set, features are selected through the feature id index """
 
         # Build a list of feature id's and select them
+        field_id = geom_type + "_id"
         for layer in self.layers[geom_type]:
             if expr is None:
                 layer.removeSelection()
+            elif ids is not None and self.controller.select_by_business_ids(layer, ids, field_id) is not None:
+                continue
             else:
                 it = layer.getFeatures(QgsFeatureRequest(expr))
                 id_list = [i.id() for i in it]
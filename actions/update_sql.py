@@ -10,7 +10,7 @@ from qgis.core import Qgis, QgsVectorLayer, QgsProject, QgsTask, QgsApplication
 from qgis.gui import QgsDateTimeEdit
 from qgis.utils import reloadPlugin
 
-from qgis.PyQt.QtCore import QSettings, Qt, QDate
+from qgis.PyQt.QtCore import QSettings, Qt
 from qgis.PyQt.QtGui import QPixmap
 from qgis.PyQt.QtSql import QSqlTableModel
 from qgis.PyQt.QtWidgets import QRadioButton, QPushButton, QTableView, QAbstractItemView, QTextEdit, QFileDialog, \
@@ -27,23 +27,26 @@ import xml.etree.cElementTree as ET
 
 from collections import OrderedDict
 from functools import partial
-from time import sleep
+from time import sleep, time
 
 
 from .. import utils_giswater
 from .api_parent import ApiParent
 from .create_gis_project import CreateGisProject
-from ..ui_manager import Readsql, InfoShowInfo, ReadsqlCreateProject, ReadsqlRename, ReadsqlShowInfo, \
+from ..ui_manager import Readsql, InfoShowInfo, ReadsqlCreateProject, ReadsqlRename, ReadsqlShowInfo, ReadsqlLog, \
     ReadsqlCreateGisProject, ApiImportInp, ManageFields, ManageVisitClass, ManageVisitParam, ManageSysFields, Credentials
+from .csv2pg import Csv2PgCopyWriter, iter_inp_rows
 from .gw_task import GwTask
+from .sql_process import SqlProcess
 
-class UpdateSQL(ApiParent):
+class UpdateSQL(ApiParent, SqlProcess):
 
     def __init__(self, iface, settings, controller, plugin_dir):
         """ Class to control toolbar 'om_ws' """
 
         # Initialize instance attributes
         ApiParent.__init__(self, iface, settings, controller, plugin_dir)
+        SqlProcess.__init__(self)
         self.iface = iface
         self.settings = settings
         self.controller = controller
@@ -55,6 +58,9 @@ class UpdateSQL(ApiParent):
     def init_sql(self):
         """ Button 100: Execute SQL. Info show info """
 
+        if self.is_process_running():
+            return
+
         # Declare variable superusers
         self.super_users = []
 
@@ -109,6 +115,7 @@ class UpdateSQL(ApiParent):
             self.dev_user = self.settings.value('system_variables/devoloper_mode').upper()
             self.read_all_updates = self.settings.value('system_variables/read_all_updates').upper()
             self.dev_commit = self.settings.value('system_variables/dev_commit').upper()
+            self.skip_applied_sql = str(self.settings.value('system_variables/skip_applied_sql', 'TRUE')).upper()
 
             # Get plugin version from metadata.txt file
             self.plugin_version = self.get_plugin_version()
@@ -424,820 +431,193 @@ class UpdateSQL(ApiParent):
                 self.controller.execute_sql(sql)
 
 
-    """ Declare all read sql process """
-
-    def load_base(self, project_type=False):
-
-        if str(project_type) in ('ws', 'ud'):
-
-            folder = self.folderUtils + self.file_pattern_ddl
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderUtils + self.file_pattern_dml
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderUtils + self.file_pattern_fct
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-            folder = self.folderUtils + self.file_pattern_ftrg
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderSoftware + self.file_pattern_ddl
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderSoftware + self.file_pattern_ddlrule
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderSoftware + self.file_pattern_dml
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderSoftware + self.file_pattern_tablect
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderSoftware + self.file_pattern_fct
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderSoftware + self.file_pattern_ftrg
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderUtils + self.file_pattern_tablect
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderUtils + self.file_pattern_ddlrule
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            if self.process_folder(self.folderLocale, '') is False:
-                if self.process_folder(self.sql_dir + os.sep + 'i18n' + os.sep, 'EN') is False:
-                    return False
-                else:
-                    status = self.executeFiles(self.sql_dir + os.sep + 'i18n' + os.sep + 'EN', True)
-                    if status is False and self.dev_commit == 'FALSE':
-                        return False
-            else:
-                status = self.executeFiles(self.folderLocale, True)
-                if status is False and self.dev_commit == 'FALSE':
-                    return False
-
-        elif str(project_type) in ('pl', 'tm'):
-
-            folder = self.folderSoftware + self.file_pattern_ddl
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderSoftware + self.file_pattern_ddlrule
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderSoftware + self.file_pattern_dml
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderSoftware + self.file_pattern_fct
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderSoftware + self.file_pattern_ftrg
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            folder = self.folderSoftware + self.file_pattern_tablect
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-            cmb_locale = utils_giswater.getWidgetText(self.dlg_readsql, self.cmb_locale)
-            folder_i18n = self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'i18n'
-            if self.process_folder(folder_i18n + os.sep + self.locale + os.sep, '') is False:
-                if self.process_folder(folder_i18n + os.sep, 'EN') is False:
-                    return False
-                else:
-                    status = self.executeFiles(folder_i18n + os.sep + 'EN', True)
-                    if status is False and self.dev_commit == 'FALSE':
-                        return False
-            else:
-                status = self.executeFiles(folder_i18n + os.sep + cmb_locale + os.sep, True)
-                if status is False and self.dev_commit == 'FALSE':
-                    return False
-
-        return True
-
-
-    def update_31to39(self, new_project=False, project_type=False, no_ct=False):
-
-        if str(project_type) in ('ws', 'ud'):
-
-            if not os.path.exists(self.folderUpdates):
-                self.controller.show_message("The update folder was not found in sql folder.", 1)
-                self.error_count = self.error_count + 1
-                return
-            folders = sorted(os.listdir(self.folderUpdates + ''))
-            for folder in folders:
-                sub_folders = sorted(os.listdir(self.folderUpdates + folder))
-                for sub_folder in sub_folders:
-                    if new_project:
-                        if self.read_all_updates == 'TRUE':
-                            if str(sub_folder) > '31100':
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep):
-                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep, no_ct=no_ct)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep, ''):
-                                    status = self.load_sql(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep, no_ct=no_ct)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                        self.locale + os.sep), '') is True:
-                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), True)
-                                    if status is False:
-                                        return False
-                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN'):
-                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
-                                    if status is False:
-                                        return False
-
-                        else:
-                            if str(sub_folder) > '31100' and str(sub_folder) <= str(self.version_metadata).replace('.', ''):
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder,  os.sep + 'utils' + os.sep):
-                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep, no_ct=no_ct)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep, ''):
-                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep, no_ct=no_ct)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), ''):
-                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), True)
-                                    if status is False:
-                                        return False
-                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN'):
-                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
-                                    if status is False:
-                                        return False
-
-                    else:
-                        if self.read_all_updates == 'TRUE':
-                            if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) > '31100':
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
-                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep,
-                                        '') is True:
-                                    status = self.load_sql(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
-                                        '') is True:
-                                    status = self.executeFiles(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                            self.locale + os.sep), True)
-                                    if status is False:
-                                        return False
-                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
-                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
-                                    if status is False:
-                                        return False
-
-                        else:
-                            if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) > '31100' and str(sub_folder) <= str(self.version_metadata).replace('.', ''):
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
-                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep,
-                                        '') is True:
-                                    status = self.load_sql(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),'') is True:
-                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), True)
-                                    if status is False:
-                                        return False
-                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
-                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
-                                    if status is False:
-                                        return False
-
-        else:
-
-            if not os.path.exists(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + ''):
-                return
-            folders = sorted(os.listdir(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + ''))
-            for folder in folders:
-                sub_folders = sorted(os.listdir(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder))
-                for sub_folder in sub_folders:
-                    if new_project:
-                        if self.read_all_updates == 'TRUE':
-                            if str(sub_folder) > '31100':
-                                if self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), '') is True:
-                                    status = self.executeFiles(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep), True)
-                                    if status is False:
-                                        return False
-                                elif self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', '') is True:
-                                    status = self.executeFiles(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
-                                    if status is False:
-                                        return False
-
-                        else:
-                            if str(sub_folder) > '31100' and str(sub_folder) <= str(self.version_metadata).replace('.',''):
-                                if self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder,
-                                                       '') is True:
-                                    status = self.load_sql(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                        self.locale + os.sep), '') is True:
-                                    status = self.executeFiles(self.sql_dir + os.sep + str(
-                                        project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                        self.locale + os.sep), True)
-                                elif self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
-                                    status = self.executeFiles(self.sql_dir + os.sep + str(project_type) + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'EN', True)
-                                    if status is False:
-                                        return False
-
-                    else:
-                        if self.read_all_updates == 'TRUE':
-                            if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) > '31100':
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
-                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type + os.sep,
-                                        '') is True:
-                                    status = self.load_sql(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type + os.sep)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),'') is True:
-                                    status = self.executeFiles(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                            self.locale + os.sep), True)
-                                    if status is False:
-                                        return False
-                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
-                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
-                                    if status is False:
-                                        return False
-
-                        else:
-                            if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) > '31100' and str(sub_folder) <= str(self.version_metadata).replace('.', ''):
-                                if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
-                                    status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type + os.sep,
-                                        '') is True:
-                                    status = self.load_sql(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type + os.sep)
-                                    if status is False:
-                                        return False
-                                if self.process_folder(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
-                                        '') is True:
-                                    status = self.executeFiles(
-                                        self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                            self.locale + os.sep), True)
-                                    if status is False:
-                                        return False
-                                elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
-                                    status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
-                                    if status is False:
-                                        return False
-
-        return True
-
+    """ Functions execute process """
 
-    def load_views(self, project_type=False):
+    def execute_import_data(self, schema_type=''):
 
-        if str(project_type) == 'ws' or str(project_type) == 'ud':
-            folder = self.folderSoftware + self.file_pattern_ddlview
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
+        # Create dialog
+        self.dlg_import_inp = ApiImportInp()
+        self.load_settings(self.dlg_import_inp)
 
-            folder = self.folderUtils + self.file_pattern_ddlview
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
+        self.dlg_import_inp.progressBar.setVisible(False)
 
+        if schema_type.lower() == 'ws':
+            extras = '"filterText":"Import inp epanet file"'
+        elif schema_type.lower() == 'ud':
+            extras = '"filterText":"Import inp swmm file"'
         else:
-            folder = self.folderSoftware + self.file_pattern_ddlview
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-        return True
-
-
-    def update_30to31(self, new_project=False, project_type=False):
+            self.error_count = self.error_count + 1
+            return
 
-        if str(project_type) == 'ws' or str(project_type) == 'ud':
+        extras += ', "isToolbox":false'
+        body = self.create_body(extras=extras)
+        sql = ("SELECT gw_api_gettoolbox($${" + body + "}$$)::text")
+        row = self.controller.get_row(sql, log_sql=True, commit=False)
+        if not row or row[0] is None:
+            self.controller.show_message("No results for: " + sql, 2)
+            return False
+        complet_result = [json.loads(row[0], object_pairs_hook=OrderedDict)]
+        status = self.populate_functions_dlg(self.dlg_import_inp, complet_result[0]['body']['data'])
 
-            if not os.path.exists(self.folderUpdates):
-                self.controller.show_message("The update folder was not found in sql folder.", 1)
-                self.error_count = self.error_count + 1
-                return True
+        # Set listeners
+        self.dlg_import_inp.btn_run.clicked.connect(partial(self.execute_import_inp, accepted=True, schema_type=schema_type))
+        self.dlg_import_inp.btn_close.clicked.connect(partial(self.execute_import_inp, accepted=False))
 
-            folders = sorted(os.listdir(self.folderUpdates + ''))
-            for folder in folders:
-                sub_folders = sorted(os.listdir(self.folderUpdates + folder))
-                for sub_folder in sub_folders:
-                    if new_project:
-                        if str(sub_folder) <= '31100':
-                            if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
-                                status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
-                                if status is False:
-                                    return False
-                            if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep, '') is True:
-                                status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + project_type + os.sep)
-                                if status is False:
-                                    return False
-                            if self.process_folder(
-                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
-                                    '') is True:
-                                status = self.executeFiles(
-                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                        self.locale + os.sep), True)
-                                if status is False:
-                                    return False
-                            elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is False:
-                                status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
-                                if status is False:
-                                    return False
-                    else:
-                        if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) <= '31100':
-                            if self.process_folder(self.folderUpdates + folder + os.sep + sub_folder, os.sep + 'utils' + os.sep) is True:
-                                status = self.load_sql(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep)
-                                if status is False:
-                                    return False
-                            if self.process_folder(
-                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep,
-                                    '') is True:
-                                status = self.load_sql(
-                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + self.project_type_selected + os.sep)
-                                if status is False:
-                                    return False
-                            if self.process_folder(
-                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
-                                    '') is True:
-                                status = self.executeFiles(
-                                    self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                        self.locale + os.sep), True)
-                                if status is False:
-                                    return False
-                            elif self.process_folder(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', '') is True:
-                                status = self.executeFiles(self.folderUpdates + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN', True)
-                                if status is False:
-                                    return False
+        # Open dialog
+        self.open_dialog(self.dlg_import_inp)
 
-        else:
 
-            if not os.path.exists(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + ''):
-                return True
+    def start_process(self, description, process, on_finished):
+        """ Execute @process (callable) in a background task with its own database connection, showing its
+        progress and log in a dialog. Main connection stays free while it runs
+        :param on_finished: Callable executed in the main thread when the process ends (task, result)
+        """
 
-            folders = sorted(os.listdir(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + ''))
-            for folder in folders:
-                sub_folders = sorted(os.listdir(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder))
-                for sub_folder in sub_folders:
-                    if new_project:
-                        if str(sub_folder) <= '31100':
-                            if self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder, '') is True:
-                                status = self.load_sql(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + '')
-                                if status is False:
-                                    return False
-                            if self.process_folder(
-                                    self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
-                                    '') is True:
-                                status = self.executeFiles(self.sql_dir + os.sep + str(
-                                    project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                    self.locale + os.sep), True)
-                                if status is False:
-                                    return False
-                            elif self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
-                                status = self.executeFiles(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep, True)
-                                if status is False:
-                                    return False
+        if self.is_process_running():
+            return
 
-                    else:
-                        if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) <= '31100':
-                            if self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder, '') is True:
-                                status = self.load_sql(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + '')
-                                if status is False:
-                                    return False
-                            if self.process_folder(
-                                    self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
-                                    '') is True:
-                                status = self.executeFiles(self.sql_dir + os.sep + str(
-                                    project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                    self.locale + os.sep), True)
-                                if status is False:
-                                    return False
-                            elif self.process_folder(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
-                                status = self.executeFiles(self.sql_dir + os.sep + str(project_type) + os.sep + os.sep + 'updates' + os.sep + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep, True)
-                                if status is False:
-                                    return False
+        # Ledger of a previous process is read again from the connection of this one
+        self.finish_ledger()
 
-        return True
+        self.dlg_readsql_log = ReadsqlLog()
+        self.load_settings(self.dlg_readsql_log)
+        self.dlg_readsql_log.setWindowTitle(description)
+        self.dlg_readsql_log.lbl_process.setText(description)
 
+        task = GwTask(description, function=partial(self.execute_process, process),
+                      on_finished=partial(self.process_finished, on_finished), on_cancel=self.cancel_process)
+        task.message.connect(self.dlg_readsql_log.txt_infolog.appendPlainText)
+        task.progressChanged.connect(partial(self.set_process_progress, self.dlg_readsql_log))
+        self.dlg_readsql_log.btn_cancel.clicked.connect(task.cancel)
+        self.dlg_readsql_log.btn_close.clicked.connect(partial(self.close_dialog, self.dlg_readsql_log))
+        self.open_dialog(self.dlg_readsql_log)
 
-    def load_sample_data(self, project_type=False):
+        # Actions of main dialog would use the connection and state of the process
+        self.dlg_readsql.setEnabled(False)
+        self.process_task = task
+        QgsApplication.taskManager().addTask(task)
 
-        sql = 'UPDATE ' + self.schema + '.version SET sample=True ' \
-              'WHERE id = (SELECT id FROM ' + self.schema + '.version ORDER BY id DESC LIMIT 1)'
-        self.controller.execute_sql(sql, commit=False)
 
-        if str(project_type) == 'ws' or str(project_type) == 'ud':
-            folder = self.folderExemple + 'user' + os.sep+project_type
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
+    def is_process_running(self):
+        """ Check if a background process is running. Its state (connection, schema, ledger, errors...)
+        is stored in this instance, so no other action can be executed until it ends """
 
-        else:
-            folder = self.folderSoftware + 'example' + os.sep + 'user' + os.sep
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
+        if self.process_task is None:
+            return False
 
+        self.controller.show_warning("Another process is running")
         return True
 
 
-    def load_dev_data(self, project_type=False):
+    def execute_process(self, process, task):
+        """ Execute @process with a dedicated connection. Executed by a background task.
+        Changes are committed if it ends without errors, otherwise (or if @task is cancelled) they are rolled back
+        """
 
-        if str(project_type) == 'ws' or str(project_type) == 'ud':
-            folder = self.folderExemple + 'dev' + os.sep + project_type
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-        else:
-            folder = self.folderSoftware + 'example' + os.sep + 'dev' + os.sep
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
+        with self.controller.get_task_dao() as dao:
+            self.sql_dao = dao
+            try:
+                # Walk the process without executing anything to know how many files will be executed
+                error_count = self.error_count
+                self.sql_dry_run = True
+                self.sql_files_total = 0
+                process()
+                self.sql_dry_run = False
+                self.error_count = error_count
+                self.sql_files_done = 0
+                self.log_process(f"Files to execute: {self.sql_files_total}")
+
+                status = process()
+                if status is False or self.error_count > 0 or task.isCanceled():
+                    dao.rollback()
+                    return False
 
-        return True
+                dao.commit()
+                return True
 
+            finally:
+                self.finish_ledger()
+                self.sql_dry_run = False
+                self.sql_dao = None
 
-    def load_fct_ftrg(self, project_type=False):
 
-        if str(project_type) == 'ws' or str(project_type) == 'ud':
-            folder = self.folderUtils + self.file_pattern_fct
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
+    def cancel_process(self, task):
+        """ Cancel statement being executed by the background process. Its transaction is rolled back """
 
-            folder = self.folderUtils + self.file_pattern_ftrg
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
+        dao = self.sql_dao
+        if dao is not None:
+            dao.cancel()
 
-            folder = self.folderSoftware + self.file_pattern_fct
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
 
-            folder = self.folderSoftware + self.file_pattern_ftrg
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
+    def set_process_progress(self, dialog, progress):
+        dialog.progressBar.setValue(int(progress))
 
-        else:
-            folder = self.folderSoftware + self.file_pattern_fct
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
 
-            folder = self.folderSoftware + self.file_pattern_ftrg
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
+    def process_finished(self, on_finished, task, result):
 
-        return True
+        self.process_task = None
+        self.dlg_readsql.setEnabled(True)
+        self.dlg_readsql_log.btn_cancel.setEnabled(False)
+        self.dlg_readsql_log.btn_close.setEnabled(True)
+        if task.exception is not None:
+            self.controller.log_warning("Process exception", parameter=str(task.exception))
+            self.dlg_readsql_log.txt_infolog.appendPlainText(f"Exception: {task.exception}")
+        elif task.isCanceled():
+            self.dlg_readsql_log.txt_infolog.appendPlainText("Process cancelled. Changes have been rolled back")
 
+        # Processes cancelled or stopped by an exception are managed as failed ones
+        if not result and self.error_count == 0:
+            self.error_count = 1
 
-    def load_tablect(self, project_type=False):
+        on_finished(task, result)
 
-        if str(project_type) == 'ws' or str(project_type) == 'ud':
-            folder = self.folderSoftware + self.file_pattern_tablect
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
 
-            folder = self.folderUtils + self.file_pattern_tablect
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
+    def get_sql_dao(self):
+        """ Return dao where files are executed: connection of the background process or main one """
+        return self.controller.dao if self.sql_dao is None else self.sql_dao
 
-        else:
-            folder = self.folderSoftware + self.file_pattern_tablect
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
 
-        return True
+    def execute_process_sql(self, sql):
 
+        if self.sql_dry_run or self.sql_dao is not None:
+            return SqlProcess.execute_process_sql(self, sql)
 
-    def load_trg(self, project_type=False):
+        status = self.controller.execute_sql(sql, commit=False)
+        self.sql_last_error = self.controller.last_error
+        return status
 
-        if str(project_type) == 'ws' or str(project_type) == 'ud':
-            folder = self.folderUtils + self.file_pattern_trg
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
 
-            folder = self.folderSoftware + self.file_pattern_trg
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
+    def show_process_message(self, text, message_level=1):
+        """ Show @text in message bar. Background processes write it into its log instead """
 
+        if self.sql_dao is None:
+            self.controller.show_message(text, message_level)
         else:
-            folder = self.folderSoftware + self.file_pattern_trg
-            status = self.executeFiles(folder)
-            if not status and self.dev_commit == 'FALSE':
-                return False
-
-        return True
-
-
-    def load_sql(self, path_folder, no_ct=False):
-
-        for (path, ficheros, archivos) in os.walk(path_folder):
-            status = self.executeFiles(path, no_ct=no_ct)
-            if not status:
-                return False
-
-        return True
-
-
-    def api(self, new_api=False, project_type=False):
-
-        folder = self.folderApi + self.file_pattern_ftrg
-        status = self.executeFiles(folder)
-        if not status and self.dev_commit == 'FALSE':
-            return False
-
-        folder = self.folderApi + self.file_pattern_fct
-        status = self.executeFiles(folder)
-        if not status and self.dev_commit == 'FALSE':
-            return False
-
-        if not os.path.exists(self.folderUpdatesApi):
-            self.controller.show_message("The api folder was not found in sql folder.", 1)
-            self.error_count = self.error_count + 1
-            return
-
-        folders = sorted(os.listdir(self.folderUpdatesApi + ''))
-        self.controller.log_info(str(folders))
-        for folder in folders:
-            sub_folders = sorted(os.listdir(self.folderUpdatesApi + folder))
-            for sub_folder in sub_folders:
-                if new_api:
-                    if self.read_all_updates == 'TRUE':
-                        if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep, '') is True:
-                            status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep + '')
-                            if status is False:
-                                return False
-                        if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep, '') is True:
-                            status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep + '')
-                            if status is False:
-                                return False
-                        if self.process_folder(
-                                self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
-                                '') is True:
-                            status = self.executeFiles(
-                                self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                    self.locale + os.sep), True)
-                            if status is False:
-                                return False
-                        elif self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
-                            status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep, True)
-                            if status is False:
-                                return False
-                        if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_trg) is True:
-                            status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_trg)
-                            if status is False:
-                                return False
-                        if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_tablect) is True:
-                            status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_tablect)
-                            if status is False:
-                                return False
-                    else:
-                        if str(sub_folder) <= str(self.version_metadata).replace('.', ''):
-                            if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep,
-                                                   '') is True:
-                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep + '')
-                                if status is False:
-                                    return False
-                            if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep,
-                                                   '') is True:
-                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep + '')
-                                if status is False:
-                                    return False
-                            if self.process_folder(
-                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                        self.locale + os.sep),
-                                    '') is True:
-                                status = self.executeFiles(
-                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                        self.locale + os.sep), True)
-                                if status is False:
-                                    return False
-                            elif self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep,
-                                                   'EN') is True:
-                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep,
-                                    True)
-                                if status is False:
-                                    return False
-                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_trg) is True:
-                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_trg)
-                                if status is False:
-                                    return False
-                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_tablect) is True:
-                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_tablect)
-                                if status is False:
-                                    return False
-
-                else:
-                    if self.read_all_updates == 'TRUE':
-                        if str(sub_folder) > str(self.project_data_schema_version).replace('.', ''):
-                            if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep, '') is True:
-                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep + '')
-                                if status is False:
-                                    return False
-                            if self.process_folder(
-                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep,
-                                    '') is True:
-                                status = self.executeFiles(
-                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep + '')
-                                if status is False:
-                                    return False
-                            if self.process_folder(
-                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(self.locale + os.sep),
-                                    '') is True:
-                                status = self.executeFiles(
-                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                        self.locale + os.sep), True)
-                                if status is False:
-                                    return False
-                            elif self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep, 'EN') is True:
-                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep, True)
-                                if status is False:
-                                    return False
-                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_trg) is True:
-                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_trg)
-                                if status is False:
-                                    return False
-                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_tablect) is True:
-                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_tablect)
-                                if status is False:
-                                    return False
-                    else:
-                        if str(sub_folder) > str(self.project_data_schema_version).replace('.', '') and str(sub_folder) <= str(self.version_metadata).replace('.',''):
-                            if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep,
-                                                   '') is True:
-                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'utils' + os.sep + '')
-                                if status is False:
-                                    return False
-                            if self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep,
-                                                   '') is True:
-                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + project_type + os.sep + '')
-                                if status is False:
-                                    return False
-                            if self.process_folder(
-                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                        self.locale + os.sep),
-                                    '') is True:
-                                status = self.executeFiles(
-                                    self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + str(
-                                        self.locale + os.sep), True)
-                                if status is False:
-                                    return False
-                            elif self.process_folder(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep,
-                                                   'EN') is True:
-                                status = self.executeFiles(self.folderUpdatesApi + folder + os.sep + sub_folder + os.sep + 'i18n' + os.sep + 'EN' + os.sep,
-                                    True)
-                                if status is False:
-                                    return False
-                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_trg) is True:
-                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_trg)
-                                if status is False:
-                                    return False
-                            if self.process_folder(self.sql_dir + os.sep + 'api' + os.sep, self.file_pattern_tablect) is True:
-                                status = self.executeFiles(self.sql_dir + os.sep + 'api' + os.sep + self.file_pattern_tablect)
-                                if status is False:
-                                    return False
-
-        return True
+            self.log_process(text)
 
 
-    """ Functions execute process """
+    def log_process_info(self, text, parameter=None):
+        self.controller.log_info(text, parameter=parameter)
 
-    def execute_import_data(self, schema_type=''):
 
-        # Create dialog
-        self.dlg_import_inp = ApiImportInp()
-        self.load_settings(self.dlg_import_inp)
-
-        self.dlg_import_inp.progressBar.setVisible(False)
-
-        if schema_type.lower() == 'ws':
-            extras = '"filterText":"Import inp epanet file"'
-        elif schema_type.lower() == 'ud':
-            extras = '"filterText":"Import inp swmm file"'
-        else:
-            self.error_count = self.error_count + 1
-            return
+    def log_process_warning(self, text, parameter=None):
+        self.controller.log_warning(text, parameter=parameter)
 
-        extras += ', "isToolbox":false'
-        body = self.create_body(extras=extras)
-        sql = ("SELECT gw_api_gettoolbox($${" + body + "}$$)::text")
-        row = self.controller.get_row(sql, log_sql=True, commit=False)
-        if not row or row[0] is None:
-            self.controller.show_message("No results for: " + sql, 2)
-            return False
-        complet_result = [json.loads(row[0], object_pairs_hook=OrderedDict)]
-        status = self.populate_functions_dlg(self.dlg_import_inp, complet_result[0]['body']['data'])
 
-        # Set listeners
-        self.dlg_import_inp.btn_run.clicked.connect(partial(self.execute_import_inp, accepted=True, schema_type=schema_type))
-        self.dlg_import_inp.btn_close.clicked.connect(partial(self.execute_import_inp, accepted=False))
+    def get_schema_name(self):
+        """ Return schema being processed, or the one selected in main dialog """
 
-        # Open dialog
-        self.open_dialog(self.dlg_import_inp)
+        if self.schema is None:
+            return utils_giswater.getWidgetText(self.dlg_readsql, self.dlg_readsql.project_schema_name)
+        return self.schema
 
 
-    def execute_last_process(self, new_project=False, schema_name='', schema_type='', locale=False):
-        """ Execute last process function """
+    def get_current_user(self):
+        return self.controller.current_user
 
-        if new_project is True:
-            extras = '"isNewProject":"' + str('TRUE') + '", '
-        else:
-            extras = '"isNewProject":"' + str('FALSE') + '", '
-        extras += '"gwVersion":"' + str(self.version_metadata) + '", '
-        extras += '"projectType":"' + str(schema_type).upper() + '", '
-        extras += '"epsg":' + str(self.filter_srid_value).replace('"', '')
-        if new_project is True:
-            if str(self.title) != 'null':
-                extras += ', ' + '"title":"' + str(self.title) + '"'
-            extras += ', ' + '"author":"' + str(self.controller.current_user) + '"'
-            current_date = QDate.currentDate().toString('dd-MM-yyyy')
-            extras += ', ' + '"date":"' + str(current_date) + '"'
-
-        extras += ', "superUsers":' + str(self.super_users).replace("'",'"') + ''
-
-        self.schema_name = schema_name
-
-        # Get current locale
-        if locale:
-            locale = ''
-        else:
-            locale = utils_giswater.getWidgetText(self.dlg_readsql_create_project,
-                                                  self.dlg_readsql_create_project.cmb_locale)
-
-        client = '"client":{"device":9, "lang":"'+locale+'"}, '
-        data = '"data":{' + extras + '}'
-        body = "" + client + data
-        sql = ("SELECT gw_fct_admin_schema_lastprocess($${" + body + "}$$)::text")
-        status = self.controller.execute_sql(sql, log_sql=True, commit=False)
-        if status is False:
-            self.error_count = self.error_count + 1
 
-        return status
+    def get_report_folder(self):
+        return self.controller.get_log_folder() if self.controller.logger else None
 
 
     def task_started(self, task, wait_time):
@@ -1305,6 +685,9 @@ class UpdateSQL(ApiParent):
 
     def create_project_data_schema(self):
 
+        if self.is_process_running():
+            return
+
         # Save user values
         project_name_schema = utils_giswater.getWidgetText(self.dlg_readsql_create_project, 'project_name')
         project_title_schema = utils_giswater.getWidgetText(self.dlg_readsql_create_project, 'project_title')
@@ -1364,10 +747,6 @@ class UpdateSQL(ApiParent):
         project_type = utils_giswater.getWidgetText(self.dlg_readsql_create_project, 'cmb_create_project_type')
         self.locale = utils_giswater.getWidgetText(self.dlg_readsql_create_project, 'cmb_locale')
 
-        self.task1 = GwTask('Manage schema')
-        QgsApplication.taskManager().addTask(self.task1)
-        self.task1.setProgress(0)
-
         # Initial checks
         if self.rdb_import_data.isChecked():
             self.file_inp = utils_giswater.getWidgetText(self.dlg_readsql_create_project, 'data_file')
@@ -1375,6 +754,7 @@ class UpdateSQL(ApiParent):
                 msg = "The 'Path' field is required for Import INP data."
                 self.controller.show_info_box(msg, "Info")
                 return
+            create_schema_type = 'rdb_import_data'
 
         elif self.rdb_sample.isChecked() or self.rdb_sample_dev.isChecked():
             if self.locale != 'EN' or self.filter_srid_value != '25831':
@@ -1383,83 +763,84 @@ class UpdateSQL(ApiParent):
                 result = self.controller.ask_question(msg, "Info Message")
                 if result:
                     self.filter_srid_value = '25831'
+                    self.locale = 'EN'
                     utils_giswater.setWidgetText(self.dlg_readsql_create_project, 'srid_id', '25831')
                     utils_giswater.setWidgetText(self.dlg_readsql_create_project, 'cmb_locale', 'EN')
-                    self.task1 = GwTask('Manage schema')
-                    QgsApplication.taskManager().addTask(self.task1)
                 else:
                     return
+            create_schema_type = 'rdb_sample' if self.rdb_sample.isChecked() else 'rdb_sample_dev'
+
+        else:
+            create_schema_type = 'rdb_data'
+
+        self.controller.plugin_settings_set_value('create_schema_type', create_schema_type)
+        process = partial(self.create_project_process, project_type, project_name, schema_type, create_schema_type)
+
+        # Custom execution
+        if create_schema_type == 'rdb_import_data':
+            # Import of INP data goes on with the transaction of the new schema, so it runs in main connection
+            status = process()
+            if not status and self.dev_commit == 'FALSE':
+                self.manage_process_result()
+                return
+            msg = ("The sql files have been correctly executed."
+                   "\nNow, a form will be opened to manage the import inp.")
+            self.controller.show_info_box(msg, "Info")
+            self.execute_import_data(schema_type=schema_type)
+            return
+
+        self.start_process("Create project", process, partial(self.create_project_finished, project_name_schema))
+
+
+    def create_project_process(self, project_type, project_name, schema_type, create_schema_type):
+        """ Execute files of a new project. Return False if it fails """
 
         # Common execution
         status = self.load_base(project_type=project_type)
         if not status and self.dev_commit == 'FALSE':
-            self.manage_process_result()
-            return
-
-        self.task1.setProgress(10)
+            return False
         status = self.update_30to31(new_project=True, project_type=project_type)
         if not status and self.dev_commit == 'FALSE':
-            self.manage_process_result()
-            return
-        self.task1.setProgress(20)
+            return False
         status = self.load_views(project_type=project_type)
         if not status and self.dev_commit == 'FALSE':
-            self.manage_process_result()
-            return
-        self.task1.setProgress(30)
+            return False
         status = self.load_trg(project_type=project_type)
         if not status and self.dev_commit == 'FALSE':
-            self.manage_process_result()
-            return
-        self.task1.setProgress(40)
+            return False
         status = self.update_31to39(new_project=True, project_type=project_type)
         if not status and self.dev_commit == 'FALSE':
-            self.manage_process_result()
-            return
-        self.task1.setProgress(50)
+            return False
         status = self.api(new_api=True, project_type=project_type)
         if not status and self.dev_commit == 'FALSE':
-            self.manage_process_result()
-            return
-        self.task1.setProgress(60)
+            return False
         status = self.execute_last_process(new_project=True, schema_name=project_name, schema_type=schema_type)
         if not status and self.dev_commit == 'FALSE':
-            self.manage_process_result()
-            return
-        self.task1.setProgress(70)
-        # Custom execution
-        if self.rdb_import_data.isChecked():
-            #TODO:
-            self.task1.setProgress(100)
-            self.controller.plugin_settings_set_value('create_schema_type', 'rdb_import_data')
-            msg = ("The sql files have been correctly executed."
-                   "\nNow, a form will be opened to manage the import inp.")
-            self.controller.show_info_box(msg, "Info")
-            self.execute_import_data(schema_type=schema_type)
-            return
+            return False
+        status = self.create_plugin_tables(project_type, project_name)
+        if not status and self.dev_commit == 'FALSE':
+            return False
 
-        elif self.rdb_sample.isChecked():
-            self.controller.plugin_settings_set_value('create_schema_type', 'rdb_sample')
-            self.load_sample_data(project_type=project_type)
-            self.task1.setProgress(80)
-        elif self.rdb_sample_dev.isChecked():
-            self.controller.plugin_settings_set_value('create_schema_type', 'rdb_sample_dev')
+        # Custom execution
+        if create_schema_type in ('rdb_sample', 'rdb_sample_dev'):
             self.load_sample_data(project_type=project_type)
+        if create_schema_type == 'rdb_sample_dev':
             self.load_dev_data(project_type=project_type)
-            self.task1.setProgress(80)
-        elif self.rdb_data.isChecked():
-            self.controller.plugin_settings_set_value('create_schema_type', 'rdb_data')
-            pass
 
-        self.manage_process_result(project_name_schema)
+        return True
+
+
+    def create_project_finished(self, schema_name, task, result):
 
-        # Update composer path on config_param_user
-        self.manage_user_params()
+        status = (self.error_count == 0)
+        self.manage_process_result(schema_name)
+        if status:
+            # Update composer path on config_param_user
+            self.manage_user_params()
 
 
     def manage_process_result(self, schema_name=None):
 
-        self.task1.setProgress(100)
         status = (self.error_count == 0)
         self.manage_result_message(status, parameter="Create project")
         if status:
@@ -1475,9 +856,14 @@ class UpdateSQL(ApiParent):
             # Reset count error variable to 0
             self.error_count = 0
 
+        self.finish_ledger()
+
 
     def rename_project_data_schema(self, schema, create_project=None):
 
+        if self.is_process_running():
+            return
+
         if create_project is None or create_project is False:
             close_dlg_rename = True
             self.schema = utils_giswater.getWidgetText(self.dlg_readsql_rename,self.dlg_readsql_rename.schema_rename)
@@ -1531,10 +917,14 @@ class UpdateSQL(ApiParent):
 
         # Reset count error variable to 0
         self.error_count = 0
+        self.finish_ledger()
 
 
     def update_api(self):
 
+        if self.is_process_running():
+            return
+
         self.task1 = GwTask('Manage schema')
         QgsApplication.taskManager().addTask(self.task1)
         self.task1.setProgress(50)
@@ -1550,9 +940,13 @@ class UpdateSQL(ApiParent):
 
         # Reset count error variable to 0
         self.error_count = 0
+        self.finish_ledger()
 
 
     def implement_api(self):
+        if self.is_process_running():
+            return
+
         self.task1 = GwTask('Manage schema')
         QgsApplication.taskManager().addTask(self.task1)
         self.task1.setProgress(50)
@@ -1562,6 +956,9 @@ class UpdateSQL(ApiParent):
 
     def load_custom_sql_files(self, dialog, widget):
 
+        if self.is_process_running():
+            return
+
         folder_path = utils_giswater.getWidgetText(dialog, widget)
         self.task1 = GwTask('Manage schema')
         QgsApplication.taskManager().addTask(self.task1)
@@ -1578,6 +975,7 @@ class UpdateSQL(ApiParent):
 
         # Reset count error variable to 0
         self.error_count = 0
+        self.finish_ledger()
 
 
     # TODO: Rename this function => Update all versions from changelog file.
@@ -1586,28 +984,7 @@ class UpdateSQL(ApiParent):
         msg = "Are you sure to update the project schema to last version?"
         result = self.controller.ask_question(msg, "Info")
         if result:
-            self.task1 = GwTask('Manage schema')
-            QgsApplication.taskManager().addTask(self.task1)
-            self.task1.setProgress(50)
-            self.task1 = GwTask('Manage schema')
-            QgsApplication.taskManager().addTask(self.task1)
-            status = self.load_updates(project_type, update_changelog=True)
-            if status:
-                self.set_info_project()
-            self.task1.setProgress(100)
-        else:
-            return
-
-        status = (self.error_count == 0)
-        self.manage_result_message(status, parameter="Update project")
-        if status:
-            self.controller.dao.commit()
-            self.close_dialog(self.dlg_readsql_show_info)
-        else:
-            self.controller.dao.rollback()
-
-        # Reset count error variable to 0
-        self.error_count = 0
+            self.load_updates(project_type, update_changelog=True)
 
 
     """ Checkbox calling functions """
@@ -1615,53 +992,59 @@ class UpdateSQL(ApiParent):
 
     def load_updates(self, project_type, update_changelog=False):
 
+        if self.is_process_running():
+            return
+
         # Get current schema selected
         schema_name = utils_giswater.getWidgetText(self.dlg_readsql, self.dlg_readsql.project_schema_name)
         self.schema = None
         self.locale = self.project_data_language
 
-        self.task1 = GwTask('Manage schema')
-        QgsApplication.taskManager().addTask(self.task1)
-        self.task1.setProgress(0)
-        status = self.load_fct_ftrg(project_type=project_type)
-        self.task1.setProgress(20)
-        if status:
-            status = self.update_30to31(project_type=project_type)
-        self.task1.setProgress(40)
-        if status:
-            status = self.update_31to39(project_type=project_type)
-        self.task1.setProgress(60)
-        if status:
-            status = self.api(project_type=project_type)
-        self.task1.setProgress(80)
-        if status:
-            status = self.execute_last_process(schema_name=schema_name, locale=True)
-        self.task1.setProgress(100)
+        process = partial(self.load_updates_process, project_type, schema_name)
+        self.start_process("Update project", process, partial(self.load_updates_finished, update_changelog))
 
-        if update_changelog is False:
-            status = (self.error_count == 0)
-            self.manage_result_message(status, parameter="Load updates")
-            if status:
-                self.controller.dao.commit()
-            else:
-                self.controller.dao.rollback()
 
-            # Reset count error variable to 0
-            self.error_count = 0
+    def load_updates_finished(self, update_changelog, task, result):
 
-        return status
+        status = (self.error_count == 0)
+        if update_changelog:
+            if status:
+                self.set_info_project()
+            self.manage_result_message(status, parameter="Update project")
+            if status:
+                self.close_dialog(self.dlg_readsql_show_info)
+        else:
+            self.manage_result_message(status, parameter="Load updates")
+
+        # Reset count error variable to 0
+        self.error_count = 0
 
 
     def reload_tablect(self, project_type=False):
-        self.load_tablect(project_type=project_type)
+        return self.force_reload(self.load_tablect, project_type)
 
 
     def reload_fct_ftrg(self, project_type=False):
-        self.load_fct_ftrg(project_type=project_type)
+        return self.force_reload(self.load_fct_ftrg, project_type)
 
 
     def reload_trg(self, project_type=False):
-        self.load_trg(project_type)
+        return self.force_reload(self.load_trg, project_type)
+
+
+    def force_reload(self, load_function, project_type):
+        """ Execute files of @load_function even if they are already applied with the same content """
+
+        if self.is_process_running():
+            return False
+
+        self.finish_ledger()
+        self.force_sql = True
+        try:
+            return load_function(project_type=project_type)
+        finally:
+            self.finish_ledger()
+            self.force_sql = False
 
 
     """ Create new connection when change combo connections """
@@ -2061,17 +1444,11 @@ class UpdateSQL(ApiParent):
             self.dlg_readsql.btn_info.setEnabled(False)
 
 
-    def process_folder(self, folderPath, filePattern):
-
-        try:
-            self.controller.log_info(str(sorted(os.listdir(folderPath + filePattern))))
-            return True
-        except Exception:
-            return False
-
-
     def schema_file_to_db(self):
 
+        if self.is_process_running():
+            return
+
         if self.chk_schema_funcion.isChecked():
             self.task1 = GwTask('Manage schema')
             QgsApplication.taskManager().addTask(self.task1)
@@ -2088,10 +1465,14 @@ class UpdateSQL(ApiParent):
 
         # Reset count error variable to 0
         self.error_count = 0
+        self.finish_ledger()
 
 
     def api_file_to_db(self):
 
+        if self.is_process_running():
+            return
+
         if self.chk_api_funcion.isChecked():
             self.task1 = GwTask('Manage schema')
             QgsApplication.taskManager().addTask(self.task1)
@@ -2111,6 +1492,7 @@ class UpdateSQL(ApiParent):
 
         # Reset count error variable to 0
         self.error_count = 0
+        self.finish_ledger()
 
 
     def open_create_project(self):
@@ -2221,76 +1603,6 @@ class UpdateSQL(ApiParent):
         self.open_dialog(self.dlg_readsql_rename)
 
 
-    def executeFiles(self, filedir, i18n=False, no_ct=False):
-
-        if not os.path.exists(filedir):
-            self.controller.log_info("Folder not found", parameter=filedir)
-            return True
-
-        self.controller.log_info("Processing folder", parameter=filedir)
-        filelist = sorted(os.listdir(filedir))
-        status = True
-        if self.schema is None:
-            schema_name = utils_giswater.getWidgetText(self.dlg_readsql, self.dlg_readsql.project_schema_name)
-            schema_name = schema_name.replace('"', '')
-        else:
-            schema_name = self.schema.replace('"', '')
-
-        filter_srid_value = str(self.filter_srid_value).replace('"', '')
-        if i18n:
-            for file in filelist:
-                if "utils.sql" in file :
-                    self.controller.log_info(str(filedir + os.sep + 'utils.sql'))
-                    status = self.read_execute_file(filedir, os.sep + 'utils.sql', schema_name, filter_srid_value)
-                elif str(self.project_type_selected) + ".sql" in file:
-                    self.controller.log_info(str(filedir + os.sep + str(self.project_type_selected) + '.sql'))
-                    status = self.read_execute_file(filedir, os.sep + str(self.project_type_selected) + '.sql', schema_name, filter_srid_value)
-                if not status and self.dev_commit == 'FALSE':
-                    return False
-        else:
-            for file in filelist:
-                if ".sql" in file:
-                    if (no_ct is True and "tablect.sql" not in file) or no_ct is False:
-                        self.controller.log_info(str(filedir + os.sep + file))
-                        status = self.read_execute_file(filedir, file, schema_name, filter_srid_value)
-                        if not status and self.dev_commit == 'FALSE':
-                            return False
-
-        return status
-
-
-    def read_execute_file(self, filedir, file, schema_name, filter_srid_value):
-
-        status = False
-        try:
-            f = open(filedir + os.sep + file, 'r')
-            if f:
-                f_to_read = str(f.read().replace("SCHEMA_NAME", schema_name).replace("SRID_VALUE", filter_srid_value))
-                if self.dev_commit == 'TRUE':
-                    status = self.controller.execute_sql(str(f_to_read))
-                else:
-                    status = self.controller.execute_sql(str(f_to_read), commit=False)
-
-                if status is False:
-                    self.error_count = self.error_count + 1
-                    self.controller.log_info(str("read_execute_file error"), parameter=filedir + os.sep + file)
-                    self.controller.log_info(str('Message: ' + str(self.controller.last_error)))
-                    if self.dev_commit == 'TRUE':
-                        self.controller.dao.rollback()
-                    return False
-
-        except Exception as e:
-            self.error_count = self.error_count + 1
-            self.controller.log_info(str("read_execute_file exception"), parameter=file)
-            self.controller.log_info(str(e))
-            if self.dev_commit == 'TRUE':
-                self.controller.dao.rollback()
-            status = False
-        finally:
-            f.close()
-            return status
-
-
     def readFiles(self, filelist, filedir):
 
         if "changelog.txt" in filelist:
@@ -2333,13 +1645,19 @@ class UpdateSQL(ApiParent):
 
         if accepted:
 
+            if self.is_process_running():
+                return
+
             # Set wait cursor
             self.task1 = GwTask('Manage schema')
             QgsApplication.taskManager().addTask(self.task1)
             self.task1.setProgress(0)
 
             # Insert inp values into database
-            self.insert_inp_into_db(self.file_inp)
+            status = self.insert_inp_into_db(self.file_inp)
+            if not status:
+                self.manage_process_result()
+                return
 
             # Execute import data
             if schema_type.lower() == 'ws':
@@ -2382,6 +1700,7 @@ class UpdateSQL(ApiParent):
             self.controller.show_info_box(msg, "Info")
             self.controller.dao.rollback()
             self.error_count = 0
+            self.finish_ledger()
 
         # Close dialog
         self.close_dialog(self.dlg_import_inp)
@@ -3109,66 +2428,27 @@ class UpdateSQL(ApiParent):
 
 
     def insert_inp_into_db(self, folder_path=None):
+        """ Import INP file @folder_path into table temp_csv2pg. Rows are sent through COPY in bounded chunks
+        using current transaction """
 
-        _file = open(folder_path, "r+")
-        full_file = _file.readlines()
-        sql = ""
-        progress = 0
-        target = ""
-        for row in full_file:
-            progress += 1
-            row = row.rstrip()
-            if len(row) == 0:
-                continue
-            if str(row[0]) == "[":
-                target = str(row)
-            if target in ('[TRANSECTS]', '[CONTROLS]', '[RULES]'):
-                sp_n = [row]
-            elif target in ('[EVAPORATION]', '[TEMPERATURE]'):
-                sp_n = re.split(' |\t', row, 1)
-            else:
-                if str(row[0]) != ';':
-                    list_aux = row.split("\t")
-                    dirty_list = []
-                    for x in range(0, len(list_aux)):
-                        aux = list_aux[x].split(" ")
-                        for i in range(len(aux)):
-                            dirty_list.append(aux[i])
-                else:
-                    dirty_list = [row]
-
-                for x in range(len(dirty_list) - 1, -1, -1):
-                    if dirty_list[x] == '' or "**" in dirty_list[x] or "--" in dirty_list[x] or dirty_list[x] == '; '\
-                            or dirty_list[x] == ';' or dirty_list[x] == ';\n':
-                        dirty_list.pop(x)
-                sp_n = dirty_list
-
-            if len(sp_n) > 0:
-                sql += "INSERT INTO temp_csv2pg (csv2pgcat_id, source, "
-                values = "VALUES(12, '" + target + "', "
-                for x in range(0, len(sp_n)):
-                    if "''" not in sp_n[x]:
-                        sql += "csv" + str(x + 1) + ", "
-                        value = "'" + sp_n[x].strip().replace("\n", "") + "', "
-                        values += value.replace("''", "null")
-                    else:
-                        sql += "csv" + str(x + 1) + ", "
-                        values = "VALUES(null, "
-                sql = sql[:-2] + ") "
-                values = values[:-2] + ");\n"
-                sql += values
-
-            if progress % 500 == 0:
-                # TODO:: Use dev_commit or dev_user?
-                self.controller.execute_sql(sql, commit=self.dev_user)
-                sql = ""
-
-        if sql != "":
-            # TODO:: Use dev_commit or dev_user?
-            self.controller.execute_sql(sql, commit=self.dev_user)
-
-        _file.close()
-        del _file
+        time_start = time()
+        writer = Csv2PgCopyWriter(self.controller.dao, 12)
+        for section, fields in iter_inp_rows(folder_path):
+            if not writer.add_row(fields, (section, )):
+                break
+        else:
+            writer.flush()
+
+        if writer.last_error:
+            self.controller.dao.rollback()
+            self.error_count = self.error_count + 1
+            self.controller.show_warning_detail("Import INP failed", str(writer.last_error))
+            return False
+
+        duration = time() - time_start
+        rows_second = int(writer.total / duration) if duration > 0 else writer.total
+        self.controller.log_info(f"Import INP: {writer.total} rows in {duration:.2f} s ({rows_second} rows/s)")
+        return True
 
 
     def select_file_inp(self):
@@ -0,0 +1,191 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.core import NULL, QgsDataSourceUri, QgsFeatureRequest, QgsRectangle
+from qgis.PyQt.QtCore import QVariant
+
+import hashlib
+import json
+import os
+import re
+
+
+RE_NUMBER = re.compile(r'^\s*(\d+)(.*)$')
+
+
+class AddressIndex(object):
+    """ Index of streets and portals used to search addresses.
+    Streets: {street code: (name, exploitation, bounding box, fid)}
+    Portals: {street code: list of (number, fid) sorted by number}
+    Codes are stored as text. Geometries are not kept: features are loaded by its fid when needed """
+
+    def __init__(self):
+
+        self.streets = {}
+        self.portals = {}
+
+
+    def build(self, street_layer, street_fields, portal_layer, portal_fields):
+        """ Read streets and portals from its layers
+        :param street_fields: Names of fields (code, name, exploitation) of @street_layer
+        :param portal_fields: Names of fields (street code, number) of @portal_layer
+        """
+
+        self.streets = {}
+        self.portals = {}
+
+        # Only the bounding box of the streets is kept
+        idx_code, idx_name, idx_expl = [street_layer.fields().indexFromName(x) for x in street_fields]
+        request = QgsFeatureRequest().setSubsetOfAttributes([idx_code, idx_name, idx_expl])
+        for feature in street_layer.getFeatures(request):
+            attrs = [None if x == NULL else x for x in feature.attributes()]
+            if attrs[idx_code] is None:
+                continue
+            bbox = None
+            geom = feature.geometry()
+            if geom is not None and not geom.isEmpty():
+                rect = geom.boundingBox()
+                bbox = (rect.xMinimum(), rect.yMinimum(), rect.xMaximum(), rect.yMaximum())
+            self.streets[str(attrs[idx_code])] = (attrs[idx_name], str(attrs[idx_expl]), bbox, feature.id())
+
+        idx_code, idx_number = [portal_layer.fields().indexFromName(x) for x in portal_fields]
+        request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes([idx_code, idx_number])
+        for feature in portal_layer.getFeatures(request):
+            attrs = feature.attributes()
+            if attrs[idx_code] in (None, NULL) or attrs[idx_number] in (None, NULL):
+                continue
+            self.portals.setdefault(str(attrs[idx_code]), []).append((attrs[idx_number], feature.id()))
+
+        for numbers in self.portals.values():
+            numbers.sort(key=lambda x: number_sort_key(x[0]))
+
+        return self
+
+
+    def get_streets(self, expl_id=None):
+        """ Return list of tuples (code, name) of streets of exploitation @expl_id, sorted by name """
+
+        expl_id = str(expl_id)
+        streets = [(code, street[0]) for code, street in self.streets.items()
+                   if expl_id == 'None' or street[1] == expl_id]
+        streets.sort(key=lambda x: str(x[1] or ''))
+        return streets
+
+
+    def get_numbers(self, code):
+        """ Return list of tuples (number, fid) of portals of street @code """
+        return self.portals.get(str(code), [])
+
+
+    def get_street_extent(self, code):
+        """ Return bounding box of street @code as QgsRectangle, or None """
+
+        street = self.streets.get(str(code))
+        if street is None or street[2] is None:
+            return None
+        return QgsRectangle(*street[2])
+
+
+    def to_json(self):
+        return {'streets': self.streets, 'portals': self.portals}
+
+
+    def from_json(self, data):
+
+        self.streets = {code: (value[0], value[1], tuple(value[2]) if value[2] else None, value[3])
+                        for code, value in data['streets'].items()}
+        self.portals = {code: [tuple(value) for value in values] for code, values in data['portals'].items()}
+        return self
+
+
+def number_sort_key(number):
+    """ Sort portal numbers naturally: 2, 2A, 10 """
+
+    match = RE_NUMBER.match(str(number))
+    if match:
+        return 0, int(match.group(1)), match.group(2)
+    return 1, 0, str(number)
+
+
+def has_stable_fids(layer):
+    """ Check if feature ids of @layer are kept between sessions (so they can be stored in a disk cache) """
+
+    if layer.providerType() != 'postgres':
+        return layer.providerType() == 'ogr'
+
+    # Postgres provider uses the value of the key as feature id only if it is a single integer column
+    pk_indexes = layer.dataProvider().pkAttributeIndexes()
+    if len(pk_indexes) != 1:
+        return False
+    return layer.fields().at(pk_indexes[0]).type() in (QVariant.Int, QVariant.LongLong)
+
+
+def get_layer_stamp(controller, layer):
+    """ Return value that changes when data of @layer is modified, or None if it can not be known.
+    Postgres tables use its statistics counters, files its modification time """
+
+    if layer.providerType() == 'postgres':
+        uri = QgsDataSourceUri(layer.source())
+        sql = ("SELECT n_tup_ins, n_tup_upd, n_tup_del FROM pg_stat_user_tables "
+               "WHERE schemaname = %s AND relname = %s")
+        row = controller.get_row(sql, log_info=False, commit=True, params=[uri.schema(), uri.table()])
+        if not row:
+            return None
+        return f"{row[0]}|{row[1]}|{row[2]}"
+
+    path = layer.source().split('|')[0]
+    if os.path.isfile(path):
+        return str(os.path.getmtime(path))
+
+    return None
+
+
+# Indexes loaded in current session
+indexes = {}
+
+
+def get_address_index(controller, street_layer, street_fields, portal_layer, portal_fields):
+    """ Return AddressIndex of @street_layer and @portal_layer. It is built only the first time in the session.
+    It is also stored in a disk cache, valid while source, number of features and modification stamp of both
+    layers do not change """
+
+    stamps = [get_layer_stamp(controller, layer) for layer in (street_layer, portal_layer)]
+    key = "|".join([street_layer.source(), str(street_layer.featureCount()), str(stamps[0]), ",".join(street_fields),
+                    portal_layer.source(), str(portal_layer.featureCount()), str(stamps[1]), ",".join(portal_fields)])
+    key = hashlib.md5(key.encode('utf-8')).hexdigest()
+    index = indexes.get(key)
+    if index is not None:
+        return index
+
+    cache_path = None
+    if None not in stamps and has_stable_fids(street_layer) and has_stable_fids(portal_layer):
+        cache_folder = os.path.join(os.path.expanduser("~"), controller.plugin_name, "cache")
+        cache_path = os.path.join(cache_folder, f"address_{key}.json")
+
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as cache_file:
+                index = AddressIndex().from_json(json.load(cache_file))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            controller.log_warning(f"Error reading address cache: {e}")
+
+    if index is None:
+        index = AddressIndex().build(street_layer, street_fields, portal_layer, portal_fields)
+        controller.log_info(f"Address index built: {len(index.streets)} streets, "
+                            f"{sum(len(x) for x in index.portals.values())} portals")
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                with open(cache_path, 'w', encoding='utf-8') as cache_file:
+                    json.dump(index.to_json(), cache_file)
+            except (OSError, TypeError) as e:
+                controller.log_warning(f"Error writing address cache: {e}")
+
+    indexes[key] = index
+    return index
+
@@ -5,7 +5,8 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
-from qgis.core import QgsMessageLog, QgsCredentials, QgsExpressionContextUtils, QgsProject, QgsDataSourceUri
+from qgis.core import QgsMessageLog, QgsCredentials, QgsExpressionContextUtils, QgsFeatureRequest, QgsProject, \
+    QgsDataSourceUri
 from qgis.PyQt.QtCore import QCoreApplication, QRegExp, QSettings, Qt, QTranslator
 from qgis.PyQt.QtGui import QTextCharFormat, QFont
 from qgis.PyQt.QtWidgets import QCheckBox, QLabel, QMessageBox, QPushButton, QTabWidget, QToolBox
@@ -17,8 +18,10 @@ import json
 import os
 import sys
 import traceback
+from time import perf_counter
 
 from collections import OrderedDict
+from contextlib import contextmanager
 from functools import partial
 
 from .pg_dao import PgDao
@@ -51,6 +54,15 @@ class DaoController(object):
         self.user_settings = None
         self.user_settings_path = None
         self.prev_maptool = None
+        self.layer_index = None
+        self.layer_index_connected = False
+        # Records fetched through dao.table.Table: {(table_name, pk value): {field: value}}
+        self.identity_map = {}
+        # Timing of API functions: {function_name: [calls, total seconds, max seconds]}
+        self.api_stats = {}
+        # Feature ids of layers by business id: {(layer_id, field_name): {business id: fid}}
+        self.feature_id_index = {}
+        self.feature_id_index_layers = set()
 
         if create_logger:
             self.set_logger(logger_name)
@@ -71,6 +83,7 @@ class DaoController(object):
 
     def set_schema_name(self, schema_name):
         self.schema_name = schema_name
+        self.identity_map = {}
                 
 
     def set_qgis_settings(self, qgis_settings):
@@ -325,7 +338,7 @@ class DaoController(object):
         # Connect to Database 
         self.dao = PgDao()     
         self.dao.set_params(host, port, db, user, pwd, sslmode)
-        status = self.dao.init_db()
+        status = self.init_dao()
         if not status:
             message = "Database connection error. Please open plugin log file to get more details"
             self.last_error = self.tr(message)
@@ -353,7 +366,7 @@ class DaoController(object):
         # Connect to Database
         self.dao = PgDao()
         self.dao.set_service(service)
-        status = self.dao.init_db()
+        status = self.init_dao()
         if not status:
             message = "Database connection error (PgDao). Please open plugin log file to get more details"
             self.last_error = self.tr(message)
@@ -363,6 +376,40 @@ class DaoController(object):
         return status
 
 
+    def init_dao(self):
+        """ Open connection of @self.dao. If parameters 'pool_min_conn' and 'pool_max_conn' are set in the
+        config file, a pool of connections is created instead of a single one """
+
+        self.identity_map = {}
+        min_conn = self.settings.value('system_variables/pool_min_conn')
+        max_conn = self.settings.value('system_variables/pool_max_conn')
+        try:
+            min_conn = int(min_conn)
+            max_conn = int(max_conn)
+        except (TypeError, ValueError):
+            return self.dao.init_db()
+
+        if max_conn <= 1:
+            return self.dao.init_db()
+
+        self.log_info(f"Database connection pool: {min_conn}-{max_conn}")
+        return self.dao.init_pool(min_conn, max_conn)
+
+
+    @contextmanager
+    def get_task_dao(self):
+        """ Return a context manager with a PgDao bound to a dedicated connection.
+        Use it from background tasks so the UI connection stays free:
+            with self.controller.get_task_dao() as dao:
+                rows = dao.get_rows(sql)
+        """
+
+        with self.dao.get_task_dao() as dao:
+            if self.schema_name:
+                dao.execute_sql(f"SET search_path = {self.schema_name}, public;")
+            yield dao
+
+
     def check_db_connection(self):
         """ Check database connection. Reconnect if needed """
 
@@ -769,14 +816,10 @@ class DaoController(object):
             self.show_warning("Function not found in database", parameter=function_name)
             return None
 
-        sql = f"SELECT {function_name} ($${{{body}}}$$)::text;"
-        row = self.get_row(sql, log_sql=True)
-        if not row:
-            self.show_critical("NOT ROW FOR", parameter=sql)
+        json_result = self.get_api_json(function_name, body, log_sql=True, commit=False)
+        if json_result is None:
             return None
 
-        json_result = json.loads(row[0], object_pairs_hook=OrderedDict)
-
         if 'status' in json_result and json_result['status'] == 'Failed':
             try:
                 title = "Execute failed."
@@ -793,6 +836,63 @@ class DaoController(object):
         return json_result
 
 
+    def get_api_json(self, function_name, body=None, log_sql=False, commit=True, show_message=True):
+        """ Call API function @function_name with @body bound as its json parameter
+        :param body: Content of the json without enclosing braces (as returned by create_body), json text or dict
+        :return: Response of the function decoded by psycopg2 as a plain dict, or None if there is no response
+        """
+
+        if body is None:
+            sql = f"SELECT {function_name}()"
+            params = None
+        else:
+            if isinstance(body, dict):
+                body = json.dumps(body)
+            elif not body.lstrip().startswith('{'):
+                body = "{" + body + "}"
+            sql = f"SELECT {function_name}(%s::json)"
+            params = (body, )
+
+        start = perf_counter()
+        row = self.get_row(sql, log_sql=log_sql, commit=commit, params=params)
+        self.add_api_stat(function_name, perf_counter() - start)
+        if not row or row[0] is None:
+            if show_message:
+                self.show_message(f"NOT ROW FOR: {self.get_sql(sql, params=params)}", 2)
+            return None
+
+        json_result = row[0]
+        # Functions returning text instead of json
+        if isinstance(json_result, str):
+            json_result = json.loads(json_result)
+
+        return json_result
+
+
+    def add_api_stat(self, function_name, elapsed):
+        """ Update timing statistics of @function_name """
+
+        stat = self.api_stats.get(function_name)
+        if stat is None:
+            self.api_stats[function_name] = [1, elapsed, elapsed]
+            return
+
+        stat[0] += 1
+        stat[1] += elapsed
+        if elapsed > stat[2]:
+            stat[2] = elapsed
+
+
+    def get_api_stats(self):
+        """ Return timing statistics of API functions sorted by total time:
+        list of tuples (function_name, calls, total seconds, mean seconds, max seconds) """
+
+        stats = [(name, calls, total, total / calls, max_time)
+                 for name, (calls, total, max_time) in self.api_stats.items()]
+        stats.sort(key=lambda x: x[2], reverse=True)
+        return stats
+
+
     def get_error_from_audit(self, commit=True):
         """ Get last error from audit tables that has not been showed to the user """
         
@@ -952,22 +1052,15 @@ class DaoController(object):
         return layer     
             
         
-    def get_layer_by_tablename(self, tablename, show_warning=False, log_info=False):
-        """ Iterate over all layers and get the one with selected @tablename """
-        
-        # Check if we have any layer loaded
-        layers = self.get_layers()
-        if len(layers) == 0:
-            return None
+    def get_layer_by_tablename(self, tablename, show_warning=False, log_info=False, schema_name=None):
+        """ Get the first layer of the TOC with selected @tablename (and @schema_name if set) """
+
+        index = self.get_layer_index()
+        if schema_name is None:
+            layer = index['table'].get(tablename)
+        else:
+            layer = index['schema_table'].get((schema_name.replace('"', '').lower(), tablename))
 
-        # Iterate over all layers
-        layer = None
-        for cur_layer in layers:
-            uri_table = self.get_layer_source_table_name(cur_layer)
-            if uri_table is not None and uri_table == tablename:
-                layer = cur_layer
-                break
-        
         if layer is None and show_warning:
             self.show_warning("Layer not found", parameter=tablename)
                            
@@ -976,7 +1069,134 @@ class DaoController(object):
                                       
         return layer        
 
-        
+
+    def get_layer_index(self):
+        """ Return index of TOC layers: {'table': {tablename: layer}, 'schema_table': {(schema, tablename): layer},
+        'layer_id': {layer_id: tablename}}. It is built once and dropped whenever layers are added or removed """
+
+        if self.layer_index is not None:
+            return self.layer_index
+
+        self.connect_layer_index_signals()
+        index = {'table': {}, 'schema_table': {}, 'layer_id': {}}
+        for layer in self.get_layers():
+            if layer is None or layer.dataProvider() is None:
+                continue
+            uri = layer.dataProvider().dataSourceUri().lower()
+            schema_name, tablename = self.parse_uri_table(uri)
+            index['layer_id'][layer.id()] = tablename
+            if tablename is None:
+                continue
+            index['table'].setdefault(tablename, layer)
+            index['schema_table'].setdefault((schema_name, tablename), layer)
+
+        self.layer_index = index
+        return self.layer_index
+
+
+    def connect_layer_index_signals(self):
+        """ Keep layer index updated with the changes of the project """
+
+        if self.layer_index_connected:
+            return
+
+        project = QgsProject.instance()
+        project.layersAdded.connect(self.reset_layer_index)
+        project.layersRemoved.connect(self.reset_layer_index)
+        project.cleared.connect(self.reset_layer_index)
+        project.readProject.connect(self.reset_layer_index)
+        # Layers added to the project are not listed in the TOC until they are inserted into the layer tree
+        project.layerTreeRoot().addedChildren.connect(self.reset_layer_index)
+        project.layerTreeRoot().removedChildren.connect(self.reset_layer_index)
+        self.layer_index_connected = True
+
+
+    def reset_layer_index(self, *args):
+        """ Drop layer index. It will be rebuilt on next lookup """
+        self.layer_index = None
+
+
+    def get_feature_id_index(self, layer, field_name):
+        """ Get dict {business id (text): feature id} of @layer using its field @field_name.
+        It is built the first time it is requested and dropped when layer is edited or reloaded
+        :return: dict or None if @field_name does not exist
+        """
+
+        key = (layer.id(), field_name)
+        index = self.feature_id_index.get(key)
+        if index is not None:
+            return index
+
+        field_index = layer.fields().indexFromName(field_name)
+        if field_index == -1:
+            return None
+
+        request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes([field_index])
+        index = {}
+        for feature in layer.getFeatures(request):
+            index.setdefault(str(feature.attribute(field_index)), feature.id())
+        self.feature_id_index[key] = index
+
+        # Drop index of the layer when its features change
+        layer_id = layer.id()
+        if layer_id not in self.feature_id_index_layers:
+            self.feature_id_index_layers.add(layer_id)
+            reset = partial(self.reset_feature_id_index, layer_id)
+            layer.featureAdded.connect(reset)
+            layer.featuresDeleted.connect(reset)
+            layer.attributeValueChanged.connect(reset)
+            layer.afterRollBack.connect(reset)
+            layer.subsetStringChanged.connect(reset)
+            layer.dataChanged.connect(reset)
+            layer.willBeDeleted.connect(partial(self.remove_feature_id_index, layer_id))
+
+        return index
+
+
+    def reset_feature_id_index(self, layer_id, *args):
+        """ Drop feature id indexes of layer @layer_id """
+
+        for key in [x for x in self.feature_id_index if x[0] == layer_id]:
+            del self.feature_id_index[key]
+
+
+    def remove_feature_id_index(self, layer_id):
+        """ Drop feature id indexes of layer @layer_id when it is removed from project """
+
+        self.reset_feature_id_index(layer_id)
+        self.feature_id_index_layers.discard(layer_id)
+
+
+    def select_by_business_ids(self, layer, ids, field_name=None):
+        """ Select features of @layer whose field @field_name is in @ids, without evaluating any expression
+        :param field_name: By default, primary key of the layer (ie: 'node_id')
+        :return: List of selected feature ids or None if @field_name is not found
+        """
+
+        if layer is None:
+            return None
+
+        if field_name is None:
+            pk_indexes = layer.dataProvider().pkAttributeIndexes()
+            if not pk_indexes:
+                return None
+            field_name = layer.fields().at(pk_indexes[0]).name()
+
+        index = self.get_feature_id_index(layer, field_name)
+        if index is None:
+            return None
+
+        fids = []
+        for business_id in ids:
+            fid = index.get(str(business_id))
+            if fid is not None:
+                fids.append(fid)
+        layer.selectByIds(fids)
+
+        return fids
+
+
     def get_layer_source(self, layer):
         """ Get database connection paramaters of @layer """
 
@@ -1038,16 +1258,30 @@ class DaoController(object):
 
         if layer is None:
             return None
-        
-        uri_table = None
+
+        layer_tables = self.get_layer_index()['layer_id']
+        if layer.id() in layer_tables:
+            return layer_tables[layer.id()]
+
         uri = layer.dataProvider().dataSourceUri().lower()
+        schema_name, uri_table = self.parse_uri_table(uri)
+
+        return uri_table    
+
+
+    def parse_uri_table(self, uri):
+        """ Get schema and table or view name from data source @uri. Return tuple (schema, table) """
+
+        schema_name = None
+        uri_table = None
         pos_ini = uri.find('table=')
         pos_end_schema = uri.rfind('.')
         pos_fi = uri.find('" ')
         if pos_ini != -1 and pos_fi != -1:
-            uri_table = uri[pos_end_schema+2:pos_fi]
+            schema_name = uri[pos_ini + 6:pos_end_schema].replace('"', '')
+            uri_table = uri[pos_end_schema + 2:pos_fi]
 
-        return uri_table    
+        return schema_name, uri_table
         
         
     def get_layer_primary_key(self, layer=None):
@@ -1455,8 +1689,26 @@ class DaoController(object):
         params = [schemaname, tablename]
         column_names = self.get_rows(sql, params=params)
         return column_names
-    
-    
+
+
+    def get_column_types(self, tablename, schemaname=None):
+        """ Return dict {column name: SQL type} of @tablename (ie: to cast values sent in bulk) """
+
+        if schemaname is None:
+            schemaname = self.schema_name
+
+        schemaname = schemaname.replace('"', '')
+        sql = ("SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute "
+               "WHERE attrelid = (quote_ident(%s) || '.' || quote_ident(%s))::regclass "
+               "AND attnum > 0 AND NOT attisdropped")
+        params = [schemaname, tablename]
+        rows = self.get_rows(sql, params=params, commit=True)
+        if not rows:
+            return {}
+
+        return {row[0]: row[1] for row in rows}
+
+
     def get_srid(self, tablename, schemaname=None):
         """ Find SRID of selected schema """
 
@@ -1596,6 +1848,7 @@ class DaoController(object):
         layer = self.get_layer_by_tablename(layer_name)
         if layer:
             layer.dataProvider().forceReload()
+            self.reset_feature_id_index(layer.id())
 
 
     def manage_exception(self, title=None, description=None, sql=None):
@@ -0,0 +1,97 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+import struct
+
+
+# Flags of geometry type in PostGIS extended WKB
+EWKB_Z = 0x80000000
+EWKB_M = 0x40000000
+EWKB_SRID = 0x20000000
+
+# Geometry types whose body is a list of points (LineString, CircularString)
+POINT_LIST_TYPES = (2, 8)
+# Geometry types whose body is a list of geometries
+# (MultiPoint, MultiLineString, MultiPolygon, GeometryCollection, CompoundCurve, CurvePolygon, MultiCurve, MultiSurface)
+COLLECTION_TYPES = (4, 5, 6, 7, 9, 10, 11, 12)
+
+
+def ewkb_to_wkb(ewkb):
+    """ Convert PostGIS extended WKB (bytes or hex string) to ISO WKB, as read by QgsGeometry.fromWkb.
+    SRID is dropped and Z/M flags are converted into ISO type codes (+1000, +2000, +3000)
+    :raises ValueError: If geometry type is not supported or data is truncated
+    """
+
+    if isinstance(ewkb, str):
+        ewkb = bytes.fromhex(ewkb)
+
+    output = bytearray()
+    try:
+        end = convert_geometry(ewkb, 0, output)
+    except struct.error as e:
+        raise ValueError(f"Invalid EWKB: {e}")
+    if end > len(ewkb):
+        raise ValueError("Invalid EWKB: data is truncated")
+    if end < len(ewkb):
+        raise ValueError("Invalid EWKB: unexpected data after geometry")
+
+    return bytes(output)
+
+
+def convert_geometry(ewkb, offset, output):
+    """ Convert geometry of @ewkb starting at @offset, appending it to @output. Return offset of next byte """
+
+    byte_order = ewkb[offset]
+    uint32 = '<I' if byte_order == 1 else '>I'
+    geom_type, = struct.unpack_from(uint32, ewkb, offset + 1)
+    offset += 5
+
+    has_z = bool(geom_type & EWKB_Z)
+    has_m = bool(geom_type & EWKB_M)
+    if geom_type & EWKB_SRID:
+        offset += 4
+    base_type = geom_type & 0x0FFFFFFF
+    # Type may already be ISO (ie: 1002 for LineString Z)
+    if base_type >= 1000:
+        has_z = has_z or (base_type // 1000) in (1, 3)
+        has_m = has_m or (base_type // 1000) in (2, 3)
+        base_type %= 1000
+
+    dims = 2 + has_z + has_m
+    output.append(byte_order)
+    output += struct.pack(uint32, base_type + 1000 * has_z + 2000 * has_m)
+
+    if base_type == 1:
+        size = 8 * dims
+        output += ewkb[offset:offset + size]
+        return offset + size
+
+    count, = struct.unpack_from(uint32, ewkb, offset)
+    if base_type in POINT_LIST_TYPES:
+        size = 4 + 8 * dims * count
+        output += ewkb[offset:offset + size]
+        return offset + size
+
+    if base_type == 3:
+        output += ewkb[offset:offset + 4]
+        offset += 4
+        for i in range(count):
+            num_points, = struct.unpack_from(uint32, ewkb, offset)
+            size = 4 + 8 * dims * num_points
+            output += ewkb[offset:offset + size]
+            offset += size
+        return offset
+
+    if base_type in COLLECTION_TYPES:
+        output += ewkb[offset:offset + 4]
+        offset += 4
+        for i in range(count):
+            offset = convert_geometry(ewkb, offset, output)
+        return offset
+
+    raise ValueError(f"Geometry type not supported: {base_type}")
+
@@ -6,16 +6,21 @@ or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
 import logging
-import inspect
+import logging.handlers
 import os
+import queue
+import sys
 import time
 
 
 class Logger(object):
     
     def __init__(self, controller, log_name, log_level, log_suffix, 
-                 folder_has_tstamp=False, file_has_tstamp=True, remove_previous=False): 
-        """ Class constructor """
+                 folder_has_tstamp=False, file_has_tstamp=True, remove_previous=False,
+                 max_bytes=10 * 1024 * 1024, backup_count=5):
+        """ Class constructor
+        Messages are written to file by a background thread. File is rotated when it reaches @max_bytes
+        """
         
         # Create logger
         self.controller = controller
@@ -48,10 +53,14 @@ class Logger(object):
         log_date = '%d/%m/%Y %H:%M:%S'
         formatter = logging.Formatter(log_format, log_date)
         
-        # Create file handler
-        self.fh = logging.FileHandler(filepath) 
+        # Create rotating file handler, fed through a queue by a listener thread
+        self.fh = logging.handlers.RotatingFileHandler(filepath, maxBytes=max_bytes, backupCount=backup_count)
         self.fh.setFormatter(formatter)
-        self.logger_file.addHandler(self.fh)    
+        self.log_queue = queue.Queue(-1)
+        self.qh = logging.handlers.QueueHandler(self.log_queue)
+        self.logger_file.addHandler(self.qh)
+        self.listener = logging.handlers.QueueListener(self.log_queue, self.fh)
+        self.listener.start()
         
         # Initialize number of errors in current process
         self.num_errors = 0
@@ -61,7 +70,9 @@ class Logger(object):
         """ Close logger file """
         
         try:
-            self.logger_file.removeHandler(self.fh)
+            self.logger_file.removeHandler(self.qh)
+            # Wait until pending messages are written
+            self.listener.stop()
             self.fh.flush()
             self.fh.close()    
             del self.fh        
@@ -72,11 +83,16 @@ class Logger(object):
     def log(self, msg=None, log_level=logging.INFO, stack_level=2):
         """ Logger message into logger file with selected level """
         
+        if not self.logger_file.isEnabledFor(log_level):
+            return
+
         try:
-            module_path = inspect.stack()[stack_level][1]  
-            function_line = inspect.stack()[stack_level][2]
-            function_name = inspect.stack()[stack_level][3]
-            header = "{" + module_path + " | Line " + str(function_line) + " (" + str(function_name) + ")}"        
+            # Get caller frame without building the whole stack
+            frame = sys._getframe(stack_level)
+            module_path = frame.f_code.co_filename
+            function_line = frame.f_lineno
+            function_name = frame.f_code.co_name
+            header = "{" + module_path + " | Line " + str(function_line) + " (" + str(function_name) + ")}"
             text = header
             if msg:
                 text+= "\n" + str(msg)    
@@ -107,5 +123,11 @@ class Logger(object):
         self.log(msg, logging.ERROR, stack_level + stack_level_increase + 1)
         if sum_error:
             self.num_errors += 1
-        
-                
+
+
+    def critical(self, msg=None, stack_level=2, stack_level_increase=0, sum_error=True):
+        """ Logger message into logger file with level CRITICAL (50) """
+        self.log(msg, logging.CRITICAL, stack_level + stack_level_increase + 1)
+        if sum_error:
+            self.num_errors += 1
+
@@ -0,0 +1,175 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+import csv
+import hashlib
+import os
+import time
+
+
+class MigrationLedger(object):
+    """ Ledger of the SQL files applied to a schema, stored in table 'audit_migration_ledger' of that schema.
+    Files already applied with the same content are skipped. Rows are written in the same transaction than
+    its file, so after a failure only the committed files are skipped when the process is run again """
+
+    TABLE = 'audit_migration_ledger'
+
+    def __init__(self, dao, schema_name, version, enabled=True):
+        """
+        :param dao: PgDao where files are executed
+        :param version: Version of the plugin applying the files
+        :param enabled: If False files are never skipped, but timings are still collected
+        """
+
+        self.dao = dao
+        self.schema_name = schema_name
+        self.version = str(version)
+        self.enabled = enabled
+        self.ready = False
+        # Files applied: {file path: hash}
+        self.applied = {}
+        # Files executed before the schema was created
+        self.pending = []
+        # List of tuples (file path, status, duration)
+        self.timings = []
+
+
+    def load(self):
+        """ Read files already applied to the schema. Return False if it can not be read """
+
+        if not self.enabled:
+            return True
+
+        self.ready = self.create_table()
+        if not self.ready:
+            if self.dao.last_error is None:
+                return True
+            self.enabled = False
+            return False
+
+        sql = f'SELECT file_path, file_hash FROM "{self.schema_name}".{self.TABLE}'
+        rows = self.execute(self.dao.get_rows, sql)
+        if rows is None:
+            self.enabled = False
+            return False
+        self.applied = {row[0]: row[1] for row in rows}
+        return True
+
+
+    def create_table(self):
+        """ Create ledger table if its schema exists. Return True if table is available """
+
+        sql = self.dao.mogrify("SELECT 1 FROM pg_namespace WHERE nspname = %s", (self.schema_name,))
+        if not self.dao.get_row(sql):
+            return False
+
+        sql = (f'CREATE TABLE IF NOT EXISTS "{self.schema_name}".{self.TABLE} ('
+               f'file_path text PRIMARY KEY, file_hash text NOT NULL, version text, '
+               f'duration double precision, applied_at timestamp DEFAULT now())')
+        return bool(self.execute(self.dao.execute_sql, sql, commit=False))
+
+
+    def execute(self, function, *args, **kwargs):
+        """ Call dao @function inside a savepoint, so an error in the ledger does not abort the transaction
+        of the files being applied """
+
+        self.dao.execute_sql("SAVEPOINT gw_migration_ledger", commit=False)
+        result = function(*args, **kwargs)
+        error = self.dao.last_error
+        if error is None:
+            self.dao.execute_sql("RELEASE SAVEPOINT gw_migration_ledger", commit=False)
+        else:
+            self.dao.execute_sql("ROLLBACK TO SAVEPOINT gw_migration_ledger", commit=False)
+            self.dao.last_error = error
+
+        return result
+
+
+    def get_hash(self, content):
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+    def is_applied(self, file_path, file_hash):
+        """ Check if @file_path was already applied with the same content """
+        return self.enabled and self.applied.get(file_path) == file_hash
+
+
+    def skip(self, file_path):
+        self.timings.append((file_path, 'skipped', 0.0))
+
+
+    def fail(self, file_path, duration):
+        self.timings.append((file_path, 'failed', duration))
+
+
+    def record(self, file_path, file_hash, duration):
+        """ Register file applied in current transaction.
+        If ledger can not be updated it is disabled (files are not skipped any more) and False is returned """
+
+        self.timings.append((file_path, 'applied', duration))
+        if not self.enabled:
+            return True
+
+        self.pending.append((file_path, file_hash, self.version, duration))
+        if not self.ready:
+            # First files of a new project create the schema
+            self.ready = self.create_table()
+            if not self.ready:
+                if self.dao.last_error is None:
+                    return True
+                self.enabled = False
+                return False
+
+        sql = (f'INSERT INTO "{self.schema_name}".{self.TABLE} (file_path, file_hash, version, duration) '
+               f'VALUES %s ON CONFLICT (file_path) DO UPDATE SET file_hash = EXCLUDED.file_hash, '
+               f'version = EXCLUDED.version, duration = EXCLUDED.duration, applied_at = now()')
+        status = self.execute(self.dao.execute_values, sql, self.pending, commit=False)
+        if not status:
+            self.enabled = False
+            return False
+
+        for row in self.pending:
+            self.applied[row[0]] = row[1]
+        self.pending = []
+        return True
+
+
+    def get_summary(self, limit=10):
+        """ Return text with number of files by status and the @limit slowest files """
+
+        total = sum(timing[2] for timing in self.timings)
+        counts = {}
+        for timing in self.timings:
+            counts[timing[1]] = counts.get(timing[1], 0) + 1
+        lines = [f"Schema {self.schema_name}: {len(self.timings)} files in {total:.2f} s ("
+                 + ", ".join(f"{status}: {count}" for status, count in sorted(counts.items())) + ")"]
+        for file_path, status, duration in sorted(self.timings, key=lambda x: x[2], reverse=True)[:limit]:
+            if status != 'skipped':
+                lines.append(f"{duration:9.3f} s  {file_path} ({status})")
+
+        return "\n".join(lines)
+
+
+    def write_report(self, folder):
+        """ Write timing of every file into a CSV file of @folder. Return its path, or None if it failed """
+
+        if not self.timings:
+            return None
+
+        tstamp = time.strftime('%Y%m%d%H%M%S')
+        path = os.path.join(folder, f"sql_timing_{self.schema_name}_{tstamp}.csv")
+        try:
+            with open(path, 'w', newline='') as output:
+                writer = csv.writer(output)
+                writer.writerow(['file_path', 'status', 'duration'])
+                for file_path, status, duration in self.timings:
+                    writer.writerow([file_path, status, f"{duration:.3f}"])
+        except OSError:
+            return None
+
+        return path
+
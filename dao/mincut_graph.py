@@ -0,0 +1,223 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+import multiprocessing
+import multiprocessing.sharedctypes
+import os
+import sys
+from array import array
+from collections import deque
+
+from .network_graph import NetworkGraph
+
+
+# Values of array 'node_flags'
+NODE_DEFAULT = 0
+# Valve that can be closed to isolate a zone
+NODE_VALVE = 1
+# Valve already closed: water does not flow through it
+NODE_VALVE_CLOSED = 2
+
+
+class MincutGraph(object):
+    """ Undirected graph of the water network where valves are barriers. Used to compute isolation zones
+    (mincuts) of many arcs without calling 'gw_fct_mincut' for each one. Nodes and arcs are referenced by
+    its internal index, see NetworkGraph """
+
+    def __init__(self):
+
+        self.graph = NetworkGraph(directed=False)
+        self.node_flags = bytearray()
+        self.arc_length = array('d')
+        self.arc_connecs = array('i')
+        self.arc_hydrometers = array('i')
+        self.arc_index = None
+
+
+    def build(self, arcs, valves, connecs=None, hydrometers=None):
+        """ Build graph
+        :param arcs: Iterable of tuples (arc_id, node_1, node_2, length)
+        :param valves: Dict {node_id: closed} of valves to be considered by mincut
+        :param connecs: Dict {arc_id: number of connecs}
+        :param hydrometers: Dict {arc_id: number of hydrometers}
+        """
+
+        connecs = connecs or {}
+        hydrometers = hydrometers or {}
+        lengths = {}
+        edges = []
+        for arc_id, node_1, node_2, length in arcs:
+            arc_id = str(arc_id)
+            lengths[arc_id] = length or 0.0
+            edges.append((arc_id, str(node_1), str(node_2), 1))
+        self.graph.build(edges)
+        self.arc_index = None
+
+        self.node_flags = bytearray(len(self.graph.node_ids))
+        for node_id, closed in valves.items():
+            index = self.graph.node_index.get(str(node_id))
+            if index is not None:
+                self.node_flags[index] = NODE_VALVE_CLOSED if closed else NODE_VALVE
+
+        arc_ids = self.graph.edge_ids
+        self.arc_length = array('d', (float(lengths[arc_id]) for arc_id in arc_ids))
+        self.arc_connecs = array('i', (int(connecs.get(arc_id, 0)) for arc_id in arc_ids))
+        self.arc_hydrometers = array('i', (int(hydrometers.get(arc_id, 0)) for arc_id in arc_ids))
+
+        return self
+
+
+    def get_arrays(self):
+        """ Return arrays needed by function 'isolate_arc', in the order of its parameters """
+
+        graph = self.graph
+        return (graph.adj_start, graph.adj_node, graph.adj_edge, graph.edge_source, graph.edge_target,
+                self.node_flags, self.arc_length, self.arc_connecs, self.arc_hydrometers)
+
+
+    def get_arc_index(self, arc_id):
+        """ Return internal index of @arc_id or None if it is not in graph """
+
+        if self.arc_index is None:
+            self.arc_index = {arc_id: i for i, arc_id in enumerate(self.graph.edge_ids)}
+        return self.arc_index.get(str(arc_id))
+
+
+    def isolate(self, arc_index):
+        """ Compute isolation zone of arc with internal index @arc_index. See function 'isolate_arc' """
+        return isolate_arc(arc_index, *self.get_arrays())
+
+
+def isolate_arc(arc_index, adj_start, adj_node, adj_edge, edge_source, edge_target, node_flags,
+                arc_length, arc_connecs, arc_hydrometers):
+    """ Compute zone affected by a break of arc @arc_index: breadth-first search from its end nodes that stops
+    at valves. Valves reached must be closed (closed ones are already barriers)
+    :return: Tuple (arc_index, number of arcs, length, connecs, hydrometers, tuple of valve node indexes)
+    """
+
+    num_nodes = len(node_flags)
+    visited_nodes = bytearray(num_nodes)
+    visited_arcs = {arc_index}
+    valves = []
+    queue = deque()
+    for node in (edge_source[arc_index], edge_target[arc_index]):
+        if visited_nodes[node]:
+            continue
+        visited_nodes[node] = 1
+        flag = node_flags[node]
+        if flag == NODE_VALVE:
+            valves.append(node)
+        elif flag == NODE_DEFAULT:
+            queue.append(node)
+
+    while queue:
+        current = queue.popleft()
+        for i in range(adj_start[current], adj_start[current + 1]):
+            visited_arcs.add(adj_edge[i])
+            neighbour = adj_node[i]
+            if visited_nodes[neighbour]:
+                continue
+            visited_nodes[neighbour] = 1
+            flag = node_flags[neighbour]
+            if flag == NODE_VALVE:
+                valves.append(neighbour)
+            elif flag == NODE_DEFAULT:
+                queue.append(neighbour)
+
+    length = 0.0
+    connecs = 0
+    hydrometers = 0
+    for arc in visited_arcs:
+        length += arc_length[arc]
+        connecs += arc_connecs[arc]
+        hydrometers += arc_hydrometers[arc]
+
+    return arc_index, len(visited_arcs), length, connecs, hydrometers, tuple(valves)
+
+
+# Arrays shared with worker processes (set by 'init_worker')
+worker_arrays = None
+
+
+def init_worker(*arrays):
+    """ Initialize worker process with shared arrays of the graph """
+
+    global worker_arrays
+    worker_arrays = arrays
+
+
+def isolate_arc_worker(arc_index):
+    """ Function executed by worker processes """
+    return isolate_arc(arc_index, *worker_arrays)
+
+
+def get_python_executable():
+    """ Return Python interpreter to spawn worker processes. Inside QGIS 'sys.executable' is usually
+    QGIS itself, so the interpreter is looked for in the Python installation """
+
+    if os.path.basename(sys.executable).lower().startswith('python'):
+        return sys.executable
+
+    if sys.platform == 'win32':
+        candidates = ('pythonw.exe', 'python.exe')
+        folders = (sys.exec_prefix, os.path.dirname(sys.executable))
+    else:
+        candidates = (f'python{sys.version_info[0]}.{sys.version_info[1]}', f'python{sys.version_info[0]}', 'python')
+        folders = (os.path.join(sys.exec_prefix, 'bin'), )
+
+    for folder in folders:
+        for candidate in candidates:
+            path = os.path.join(folder, candidate)
+            if os.path.isfile(path):
+                return path
+
+    return None
+
+
+def compute_mincuts(mincut_graph, arc_indexes, processes=None, chunksize=32, task=None):
+    """ Compute isolation zones of @arc_indexes. With @processes > 1 they are computed by a pool of processes
+    sharing the arrays of the graph (read only)
+    :param task: QgsTask used to report progress and check cancellation
+    :return: List of tuples returned by 'isolate_arc' (in any order) or None if @task has been cancelled
+    """
+
+    arc_indexes = list(arc_indexes)
+    total = len(arc_indexes) or 1
+    if processes is None:
+        processes = max(1, (os.cpu_count() or 1) - 1)
+    executable = get_python_executable() if processes > 1 else None
+
+    results = []
+    if processes <= 1 or executable is None or len(arc_indexes) < 2 * chunksize:
+        arrays = mincut_graph.get_arrays()
+        for i, arc_index in enumerate(arc_indexes, 1):
+            results.append(isolate_arc(arc_index, *arrays))
+            if task is not None and i % chunksize == 0:
+                if task.isCanceled():
+                    return None
+                task.setProgress(i * 100 / total)
+        return results
+
+    # Processes are spawned (not forked) because QGIS is a multithreaded Qt application
+    context = multiprocessing.get_context('spawn')
+    context.set_executable(executable)
+    shared_arrays = []
+    for values in mincut_graph.get_arrays():
+        typecode = 'B' if isinstance(values, bytearray) else values.typecode
+        shared_arrays.append(multiprocessing.sharedctypes.RawArray(typecode, values))
+
+    with context.Pool(processes, initializer=init_worker, initargs=shared_arrays) as pool:
+        iterator = pool.imap_unordered(isolate_arc_worker, arc_indexes, chunksize)
+        for i, result in enumerate(iterator, 1):
+            results.append(result)
+            if task is not None and i % chunksize == 0:
+                if task.isCanceled():
+                    pool.terminate()
+                    return None
+                task.setProgress(i * 100 / total)
+
+    return results
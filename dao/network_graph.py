@@ -0,0 +1,257 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+import heapq
+from array import array
+from collections import deque
+
+
+class NetworkGraph(object):
+    """ Network graph stored as compressed sparse row (CSR) arrays.
+    Nodes and edges are referenced by its internal index (0..n-1). Arrays @node_ids and @edge_ids map them
+    back to the identifiers of the database """
+
+    def __init__(self, directed=False):
+
+        self.directed = directed
+        self.node_ids = []
+        self.node_index = {}
+        self.edge_ids = []
+        self.edge_source = array('i')
+        self.edge_target = array('i')
+        self.edge_cost = array('d')
+        # CSR adjacency: neighbours of node i are adj_node[adj_start[i]:adj_start[i + 1]]
+        self.adj_start = array('i', [0])
+        self.adj_node = array('i')
+        self.adj_edge = array('i')
+        self.in_start = self.adj_start
+        self.in_node = self.adj_node
+        self.in_edge = self.adj_edge
+
+
+    def get_node_index(self, node_id):
+        """ Return internal index of @node_id, adding it if not exists """
+
+        index = self.node_index.get(node_id)
+        if index is None:
+            index = len(self.node_ids)
+            self.node_index[node_id] = index
+            self.node_ids.append(node_id)
+
+        return index
+
+
+    def build(self, edges):
+        """ Build graph from iterable @edges of tuples (edge_id, source_id, target_id, cost).
+        Edges with negative cost are discarded, as pgRouting does """
+
+        for edge_id, source_id, target_id, cost in edges:
+            if cost is None or cost < 0:
+                continue
+            self.edge_ids.append(edge_id)
+            self.edge_source.append(self.get_node_index(source_id))
+            self.edge_target.append(self.get_node_index(target_id))
+            self.edge_cost.append(float(cost))
+
+        num_nodes = len(self.node_ids)
+        self.adj_start, self.adj_node, self.adj_edge = self.get_csr(
+            num_nodes, self.edge_source, self.edge_target, both_ways=not self.directed)
+        if self.directed:
+            # Incoming adjacency, used to traverse the graph against edges direction
+            self.in_start, self.in_node, self.in_edge = self.get_csr(
+                num_nodes, self.edge_target, self.edge_source, both_ways=False)
+
+        return self
+
+
+    def get_csr(self, num_nodes, sources, targets, both_ways):
+        """ Build CSR adjacency arrays (start, node, edge) of edges from @sources to @targets """
+
+        # Count neighbours of every node
+        degree = array('i', bytes(4 * (num_nodes + 1)))
+        for i in range(len(sources)):
+            degree[sources[i] + 1] += 1
+            if both_ways:
+                degree[targets[i] + 1] += 1
+        for i in range(num_nodes):
+            degree[i + 1] += degree[i]
+        adj_start = degree
+
+        # Fill adjacency arrays
+        size = adj_start[num_nodes]
+        adj_node = array('i', bytes(4 * size))
+        adj_edge = array('i', bytes(4 * size))
+        position = array('i', adj_start)
+        for i in range(len(sources)):
+            source = sources[i]
+            target = targets[i]
+            adj_node[position[source]] = target
+            adj_edge[position[source]] = i
+            position[source] += 1
+            if both_ways:
+                adj_node[position[target]] = source
+                adj_edge[position[target]] = i
+                position[target] += 1
+
+        return adj_start, adj_node, adj_edge
+
+
+    def neighbours(self, index):
+        """ Return pairs (node index, edge index) adjacent to node @index """
+
+        start = self.adj_start[index]
+        end = self.adj_start[index + 1]
+        return zip(self.adj_node[start:end], self.adj_edge[start:end])
+
+
+    def shortest_path(self, start_id, end_id, heuristic=None):
+        """ Compute shortest path between nodes @start_id and @end_id with Dijkstra algorithm.
+        If @heuristic is set (function of two node indexes returning a lower bound of the cost), A* is used
+        :return: Tuple (list of node ids, list of edge ids) or (None, None) if there is no path
+        """
+
+        start = self.node_index.get(start_id)
+        end = self.node_index.get(end_id)
+        if start is None or end is None:
+            return None, None
+
+        num_nodes = len(self.node_ids)
+        inf = float('inf')
+        cost = array('d', [inf]) * num_nodes
+        prev_edge = array('i', [-1]) * num_nodes
+        prev_node = array('i', [-1]) * num_nodes
+        visited = bytearray(num_nodes)
+        cost[start] = 0.0
+        queue = [(0.0, start)]
+        while queue:
+            priority, current = heapq.heappop(queue)
+            if visited[current]:
+                continue
+            if current == end:
+                break
+            visited[current] = 1
+            current_cost = cost[current]
+            for neighbour, edge in self.neighbours(current):
+                new_cost = current_cost + self.edge_cost[edge]
+                if new_cost < cost[neighbour]:
+                    cost[neighbour] = new_cost
+                    prev_edge[neighbour] = edge
+                    prev_node[neighbour] = current
+                    if heuristic:
+                        new_cost += heuristic(neighbour, end)
+                    heapq.heappush(queue, (new_cost, neighbour))
+
+        if cost[end] == inf:
+            return None, None
+
+        # Rebuild path from end to start
+        nodes = [end]
+        edges = []
+        current = end
+        while current != start:
+            edges.append(prev_edge[current])
+            current = prev_node[current]
+            nodes.append(current)
+        nodes.reverse()
+        edges.reverse()
+
+        return [self.node_ids[i] for i in nodes], [self.edge_ids[i] for i in edges]
+
+
+    def traverse(self, start_id, reverse=False):
+        """ Get nodes and edges reachable from @start_id with an iterative breadth-first search.
+        If @reverse is set, edges are traversed against its direction (ie: upstream)
+        :return: Tuple (list of node ids, list of edge ids) or (None, None) if @start_id is not in graph
+        """
+
+        start = self.node_index.get(start_id)
+        if start is None:
+            return None, None
+
+        if reverse:
+            adj_start, adj_node, adj_edge = self.in_start, self.in_node, self.in_edge
+        else:
+            adj_start, adj_node, adj_edge = self.adj_start, self.adj_node, self.adj_edge
+
+        visited_nodes = bytearray(len(self.node_ids))
+        visited_edges = bytearray(len(self.edge_ids))
+        nodes = [start]
+        edges = []
+        visited_nodes[start] = 1
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            for i in range(adj_start[current], adj_start[current + 1]):
+                edge = adj_edge[i]
+                if not visited_edges[edge]:
+                    visited_edges[edge] = 1
+                    edges.append(edge)
+                neighbour = adj_node[i]
+                if not visited_nodes[neighbour]:
+                    visited_nodes[neighbour] = 1
+                    nodes.append(neighbour)
+                    queue.append(neighbour)
+
+        return [self.node_ids[i] for i in nodes], [self.edge_ids[i] for i in edges]
+
+
+# Graphs loaded in current session. They are dropped when network is edited
+graphs = {}
+
+
+def get_pgrouting_graph(controller):
+    """ Return graph of view 'v_anl_pgrouting_arc' identified by arc_id and node_id.
+    It is loaded from database only the first time (or after an invalidation) """
+
+    key = ('pgrouting', controller.schema_name)
+    graph = graphs.get(key)
+    if graph is not None:
+        return graph
+
+    sql = ("SELECT v_anl_pgrouting_arc.arc_id, n1.node_id, n2.node_id, cost "
+           "FROM v_anl_pgrouting_arc "
+           "JOIN v_anl_pgrouting_node AS n1 ON n1.rid = v_anl_pgrouting_arc.source "
+           "JOIN v_anl_pgrouting_node AS n2 ON n2.rid = v_anl_pgrouting_arc.target")
+    rows = controller.get_rows(sql, commit=True)
+    if not rows:
+        return None
+
+    graph = NetworkGraph(directed=False)
+    graph.build((str(row[0]), str(row[1]), str(row[2]), row[3]) for row in rows)
+    graphs[key] = graph
+    controller.log_info(f"Network graph loaded: {len(graph.node_ids)} nodes, {len(graph.edge_ids)} arcs")
+
+    return graph
+
+
+def get_flow_graph(controller):
+    """ Return directed graph of view 'v_edit_arc' (from node_1 to node_2, following flow direction).
+    It is loaded from database only the first time (or after an invalidation) """
+
+    key = ('flow', controller.schema_name)
+    graph = graphs.get(key)
+    if graph is not None:
+        return graph
+
+    sql = ("SELECT arc_id, node_1, node_2 "
+           "FROM v_edit_arc "
+           "WHERE node_1 IS NOT NULL AND node_2 IS NOT NULL")
+    rows = controller.get_rows(sql, commit=True)
+    if not rows:
+        return None
+
+    graph = NetworkGraph(directed=True)
+    graph.build((str(row[0]), str(row[1]), str(row[2]), 1) for row in rows)
+    graphs[key] = graph
+    controller.log_info(f"Flow graph loaded: {len(graph.node_ids)} nodes, {len(graph.edge_ids)} arcs")
+
+    return graph
+
+
+def invalidate_graphs():
+    """ Drop all loaded graphs. Called when network is edited """
+    graphs.clear()
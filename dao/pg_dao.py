@@ -5,28 +5,71 @@ General Public License as published by the Free Software Foundation, either vers
 or (at your option) any later version.
 """
 # -*- coding: utf-8 -*-
+import json
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
+
+from contextlib import contextmanager
+
+try:
+    # Faster json decoder, if available
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+
+def register_json(conn):
+    """ Decode json and jsonb values of @conn into plain dicts with the fastest decoder available """
+
+    psycopg2.extras.register_default_json(conn, loads=json_loads)
+    psycopg2.extras.register_default_jsonb(conn, loads=json_loads)
 
 
 class PgDao(object):
 
     def __init__(self):
         self.last_error = None
+        self.conn = None
+        self.cursor = None
+        self.pool = None
+        self.owns_conn = True
         
         
     def init_db(self):
         """ Initializes database connection """
 
         try:
-            self.conn = psycopg2.connect(self.conn_string)
+            if self.pool:
+                self.conn = self.pool.getconn()
+            else:
+                self.conn = psycopg2.connect(self.conn_string)
+            register_json(self.conn)
             self.cursor = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
             status = True
         except psycopg2.DatabaseError as e:
             self.last_error = e            
             status = False
+        except psycopg2.pool.PoolError as e:
+            self.last_error = e
+            status = False
         return status
 
+
+    def init_pool(self, min_conn=1, max_conn=5):
+        """ Initializes a pool of database connections. The UI path keeps one of them checked out (warm) as
+        @self.conn, the rest are handed out to background tasks through @checkout or @get_task_dao """
+
+        try:
+            self.pool = psycopg2.pool.ThreadedConnectionPool(min_conn, max_conn, self.conn_string)
+        except psycopg2.DatabaseError as e:
+            self.last_error = e
+            self.pool = None
+            return False
+
+        return self.init_db()
+
     
     def close_db(self):
         """ Close database connection """
@@ -35,8 +78,14 @@ class PgDao(object):
             status = True
             if self.cursor:
                 self.cursor.close()
-            if self.conn:
-                self.conn.close()
+            if self.conn and self.owns_conn:
+                if self.pool:
+                    self.pool.putconn(self.conn, close=True)
+                else:
+                    self.conn.close()
+            if self.pool and self.owns_conn:
+                self.pool.closeall()
+                self.pool = None
             del self.cursor
             del self.conn
         except Exception as e:
@@ -46,11 +95,94 @@ class PgDao(object):
         return status
 
 
+    def is_healthy(self, conn=None):
+        """ Check if @conn (by default the UI one) is still usable. Only a broken transaction or a closed
+        socket are considered unhealthy, so this is cheap enough to be called before every query """
+
+        if conn is None:
+            conn = self.conn
+        if conn is None or conn.closed:
+            return False
+        if conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+
+        return True
+
+
+    def reconnect(self):
+        """ Replace UI connection with a new one. In pooled mode the broken connection is discarded.
+        Daos of background tasks do not own its connection, so they raise instead of opening a new one """
+
+        if not self.owns_conn:
+            raise psycopg2.InterfaceError("Connection of background task is closed or broken")
+
+        if self.pool and self.conn is not None:
+            try:
+                self.pool.putconn(self.conn, close=True)
+            except psycopg2.pool.PoolError:
+                pass
+        self.conn = None
+        return self.init_db()
+
+
     def check_cursor(self, is_notify=False):
         """ Check if cursor is closed """
 
-        if self.cursor.closed:
-            self.init_db()
+        if self.cursor is None or self.cursor.closed or not self.is_healthy():
+            self.reconnect()
+
+
+    @contextmanager
+    def checkout(self):
+        """ Check out a dedicated connection from the pool and return it when the block ends.
+        Without a pool, or if all its connections are in use, a fresh connection is opened and closed instead """
+
+        conn = None
+        pooled = False
+        try:
+            if self.pool:
+                try:
+                    conn = self.pool.getconn()
+                    pooled = True
+                    if not self.is_healthy(conn):
+                        self.pool.putconn(conn, close=True)
+                        pooled = False
+                        conn = self.pool.getconn()
+                        pooled = True
+                except psycopg2.pool.PoolError:
+                    # Pool exhausted: do not make the caller fail (or wait) for a free connection
+                    conn = None
+            if conn is None:
+                conn = psycopg2.connect(self.conn_string)
+            register_json(conn)
+            yield conn
+        finally:
+            if conn is not None:
+                if not conn.closed and conn.get_transaction_status() != \
+                        psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if pooled:
+                    self.pool.putconn(conn, close=not self.is_healthy(conn))
+                else:
+                    conn.close()
+
+
+    @contextmanager
+    def get_task_dao(self):
+        """ Return a PgDao bound to a dedicated connection, so long running work (background tasks, EPA
+        exports...) does not block the UI connection """
+
+        with self.checkout() as conn:
+            dao = PgDao()
+            dao.conn_string = self.conn_string
+            dao.conn = conn
+            dao.owns_conn = False
+            dao.cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+            try:
+                yield dao
+            finally:
+                if not dao.cursor.closed:
+                    dao.cursor.close()
 
 
     def cursor_execute(self, sql):
@@ -65,9 +197,9 @@ class PgDao(object):
         try:
             self.conn.poll()
         except psycopg2.InterfaceError:
-            self.init_db()
+            self.reconnect()
         except psycopg2.OperationalError:
-            self.init_db()
+            self.reconnect()
 
 
     def get_conn_encoding(self):
@@ -124,6 +256,35 @@ class PgDao(object):
             return rows
     
     
+    def get_rows_iter(self, sql, itersize=2000, cursor_name='gw_server_cursor', withhold=False, raise_error=False):
+        """ Generator over rows of selected query. It uses a server-side (named) cursor, so rows are fetched
+        in batches of @itersize and never materialized all together. Transaction is not committed
+        :param withhold: Declare cursor WITH HOLD, so it can be used after the transaction is committed
+        :param raise_error: Raise errors of the cursor to the consumer, besides setting self.last_error.
+            Use it when other queries can run on the same connection between batches
+        """
+
+        self.last_error = None
+        cursor = None
+        try:
+            self.check_cursor()
+            cursor = self.conn.cursor(name=cursor_name, withhold=withhold)
+            cursor.itersize = itersize
+            cursor.execute(sql)
+            for row in cursor:
+                yield row
+        except Exception as e:
+            self.last_error = e
+            if raise_error:
+                raise
+        finally:
+            if cursor is not None and not cursor.closed:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+
     def get_row(self, sql, commit=False):
         """ Get single row from selected query """
 
@@ -186,6 +347,28 @@ class PgDao(object):
             return status 
 
 
+    def execute_values(self, sql, argslist, template=None, page_size=1000, fetch=False, commit=True):
+        """ Execute @sql with a single 'VALUES %s' placeholder for all rows of @argslist (psycopg2 execute_values).
+        Return fetched rows if @fetch is set, True otherwise, or None if it fails """
+
+        self.last_error = None
+        result = None
+        try:
+            self.check_cursor()
+            result = psycopg2.extras.execute_values(self.cursor, sql, argslist, template, page_size, fetch)
+            if not fetch:
+                result = True
+            if commit:
+                self.commit()
+        except Exception as e:
+            self.last_error = e
+            result = None
+            if commit:
+                self.rollback()
+        finally:
+            return result
+
+
     def execute_returning(self, sql, commit=True):
         """ Execute selected query and return RETURNING field """
 
@@ -219,6 +402,20 @@ class PgDao(object):
         """ Rollback current database transaction """
         self.check_cursor()
         self.conn.rollback()
+
+
+    def cancel(self):
+        """ Cancel statement being executed by the connection. It can be called from another thread,
+        and it does not need another connection of the pool """
+
+        conn = self.conn
+        if conn is None or conn.closed:
+            return False
+        try:
+            conn.cancel()
+            return True
+        except psycopg2.Error:
+            return False
         
         
     def copy_expert(self, sql, csv_file):
@@ -0,0 +1,120 @@
+"""
+This file is part of Giswater 3
+The program is free software: you can redistribute it and/or modify it under the terms of the GNU
+General Public License as published by the Free Software Foundation, either version 3 of the License,
+or (at your option) any later version.
+"""
+# -*- coding: utf-8 -*-
+from qgis.PyQt.QtCore import QObject, pyqtSignal
+
+import psycopg2
+import psycopg2.extensions
+import select
+import socket
+import threading
+
+
+class PgListener(QObject):
+    """ Listen PostgreSQL channels on a dedicated connection.
+    A single worker thread blocks on select() over the connection socket, so it costs nothing while idle.
+    Notifications are sent to the main thread through signal @notification_received """
+
+    # Parameters: channel, pid, payload
+    notification_received = pyqtSignal(str, int, str)
+
+    def __init__(self, conn_string, channels, reconnect_delay=1.0, max_reconnect_delay=30.0):
+
+        QObject.__init__(self)
+        self.conn_string = conn_string
+        self.channels = list(channels)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.conn = None
+        self.thread = None
+        self.last_error = None
+        self.stop_event = threading.Event()
+        # Socket pair used to wake up select() when listener is stopped
+        self.wakeup_read = None
+        self.wakeup_write = None
+
+
+    def start(self):
+        """ Start worker thread """
+
+        if self.thread is not None and self.thread.is_alive():
+            return
+
+        self.stop_event.clear()
+        self.wakeup_read, self.wakeup_write = socket.socketpair()
+        self.thread = threading.Thread(target=self.run, name='gw_pg_listener', daemon=True)
+        self.thread.start()
+
+
+    def stop(self, timeout=2.0):
+        """ Stop worker thread and close its connection """
+
+        self.stop_event.set()
+        try:
+            if self.wakeup_write is not None:
+                self.wakeup_write.send(b'\0')
+        except OSError:
+            pass
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+
+    def connect(self):
+        """ Open listening connection and LISTEN all channels. Called again after every reconnection """
+
+        self.close()
+        self.conn = psycopg2.connect(self.conn_string)
+        self.conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.conn.cursor() as cursor:
+            for channel_name in self.channels:
+                cursor.execute(f'LISTEN "{channel_name}";')
+
+
+    def close(self):
+        """ Close listening connection """
+
+        if self.conn is None:
+            return
+        try:
+            self.conn.close()
+        except psycopg2.Error:
+            pass
+        self.conn = None
+
+
+    def run(self):
+        """ Worker loop. Wait on the connection socket and emit every notification received """
+
+        delay = self.reconnect_delay
+        while not self.stop_event.is_set():
+            try:
+                if self.conn is None or self.conn.closed:
+                    self.connect()
+                    delay = self.reconnect_delay
+
+                readable, _, _ = select.select([self.conn, self.wakeup_read], [], [])
+                if self.wakeup_read in readable:
+                    self.wakeup_read.recv(64)
+                    continue
+
+                self.conn.poll()
+                while self.conn.notifies:
+                    notify = self.conn.notifies.pop(0)
+                    self.notification_received.emit(notify.channel, notify.pid, notify.payload)
+
+            except (psycopg2.OperationalError, psycopg2.InterfaceError, OSError) as e:
+                # Connection lost: wait and reconnect (channels are listened again in self.connect)
+                self.last_error = e
+                self.close()
+                self.stop_event.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+        self.close()
+        self.wakeup_read.close()
+        self.wakeup_write.close()
+
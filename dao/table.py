@@ -55,28 +55,73 @@ class Table(object):
         return self.__pk
 
 
+    # Field names of every subclass, computed once: {class: [field names]}
+    __field_names = {}
+
+    @classmethod
+    def class_field_names(cls):
+        """Return the list of field names composing the table (computed only once per class)."""
+
+        fields = Table.__field_names.get(cls)
+        if fields is None:
+            fields = list(vars(cls).keys())
+            # remove all _<classname>__<name> or __<names>__ vars, e.g. private vars
+            fields = [x for x in fields if "__" not in x]
+            Table.__field_names[cls] = fields
+        return fields
+
+
     def field_names(self):
         """Return the list of field names composing the table.
         Names are that exposed in the class not derived from the db table."""
-        
-        fields = list(vars(self.__class__).keys())
-        # remove all _<classname>__<name> or __<names>__ vars, e.g. private vars
-        fields = [x for x in fields if "__" not in x]
-        return fields
+
+        return list(self.class_field_names())
+
+
+    def identity_key(self, pk_value=None):
+        """Return key of the record in the identity map of the controller."""
+
+        if pk_value is None:
+            pk_value = getattr(self, self.pk())
+        return self.table_name(), str(pk_value)
+
+
+    def remember(self):
+        """Store current values in the identity map of the controller."""
+
+        identity_map = getattr(self.controller(), 'identity_map', None)
+        if identity_map is None:
+            return
+        identity_map[self.identity_key()] = {field: getattr(self, field) for field in self.class_field_names()}
 
 
-    def fetch(self, commit=True):
-        """retrieve a record with a specified primary key id."""
+    def forget(self, pk_value=None):
+        """Remove record from the identity map of the controller."""
+
+        identity_map = getattr(self.controller(), 'identity_map', None)
+        if identity_map:
+            identity_map.pop(self.identity_key(pk_value), None)
+
+
+    def fetch(self, commit=True, refresh=True):
+        """retrieve a record with a specified primary key id.
+        Record is always read from the database, as the identity map is not updated by raw SQL writes or
+        triggers. Set @refresh to False to read it from the identity map if it was already fetched."""
         
         if not getattr(self, self.pk()):
             message = "No primary key value set"
             self.controller().show_info(message, parameter=self.pk)
             return False
 
-        fields = list(vars(self.__class__).keys())
-        # remove all _<classname>__<name> or __<names>__ vars, e.g. private vars
-        fields = [x for x in fields if "__" not in x]
+        identity_map = getattr(self.controller(), 'identity_map', None)
+        if identity_map is not None and not refresh:
+            values = identity_map.get(self.identity_key())
+            if values is not None:
+                for field, value in values.items():
+                    setattr(self, field, value)
+                return True
 
+        fields = self.class_field_names()
         sql = "SELECT {0} FROM {1} WHERE {2} = '{3}'".format(
             ", ".join(fields),
             self.table_name(),
@@ -89,6 +134,7 @@ class Table(object):
         # set values of the current Event get from row values
         for field, value in zip(fields, row):
             setattr(self, field, value)
+        self.remember()
 
         return True
 
@@ -97,9 +143,7 @@ class Table(object):
         """Save current event state in the DB as new record.
         Eventually add the record if it is not available"""
         
-        fields = list(vars(self.__class__).keys())
-        # remove all _<classname>__<name> or __<names>__ vars, e.g. private vars
-        fields = [x for x in fields if (("__" not in x) and (x != self.pk()))]
+        fields = [x for x in self.class_field_names() if x != self.pk()]
         values = [getattr(self, field) for field in fields]
 
         # remove all None elements
@@ -113,6 +157,7 @@ class Table(object):
         values = [str(x) for x in values]
 
         current_pk = getattr(self, self.pk())
+        self.forget()
         status = self.controller().execute_upsert(
             self.table_name(), self.pk(), str(current_pk), fields, values, commit=commit)
         if status:
@@ -129,6 +174,124 @@ class Table(object):
         return True
 
 
+    @classmethod
+    def fetch_many(cls, controller, pks, commit=True, refresh=False):
+        """Retrieve records with primary key in @pks with a single query.
+        Records already fetched in this session are read from the identity map unless @refresh is set.
+        :return: list of records (in the order of @pks, skipping the ones not found) or None if query fails
+        """
+
+        pks = list(pks)
+        records = {}
+        identity_map = getattr(controller, 'identity_map', None)
+        missing_pks = []
+        for pk_value in pks:
+            record = cls(controller)
+            key = record.identity_key(pk_value)
+            values = None if refresh or identity_map is None else identity_map.get(key)
+            if values is None:
+                missing_pks.append(pk_value)
+                continue
+            for field, value in values.items():
+                setattr(record, field, value)
+            records[key] = record
+
+        if missing_pks:
+            record = cls(controller)
+            fields = cls.class_field_names()
+            sql = "SELECT {0} FROM {1} WHERE {2} IN %s".format(
+                ", ".join(fields), record.table_name(), record.pk())
+            rows = controller.get_rows(sql, log_info=False, commit=commit,
+                                       params=(tuple(str(x) for x in missing_pks), ))
+            if rows is None and controller.last_error:
+                return None
+            for row in rows or []:
+                record = cls(controller)
+                for field, value in zip(fields, row):
+                    setattr(record, field, value)
+                record.remember()
+                records[record.identity_key()] = record
+
+        return [records[key] for key in (cls(controller).identity_key(x) for x in pks) if key in records]
+
+
+    @classmethod
+    def upsert_many(cls, controller, records, commit=True, page_size=1000):
+        """Save @records in a single transaction, inserting them with 'INSERT ... VALUES' of many rows.
+        Records sharing the same not null fields are sent together. Records without primary key get the one
+        assigned by the database.
+        :return: True if all records have been saved
+        """
+
+        records = list(records)
+        if not records:
+            return True
+
+        # Group records by their not null fields, as done in method upsert
+        groups = {}
+        for record in records:
+            pk = record.pk()
+            fields = []
+            for field in cls.class_field_names():
+                value = getattr(record, field)
+                if value in (None, '', 'null'):
+                    continue
+                if field == pk and (not value or (isinstance(value, int) and value < 0)):
+                    continue
+                fields.append(field)
+            groups.setdefault(tuple(fields), []).append(record)
+
+        dao = controller.dao
+        for fields, group in groups.items():
+            record = group[0]
+            pk = record.pk()
+            sql = "INSERT INTO {0} ({1}) VALUES %s".format(record.table_name(), ", ".join(fields))
+            if pk in fields:
+                update_fields = [x for x in fields if x != pk]
+                if update_fields:
+                    sql += " ON CONFLICT ({0}) DO UPDATE SET {1}".format(
+                        pk, ", ".join(f"{x} = EXCLUDED.{x}" for x in update_fields))
+                else:
+                    sql += " ON CONFLICT ({0}) DO NOTHING".format(pk)
+            sql += " RETURNING {0}".format(pk)
+
+            argslist = [tuple(getattr(x, field) for field in fields) for x in group]
+            rows = dao.execute_values(sql, argslist, page_size=page_size, fetch=True, commit=False)
+            if rows is None:
+                controller.last_error = dao.last_error
+                dao.rollback()
+                controller.show_warning_detail("Undefined error", str(dao.last_error))
+                return False
+
+            # get new added ids in case of an insert
+            if pk not in fields:
+                for x, row in zip(group, rows):
+                    setattr(x, pk, row[0])
+            for x in group:
+                x.forget()
+
+        if commit:
+            dao.commit()
+
+        return True
+
+
+    @classmethod
+    def delete_many(cls, controller, pks, commit=True):
+        """Delete records with primary key in @pks with a single query."""
+
+        pks = [str(x) for x in pks]
+        if not pks:
+            return True
+
+        record = cls(controller)
+        for pk_value in pks:
+            record.forget(pk_value)
+        sql = "DELETE FROM {0} WHERE {1} IN %s".format(record.table_name(), record.pk())
+        sql = controller.get_sql(sql, params=(tuple(pks), ))
+        return controller.execute_sql(sql, commit=commit, log_sql=True)
+
+
     def nextval(self, commit=True):
         """Get the next id for the __pk. that will be used for the next insert.
         BEWARE that this call increment the sequence at each call."""
@@ -184,6 +347,12 @@ class Table(object):
         """Delete all listed records with specified pks.
         If not ids are specified and not remove all => del current record."""
         
+        # drop deleted records from the identity map
+        identity_map = getattr(self.controller(), 'identity_map', None)
+        if identity_map:
+            for key in [x for x in identity_map if x[0] == self.table_name()]:
+                del identity_map[key]
+
         sql = "DELETE FROM {0}".format(self.table_name())
         if not all_records:
             if not where_clause:
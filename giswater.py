@@ -7,14 +7,15 @@ or (at your option) any later version.
 
 # -*- coding: utf-8 -*-
 from qgis.core import QgsCategorizedSymbolRenderer, QgsEditorWidgetSetup, QgsExpressionContextUtils, \
-    QgsFieldConstraints, QgsPointLocator, QgsProject, QgsRendererCategory, QgsSimpleFillSymbolLayer, QgsSnappingUtils, \
-    QgsSymbol, QgsTolerance
+    QgsFieldConstraints, QgsMapLayer, QgsPointLocator, QgsProject, QgsRendererCategory, QgsSimpleFillSymbolLayer, \
+    QgsSnappingUtils, QgsSymbol, QgsTolerance
 from qgis.PyQt.QtCore import QObject, QPoint, QSettings, Qt
 from qgis.PyQt.QtWidgets import QAction, QActionGroup, QApplication, QCheckBox, QDockWidget, QGridLayout, QLabel,\
     QMenu, QSizePolicy, QToolBar, QToolButton
 from qgis.PyQt.QtGui import QCursor, QIcon, QKeySequence, QPixmap
 
 import configparser
+import hashlib
 import json
 import os.path
 import random
@@ -38,6 +39,7 @@ from .actions.tm_basic import TmBasic
 from .actions.update_sql import UpdateSQL
 from .actions.utils import Utils
 from .dao.controller import DaoController
+from .dao.network_graph import invalidate_graphs
 from .map_tools.cad_add_circle import CadAddCircle
 from .map_tools.cad_add_point import CadAddPoint
 from .map_tools.cad_api_info import CadApiInfo
@@ -74,6 +76,8 @@ class Giswater(QObject):
         self.plugin_toolbars = {}
         self.available_layers = []
         self.btn_add_layers = None
+        # Id of layers whose edits drop network graphs (see connect_graph_invalidation)
+        self.graph_layers = set()
             
         # Initialize plugin directory
         self.plugin_dir = os.path.dirname(__file__)
@@ -908,6 +912,10 @@ class Giswater(QObject):
             self.notify = NotifyFunctions(self.iface, self.settings, self.controller, self.plugin_dir)
             list_channels = ['desktop', self.controller.current_user]
             self.notify.start_listening(list_channels)
+        else:
+            # Without notifications, network graphs are dropped when arcs or nodes are edited from this session
+            self.connect_graph_invalidation(self.controller.get_layers())
+            QgsProject.instance().legendLayersAdded.connect(self.connect_graph_invalidation)
 
         # Save toolbar position after save project
         self.iface.actionSaveProject().triggered.connect(self.save_toolbars_position)
@@ -1007,6 +1015,27 @@ class Giswater(QObject):
         main_menu.exec_(click_point)
 
 
+    def connect_graph_invalidation(self, layers):
+        """ Drop network graphs cached in memory when features of arc or node @layers are committed """
+
+        for layer in layers:
+            if layer is None or layer.type() != QgsMapLayer.VectorLayer or layer.id() in self.graph_layers:
+                continue
+            tablename = self.controller.get_layer_source_table_name(layer)
+            if tablename is None or not tablename.startswith(('v_edit_arc', 'v_edit_node', 've_arc', 've_node')):
+                continue
+
+            layer.committedFeaturesAdded.connect(self.invalidate_network_graphs)
+            layer.committedFeaturesRemoved.connect(self.invalidate_network_graphs)
+            layer.committedGeometriesChanges.connect(self.invalidate_network_graphs)
+            layer.committedAttributeValuesChanges.connect(self.invalidate_network_graphs)
+            self.graph_layers.add(layer.id())
+
+
+    def invalidate_network_graphs(self, *args):
+        invalidate_graphs()
+
+
     def get_new_layers_name(self, layers_list):
 
         layers_name = []
@@ -1479,22 +1508,22 @@ class Giswater(QObject):
 
         msg_failed = ""
         msg_key = ""
+        layers_found = {}
         for layer_name in layers:
             layer = self.controller.get_layer_by_tablename(layer_name)
             if not layer:
                 # msg = f"Layer {layer_name} does not found, therefore, not configured."
                 # self.controller.show_warning(msg)
                 continue
-                
-            feature = '"tableName":"' + str(layer_name) + '", "id":""'
-            body = self.create_body(feature=feature)
-            sql = f"SELECT gw_api_getinfofromid($${{{body}}}$$)"
-            row = self.controller.get_row(sql, commit=True)
-            if not row:
-                self.controller.show_message("NOT ROW FOR: " + sql, 2)
+            layers_found[layer_name] = layer
+
+        form_configs = self.get_layers_form_config(list(layers_found.keys()))
+        for layer_name, layer in layers_found.items():
+
+            complet_result = form_configs.get(layer_name)
+            if not complet_result:
                 continue
 
-            complet_result = row[0]
             # When info is nothing
             if 'results' in complet_result:
                 if complet_result['results'] == 0:
@@ -1562,6 +1591,106 @@ class Giswater(QObject):
             self.controller.show_exceptions_msg("Key on returned json from ddbb is missed.", msg_key)
 
 
+    def get_layers_form_config(self, layers_name):
+        """ Get form configuration (gw_api_getinfofromid) of all @layers_name.
+        Configurations are read from a disk cache valid while connection, schema, version and table
+        config_api_form_fields remain unchanged. Missing ones are requested to the database in a single query
+        :return: dict {layer_name: json result}
+        """
+
+        if not layers_name:
+            return {}
+
+        cache_path = self.get_form_config_cache_path()
+        form_configs = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as cache_file:
+                    form_configs = json.load(cache_file, object_pairs_hook=OrderedDict)
+            except (OSError, JSONDecodeError) as e:
+                self.controller.log_warning(f"Error reading form config cache: {e}")
+                form_configs = {}
+
+        missing_layers = [layer_name for layer_name in layers_name if layer_name not in form_configs]
+        if not missing_layers:
+            return form_configs
+
+        self.controller.log_info(f"Form config not cached for {len(missing_layers)} layers")
+        result = self.get_form_config_bulk(missing_layers)
+        if result is None:
+            result = {}
+            for layer_name in missing_layers:
+                feature = '"tableName":"' + str(layer_name) + '", "id":""'
+                body = self.create_body(feature=feature)
+                sql = f"SELECT gw_api_getinfofromid($${{{body}}}$$)"
+                row = self.controller.get_row(sql, commit=True)
+                if not row:
+                    self.controller.show_message("NOT ROW FOR: " + sql, 2)
+                    continue
+                result[layer_name] = row[0]
+
+        # Only valid configurations are cached. Values of combos come from catalog tables, which may change
+        # without changing the cache key, so configurations with combos are requested again in every session
+        form_configs.update(result)
+        cacheable = {layer_name: config for layer_name, config in form_configs.items()
+                     if config and 'body' in config and config.get('status') != 'Failed'
+                     and not self.has_combo_fields(config)}
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                with open(cache_path, 'w', encoding='utf-8') as cache_file:
+                    json.dump(cacheable, cache_file)
+            except OSError as e:
+                self.controller.log_warning(f"Error writing form config cache: {e}")
+
+        return form_configs
+
+
+    def get_form_config_bulk(self, layers_name):
+        """ Call gw_api_getinfofromid for all @layers_name in a single query. Return None if it fails """
+
+        bodies = []
+        for layer_name in layers_name:
+            feature = '"tableName":"' + str(layer_name) + '", "id":""'
+            bodies.append("{" + self.create_body(feature=feature) + "}")
+
+        sql = ("SELECT t.table_name, gw_api_getinfofromid(t.body::json) "
+               "FROM unnest(%s::text[], %s::text[]) AS t(table_name, body)")
+        sql = self.controller.dao.mogrify(sql, [list(layers_name), bodies])
+        rows = self.controller.dao.get_rows(sql, commit=True)
+        if rows is None:
+            self.controller.log_warning(f"Error getting form config in bulk: {self.controller.dao.last_error}")
+            return None
+
+        return {row[0]: row[1] for row in rows}
+
+
+    def has_combo_fields(self, config):
+        """ Check if form @config has combos, whose values are read from catalog tables """
+
+        fields = config['body'].get('data', {}).get('fields') or []
+        return any(field.get('widgettype') == 'combo' for field in fields)
+
+
+    def get_form_config_cache_path(self):
+        """ Get path of form config cache file. It depends on server, database, user, schema, version and
+        config_api_form_fields """
+
+        sql = ("SELECT md5(string_agg(t::text, '' ORDER BY t::text)), inet_server_addr(), inet_server_port(), "
+               "current_database(), current_user "
+               "FROM config_api_form_fields AS t")
+        row = self.controller.get_row(sql, commit=True)
+        if not row or row[0] is None:
+            return None
+
+        version = self.controller.get_project_version()
+        connection = f"{row[1]}|{row[2]}|{row[3]}|{row[4]}"
+        key = hashlib.md5(f"{connection}|{self.schema_name}|{version}|{row[0]}".encode('utf-8')).hexdigest()
+        cache_folder = os.path.join(os.path.expanduser("~"), self.controller.plugin_name, "cache")
+
+        return os.path.join(cache_folder, f"form_config_{key}.json")
+
+
     def set_column_visibility(self, layer, col_name, hidden):
         """ Hide selected fields according table config_api_form_fields.hidden """
 
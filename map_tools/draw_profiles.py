@@ -17,19 +17,24 @@ from qgis.PyQt.QtWidgets import QListWidget, QListWidgetItem, QLineEdit, QFileDi
 from qgis.PyQt.QtXml import QDomDocument
 
 from functools import partial
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 import matplotlib.pyplot as plt
 import math
 import os
 import json
 
 from .. import utils_giswater
+from ..dao.network_graph import get_pgrouting_graph
 from .parent import ParentMapTool
 from ..ui_manager import DrawProfile
 from ..ui_manager import LoadProfiles
 
 
 class NodeData:
+
+    __slots__ = ('start_point', 'top_elev', 'ymax', 'z1', 'z2', 'cat_geom', 'geom', 'slope', 'elev1', 'elev2',
+                 'y1', 'y2', 'node_id', 'elev', 'code', 'node_1', 'node_2')
+
     def __init__(self):
         self.start_point = None
         self.top_elev = None
@@ -62,6 +67,7 @@ class DrawProfiles(ParentMapTool):
         self.list_of_selected_nodes = []
         self.nodes = []
         self.rotation_vd_exist = False
+        self.default_values = None
 
 
     def activate(self):
@@ -598,114 +604,107 @@ class DrawProfiles(ParentMapTool):
             i += 1
 
 
+    def get_default_values(self):
+        """ Get default values ('<column>_vd') used when profile data is missing. They are read only once """
+
+        if self.default_values is not None:
+            return self.default_values
+
+        columns = ['top_elev', 'ymax', 'sys_elev', 'nodecat_id', 'code', 'geom1', 'z1', 'z2', 'cat_geom1',
+                   'sys_elev1', 'sys_elev2', 'y1', 'y2', 'slope']
+        # Values are cast one by one, so a non numeric value only affects its own parameter
+        sql = ("SELECT parameter, value "
+               "FROM config_param_system "
+               "WHERE parameter = ANY(%s)")
+        params = [[f"{column}_vd" for column in columns]]
+        rows = self.controller.get_rows(sql, params=params)
+        self.default_values = {}
+        if rows:
+            for row in rows:
+                try:
+                    value = Decimal(str(row[1]).strip()).quantize(Decimal('0.001'), rounding=ROUND_HALF_UP)
+                except (InvalidOperation, ValueError):
+                    value = None
+                self.default_values[row[0][:-3]] = value
+
+        return self.default_values
+
+
+    def get_values(self, row, columns, element_id, bad_nodes_id):
+        """ Get values of @columns from @row. Missing ones are replaced by its default value """
+
+        values = [row[column] for column in columns]
+        if None in values:
+            bad_nodes_id.append(element_id)
+            default_values = self.get_default_values()
+            values = [default_values.get(column) if value is None else value
+                      for column, value in zip(columns, values)]
+
+        return values
+
+
     def fill_memory(self):
-        """ Get parameters from data base. Fill self.nodes with parameters postgres """
+        """ Get parameters from data base. Fill self.nodes with parameters postgres.
+        All nodes (with its catalog) and all arcs are fetched in just two queries """
 
         self.nodes.clear()
         bad_nodes_id = []
-        
+
+        # Get data top_elev, y_max, elev, nodecat_id from v_edit_node and geom1 from cat_node
+        sql = ("SELECT node_id, sys_top_elev AS top_elev, sys_ymax AS ymax, sys_elev, nodecat_id, code, "
+               "cat_node.id AS cat_id, geom1 "
+               "FROM v_edit_node "
+               "LEFT JOIN cat_node ON cat_node.id = v_edit_node.nodecat_id "
+               "WHERE node_id = ANY(%s)")
+        rows = self.controller.get_rows(sql, params=[[str(node_id) for node_id in self.node_id]])
+        node_rows = {}
+        if rows:
+            node_rows = {str(row['node_id']): row for row in rows}
+
         # Get parameters and fill the nodes
         for i, node_id in enumerate(self.node_id):
-            
+
             # parameters : list of parameters for one node
             parameters = NodeData()
             parameters.start_point = self.start_point[i]
-            # Get data top_elev ,y_max, elev, nodecat_id from v_edit_node
-            # Change elev to sys_elev
-            sql = (f"SELECT sys_top_elev AS top_elev, sys_ymax AS ymax, sys_elev, nodecat_id, code "
-                   f"FROM v_edit_node "
-                   f"WHERE node_id = '{node_id}'")
-                # query for nodes
-                # SELECT elevation AS top_elev, depth AS ymax, top_elev-depth AS sys_elev, nodecat_id, code"
-
-            row = self.controller.get_row(sql)
-            columns = ['top_elev', 'ymax', 'sys_elev', 'nodecat_id', 'code']
-            if row:
-                if row[0] is None or row[1] is None or row[2] is None or row[3] is None or row[4] is None:
-                    bad_nodes_id.append(node_id)
-                # Check if we have all data for drawing
-                for x in range(len(columns)):
-                    if row[x] is None:
-                        sql = (f"SELECT value::decimal(12,3) "
-                               f"FROM config_param_system "
-                               f"WHERE parameter = '{columns[x]}_vd'")
-                        result = self.controller.get_row(sql)
-                        row[x] = result[0]
-
-                parameters.top_elev = row[0]
-                parameters.ymax = row[1]
-                parameters.elev = row[2]
-                nodecat_id = row[3]
-                parameters.code = row[4]
-                parameters.node_id = str(node_id)
-
-            # Get data z1, z2 ,cat_geom1 ,elev1 ,elev2 , y1 ,y2 ,slope from v_edit_arc
-            # Change to elevmax1 and elevmax2
-            # Geom1 from cat_node
-            sql = (f"SELECT geom1 "
-                   f"FROM cat_node "
-                   f"WHERE id = '{nodecat_id}'")
-            row = self.controller.get_row(sql)
-            columns = ['geom1']
+            row = node_rows.get(str(node_id))
             if row:
-                if row[0] is None:
-                    bad_nodes_id.append(node_id)
-                # Check if we have all data for drawing
-                for x in range(0, len(columns)):
-                    if row[x] is None:
-                        sql = (f"SELECT value::decimal(12,3) "
-                               f"FROM config_param_system "
-                               f"WHERE parameter = '{columns[x]}_vd'")
-                        result = self.controller.get_row(sql)
-                        row[x] = result[0]
-
-                parameters.geom = row[0]
+                columns = ['top_elev', 'ymax', 'sys_elev', 'nodecat_id', 'code']
+                values = self.get_values(row, columns, node_id, bad_nodes_id)
+                parameters.top_elev, parameters.ymax, parameters.elev = values[:3]
+                parameters.code = values[4]
+                if row['cat_id'] is not None:
+                    parameters.geom = self.get_values(row, ['geom1'], node_id, bad_nodes_id)[0]
 
             # Set node_id in nodes
             parameters.node_id = node_id
             self.nodes.append(parameters)
 
+        # Get data z1, z2, cat_geom1, elev1, elev2, y1, y2, slope from v_edit_arc
+        sql = ("SELECT arc_id, z1, z2, cat_geom1, sys_elev1, sys_elev2, sys_y1 AS y1, sys_y2 AS y2, slope, "
+               "node_1, node_2 "
+               "FROM v_edit_arc "
+               "WHERE arc_id = ANY(%s)")
+        rows = self.controller.get_rows(sql, params=[[str(arc_id) for arc_id in self.arc_id]])
+        arc_rows = {}
+        if rows:
+            arc_rows = {str(row['arc_id']): row for row in rows}
+
+        columns = ['z1', 'z2', 'cat_geom1', 'sys_elev1', 'sys_elev2', 'y1', 'y2', 'slope']
         n = 0
         for element_id in self.arc_id:
 
-            sql = (f"SELECT z1, z2, cat_geom1, sys_elev1, sys_elev2, sys_y1 AS y1, sys_y2 AS y2, slope, node_1, node_2 "
-                   f"FROM v_edit_arc "
-                   f"WHERE arc_id = '{element_id}'")
-            row = self.controller.get_row(sql)
-
-            # TODO:: v_nodes -> query for arcs
-            # SELECT 0 AS z1, 0 AS z2 , dnom/1000, NULL as  sys_elev1,  NULL as  sys_elev2,  NULL as  y1,  NULL as  y2,   NULL as  slope, node_1, node_2,
-
-            columns = ['z1','z2','cat_geom1', 'sys_elev1', 'sys_elev2', 'y1', 'y2', 'slope']
-
             # Check if self.nodes[n] is out of range
             if n >= len(self.nodes):
                 return
 
+            row = arc_rows.get(str(element_id))
             if row:
-                # Check if we have all data for drawing
-                if row[0] is None or row[1] is None or row[2] is None or row[3] is None or row[4] is None or \
-                   row[5] is None or row[6] is None or row[7] is None:
-                    bad_nodes_id.append(element_id)
-                for x in range(0, len(columns)):
-                    if row[x] is None:
-                        sql = (f"SELECT value::decimal(12,3) "
-                               f"FROM config_param_system "
-                               f"WHERE parameter = '{columns[x]}_vd'")
-                        result = self.controller.get_row(sql)
-                        row[x] = result[0]
-
-                self.nodes[n].z1 = row[0]
-                self.nodes[n].z2 = row[1]
-                self.nodes[n].cat_geom = row[2]
-                self.nodes[n].elev1 = row[3]
-                self.nodes[n].elev2 = row[4]
-                self.nodes[n].y1 = row[5]
-                self.nodes[n].y2 = row[6]
-                self.nodes[n].slope = row[7]
-                self.nodes[n].node_1 = row[8]
-                self.nodes[n].node_2 = row[9]
-                
+                node = self.nodes[n]
+                values = self.get_values(row, columns, element_id, bad_nodes_id)
+                node.z1, node.z2, node.cat_geom, node.elev1, node.elev2, node.y1, node.y2, node.slope = values
+                node.node_1 = row['node_1']
+                node.node_2 = row['node_2']
                 n += 1
 
         if not bad_nodes_id:
@@ -1282,9 +1281,36 @@ class DrawProfiles(ParentMapTool):
     
     def shortest_path(self, start_point, end_point):
         """ Calculating shortest path using dijkstra algorithm """
-        
+
         self.arc_id = []
         self.node_id = []
+
+        node_ids, arc_ids = self.get_path(start_point, end_point)
+        if node_ids is None:
+            return
+
+        self.node_id = node_ids
+        self.arc_id = arc_ids
+        self.select_path()
+
+
+    def get_path(self, start_point, end_point):
+        """ Get shortest path between nodes @start_point and @end_point
+        :return: Tuple (list of node_id, list of arc_id) or (None, None)
+        """
+
+        use_client_graph = self.settings.value('system_variables/use_client_graph', 'FALSE')
+        if str(use_client_graph).upper() == 'TRUE':
+            graph = get_pgrouting_graph(self.controller)
+            if graph is not None:
+                return graph.shortest_path(str(start_point), str(end_point))
+
+        return self.get_path_pgrouting(start_point, end_point)
+
+
+    def get_path_pgrouting(self, start_point, end_point):
+        """ Get shortest path between nodes @start_point and @end_point using function pgr_dijkstra """
+
         self.rnode_id = []
         self.rarc_id = []
 
@@ -1306,7 +1332,7 @@ class DrawProfiles(ParentMapTool):
 
         # Check starting and end points | wait to select end_point
         if rstart_point is None or rend_point is None:
-            return
+            return None, None
 
         # Clear list of arcs and nodes - preparing for new profile
         sql = (f"SELECT * FROM public.pgr_dijkstra('SELECT id::integer, source, target, cost"
@@ -1319,10 +1345,13 @@ class DrawProfiles(ParentMapTool):
         else:
             message = "You need to upgrade your version of pgRouting"
             self.controller.show_info(message)
-            return
+            return None, None
         sql += ")"
 
         rows = self.controller.get_rows(sql, commit=True)
+        if not rows:
+            return None, None
+
         for i in range(0, len(rows)):
             if self.version == '2':
                 self.rnode_id.append(str(rows[i][1]))
@@ -1332,99 +1361,68 @@ class DrawProfiles(ParentMapTool):
                 self.rarc_id.append(str(rows[i][3]))
 
         self.rarc_id.pop()
-        self.arc_id = []
-        self.node_id = []
 
-        for n in range(0, len(self.rarc_id)):
-            # convert arc_ids
-            sql = (f"SELECT arc_id "
-                   f"FROM v_anl_pgrouting_arc "
-                   f"WHERE id = '{self.rarc_id[n]}'")
-            row = self.controller.get_row(sql)
-            if row:
-                self.arc_id.append(str(row[0]))
+        # Convert arc_ids and node_ids
+        sql = "SELECT id::text, arc_id FROM v_anl_pgrouting_arc WHERE id::text = ANY(%s)"
+        rows = self.controller.get_rows(sql, params=[self.rarc_id])
+        arcs = {row[0]: str(row[1]) for row in rows} if rows else {}
+        sql = "SELECT rid::text, node_id FROM v_anl_pgrouting_node WHERE rid::text = ANY(%s)"
+        rows = self.controller.get_rows(sql, params=[self.rnode_id])
+        nodes = {row[0]: str(row[1]) for row in rows} if rows else {}
 
-        for m in range(0, len(self.rnode_id)):
-            # convert node_ids
-            sql = (f"SELECT node_id "
-                   f"FROM v_anl_pgrouting_node "
-                   f"WHERE rid = '{self.rnode_id[m]}'")
-            row = self.controller.get_row(sql)
-            if row:
-                self.node_id.append(str(row[0]))
+        arc_ids = [arcs[rid] for rid in self.rarc_id if rid in arcs]
+        node_ids = [nodes[rid] for rid in self.rnode_id if rid in nodes]
 
-        # Select arcs of the shortest path
-        for element_id in self.arc_id:
-            sql = (f"SELECT sys_type "
-                   f"FROM v_edit_arc "
-                   f"WHERE arc_id = '{element_id}'")
-            row = self.controller.get_row(sql)
-            if not row:
-                return
+        return node_ids, arc_ids
 
-            # Select feature of v_edit_man_@sys_type
-            sys_type = str(row[0].lower())
-            sql = f"SELECT parent_layer FROM cat_feature WHERE system_id = '{sys_type.upper()}' LIMIT 1"
-            row = self.controller.get_row(sql, log_sql=True, commit=True)
-            self.layer_feature = self.controller.get_layer_by_tablename(row[0])
-            aux = ""
-            for row in self.arc_id:
-                aux += "arc_id = '" + str(row) + "' OR "
-            aux = aux[:-3] + ""
 
-            # Select snapped features
-            selection = self.layer_feature.getFeatures(QgsFeatureRequest().setFilterExpression(aux))
-            self.layer_feature.selectByIds([a.id() for a in selection])
+    def get_parent_layers(self, feature_type, feature_ids):
+        """ Get layers (cat_feature.parent_layer) of features @feature_ids of @feature_type """
 
-        # Select nodes of shortest path on layers v_edit_man_|feature
-        for element_id in self.node_id:
-            sql = (f"SELECT sys_type "
-                   f"FROM v_edit_node "
-                   f"WHERE node_id = '{element_id}'")
-            row = self.controller.get_row(sql)
-            if not row:
-                return
+        sql = (f"SELECT DISTINCT ON (system_id) parent_layer "
+               f"FROM cat_feature "
+               f"WHERE system_id IN "
+               f"(SELECT DISTINCT upper(sys_type) FROM v_edit_{feature_type} WHERE {feature_type}_id = ANY(%s))")
+        rows = self.controller.get_rows(sql, log_sql=True, commit=True, params=[feature_ids])
+        if not rows:
+            return []
 
-            # Select feature of v_edit_man_@sys_type
-            sys_type = str(row[0].lower())
-            sql = f"SELECT parent_layer FROM cat_feature WHERE system_id = '{sys_type.upper()}' LIMIT 1"
-            row = self.controller.get_row(sql, log_sql=True, commit=True)
-            self.layer_feature = self.controller.get_layer_by_tablename(row[0])
-            aux = ""
-            for row in self.node_id:
-                aux += f"node_id = '{row}' OR "
-            aux = aux[:-3] + ""
+        layers = []
+        for row in rows:
+            layer = self.controller.get_layer_by_tablename(row[0])
+            if layer and layer not in layers:
+                layers.append(layer)
 
-            # Select snapped features
-            selection = self.layer_feature.getFeatures(QgsFeatureRequest().setFilterExpression(aux))
-            self.layer_feature.selectByIds([a.id() for a in selection])
+        return layers
+
+
+    def select_path(self):
+        """ Select arcs and nodes of current path, zoom to them and fill list of arcs """
+
+        # Select arcs of the shortest path on layers v_edit_man_|feature
+        for self.layer_feature in self.get_parent_layers('arc', self.arc_id):
+            self.controller.select_by_business_ids(self.layer_feature, self.arc_id, 'arc_id')
+
+        # Select nodes of shortest path on layers v_edit_man_|feature
+        for self.layer_feature in self.get_parent_layers('node', self.node_id):
+            self.controller.select_by_business_ids(self.layer_feature, self.node_id, 'node_id')
 
         # Select nodes of shortest path on v_edit_arc for ZOOM SELECTION
-        expr_filter = '"arc_id" IN ('
-        for i in range(len(self.arc_id)):
-            expr_filter += f"'{self.arc_id[i]}', "
-        expr_filter = expr_filter[:-2] + ")"
-        (is_valid, expr) = self.check_expression(expr_filter, True)   #@UnusedVariable
-        if not is_valid:
+        self.id_list = self.controller.select_by_business_ids(self.layer_arc, self.arc_id, 'arc_id')
+        if self.id_list is None:
             return
 
-        # Build a list of feature id's from the previous result
-        # Select features with these id's
-        it = self.layer_arc.getFeatures(QgsFeatureRequest(expr))
-        self.id_list = [i.id() for i in it]
-        self.layer_arc.selectByIds(self.id_list)
-
         # Center shortest path in canvas - ZOOM SELECTION
         self.canvas.zoomToSelected(self.layer_arc)
 
         # Clear list
-        list_arc = []
+        self.list_arc = []
         self.dlg_draw_profile.tbl_list_arc.clear()
 
         for i in range(len(self.arc_id)):
             item_arc = QListWidgetItem(self.arc_id[i])
             self.dlg_draw_profile.tbl_list_arc.addItem(item_arc)
-            list_arc.append(self.arc_id[i])
+            self.list_arc.append(self.arc_id[i])
 
 
     def execute_profiles(self):
@@ -1624,144 +1622,14 @@ class DrawProfiles(ParentMapTool):
             # return
             start_point = list_points[i]
             end_point = list_points[i+1]
-
-            self.rnode_id = []
-            self.rarc_id = []
-
-            rstart_point = None
-            sql = (f"SELECT rid "
-                   f"FROM v_anl_pgrouting_node "
-                   f"WHERE node_id = '{start_point}'")
-            row = self.controller.get_row(sql)
-            if row:
-                rstart_point = int(row[0])
-
-            rend_point = None
-            sql = (f"SELECT rid "
-                   f"FROM v_anl_pgrouting_node "
-                   f"WHERE node_id = '{end_point}'")
-            row = self.controller.get_row(sql)
-            if row:
-                rend_point = int(row[0])
-
-            # Check starting and end points | wait to select end_point
-            if rstart_point is None or rend_point is None:
-                return
-
-            # Clear list of arcs and nodes - preparing for new profile
-            sql = (f"SELECT * FROM public.pgr_dijkstra('SELECT id::integer, source, target, cost "
-                   f"FROM v_anl_pgrouting_arc', {rstart_point}, {rend_point}, false")
-            if self.version == '2':
-                sql += ", false"
-            elif self.version == '3':
-                pass
-            else:
-                message = "You need to upgrade your version of pgRouting"
-                self.controller.show_info(message)
+            node_ids, arc_ids = self.get_path(start_point, end_point)
+            if node_ids is None:
                 return
-            sql += ")"
-
-            rows = self.controller.get_rows(sql, commit=True)
-            for i in range(0, len(rows)):
-                if self.version == '2':
-                    self.rnode_id.append(str(rows[i][1]))
-                    self.rarc_id.append(str(rows[i][2]))
-                elif self.version == '3':
-                    self.rnode_id.append(str(rows[i][2]))
-                    self.rarc_id.append(str(rows[i][3]))
-
-            self.rarc_id.pop()
-
-            for n in range(0, len(self.rarc_id)):
-                # Convert arc_ids
-                sql = (f"SELECT arc_id "
-                       f"FROM v_anl_pgrouting_arc "
-                       f"WHERE id = '{self.rarc_id[n]}'")
-                row = self.controller.get_row(sql)
-                if row:
-                    self.arc_id.append(str(row[0]))
-
-            for m in range(0, len(self.rnode_id)):
-                # Convert node_ids
-                sql = (f"SELECT node_id "
-                       f"FROM v_anl_pgrouting_node "
-                       f"WHERE rid = '{self.rnode_id[m]}'")
-                row = self.controller.get_row(sql)
-                if row:
-                    self.node_id.append(str(row[0]))
-
-            # Select arcs of the shortest path
-            for element_id in self.arc_id:
-                sql = (f"SELECT sys_type "
-                       f"FROM v_edit_arc "
-                       f"WHERE arc_id = '{element_id}'")
-                row = self.controller.get_row(sql)
-                if not row:
-                    return
-
-                # Select feature of v_edit_man_@sys_type
-                sys_type = str(row[0].lower())
-                sql = f"SELECT parent_layer FROM cat_feature WHERE system_id = '{sys_type.upper()}' LIMIT 1"
-                row = self.controller.get_row(sql, log_sql=True, commit=True)
-                self.layer_feature = self.controller.get_layer_by_tablename(row[0])
-                aux = ""
-                for row in self.arc_id:
-                    aux += f"arc_id = '{row}' OR "
-                aux = aux[:-3] + ""
-
-                # Select snapped features
-                selection = self.layer_feature.getFeatures(QgsFeatureRequest().setFilterExpression(aux))
-                self.layer_feature.selectByIds([a.id() for a in selection])
-
-            # Select nodes of shortest path on layers v_edit_man_|feature
-            for element_id in self.node_id:
-                sql = (f"SELECT sys_type "
-                       f"FROM v_edit_node "
-                       f"WHERE node_id = '{element_id}'")
-                row = self.controller.get_row(sql)
-                if not row:
-                    return
-
-                # Select feature of v_edit_man_@sys_type
-                sys_type = str(row[0].lower())
-                sql = f"SELECT parent_layer FROM cat_feature WHERE system_id = '{sys_type.upper()}' LIMIT 1"
-                row = self.controller.get_row(sql, log_sql=True, commit=True)
-                self.layer_feature = self.controller.get_layer_by_tablename(row[0])
-                aux = ""
-                for row in self.node_id:
-                    aux += f"node_id = '{row}' OR "
-                aux = aux[:-3] + ""
-
-                # Select snapped features
-                selection = self.layer_feature.getFeatures(QgsFeatureRequest().setFilterExpression(aux))
-                self.layer_feature.selectByIds([a.id() for a in selection])
-
-            # Select nodes of shortest path on v_edit_arc for ZOOM SELECTION
-            expr_filter = '"arc_id" IN ('
-            for i in range(len(self.arc_id)):
-                expr_filter += f"'{self.arc_id[i]}', "
-            expr_filter = expr_filter[:-2] + ")"
-            (is_valid, expr) = self.check_expression(expr_filter, True)   #@UnusedVariable
-            if not is_valid:
-                return
-
-            # Build a list of feature id's from the previous result
-            # Select features with these id's
-            it = self.layer_arc.getFeatures(QgsFeatureRequest(expr))
-            self.id_list = [i.id() for i in it]
-            self.layer_arc.selectByIds(self.id_list)
-
-            # Center shortest path in canvas - ZOOM SELECTION
-            self.canvas.zoomToSelected(self.layer_arc)
 
-            # Clear list
-            self.list_arc = []
-            self.dlg_draw_profile.tbl_list_arc.clear()
+            self.node_id.extend(node_ids)
+            self.arc_id.extend(arc_ids)
 
-            for i in range(len(self.arc_id)):
-                item_arc = QListWidgetItem(self.arc_id[i])
-                self.dlg_draw_profile.tbl_list_arc.addItem(item_arc)
-                self.list_arc.append(self.arc_id[i])
+        self.select_path()
 
 
     def exec_path(self):
@@ -17,10 +17,10 @@
 
 """
 # -*- coding: utf-8 -*-
-from qgis.core import QgsFeatureRequest, QgsExpression
 from qgis.PyQt.QtCore import Qt
 
 from .parent import ParentMapTool
+from ..dao.network_graph import get_flow_graph
 
 
 class FlowTraceFlowExitMapTool(ParentMapTool):
@@ -62,16 +62,11 @@ class FlowTraceFlowExitMapTool(ParentMapTool):
         
         if event.button() == Qt.LeftButton and self.current_layer:
 
-            # Execute SQL function
-            if self.index_action == '56':
-                function_name = "gw_fct_flow_trace"
-            else:
-                function_name = "gw_fct_flow_exit"
-                
             elem_id = self.snapped_feat.attribute('node_id')
-            sql = f"SELECT {function_name} ('{elem_id}');"
-            result = self.controller.execute_sql(sql)
-            if result:
+            use_client_flow_trace = self.settings.value('system_variables/use_client_flow_trace', 'FALSE')
+            if str(use_client_flow_trace).upper() == 'TRUE' and self.select_client_trace(elem_id):
+                pass
+            elif self.execute_flow_function(elem_id):
                 # Get 'arc' and 'node' list and select them
                 self.select_features('arc')
                 self.select_features('node')
@@ -83,6 +78,77 @@ class FlowTraceFlowExitMapTool(ParentMapTool):
             self.set_action_pan()
 
 
+    def execute_flow_function(self, elem_id):
+        """ Execute SQL function of flow trace (upstream) or flow exit (downstream) from node @elem_id.
+        Results are saved into tables 'anl_flow_arc' and 'anl_flow_node' """
+
+        if self.index_action == '56':
+            function_name = "gw_fct_flow_trace"
+        else:
+            function_name = "gw_fct_flow_exit"
+
+        sql = f"SELECT {function_name} ('{elem_id}');"
+        return self.controller.execute_sql(sql)
+
+
+    def get_client_trace(self, elem_id):
+        """ Compute flow trace (upstream) or flow exit (downstream) from node @elem_id with the in-memory graph
+        :return: Tuple (list of node ids, list of arc ids) or (None, None) if graph is not available
+        """
+
+        graph = get_flow_graph(self.controller)
+        if graph is None:
+            return None, None
+
+        nodes, arcs = graph.traverse(str(elem_id), reverse=self.index_action == '56')
+        if nodes is None:
+            # Isolated node: not connected to any arc
+            return [str(elem_id)], []
+
+        return nodes, arcs
+
+
+    def select_client_trace(self, elem_id):
+        """ Select arcs and nodes of the flow computed in the client. Return False if graph is not available """
+
+        nodes, arcs = self.get_client_trace(elem_id)
+        if nodes is None:
+            return False
+
+        layer = self.controller.get_layer_by_tablename('v_edit_arc')
+        if layer:
+            self.controller.select_by_business_ids(layer, arcs, 'arc_id')
+        layer = self.controller.get_layer_by_tablename('v_edit_node')
+        if layer:
+            self.controller.select_by_business_ids(layer, nodes, 'node_id')
+
+        return True
+
+
+    def compare_flow_trace(self, elem_id):
+        """ Compare flow computed in the client with the one computed by the database function.
+        Useful to check the in-memory graph, ie: from QGIS Python console
+        :return: Dict with arcs and nodes found only in 'client' or only in 'database'
+        """
+
+        nodes, arcs = self.get_client_trace(elem_id)
+        if nodes is None or not self.execute_flow_function(elem_id):
+            return None
+
+        context = 'Flow trace' if self.index_action == '56' else 'Flow exit'
+        result = {}
+        for elem_type, client_ids in (('arc', arcs), ('node', nodes)):
+            sql = (f"SELECT {elem_type}_id FROM anl_flow_{elem_type}"
+                   f" WHERE context = '{context}'")
+            rows = self.controller.get_rows(sql, log_info=False)
+            db_ids = {str(row[0]) for row in rows} if rows else set()
+            client_ids = set(client_ids)
+            result[elem_type] = {'client': sorted(client_ids - db_ids), 'database': sorted(db_ids - client_ids)}
+
+        self.controller.log_info(f"Flow trace differences from node {elem_id}: {result}")
+        return result
+
+
     def select_features(self, elem_type):
  
         if self.index_action == '56':
@@ -99,28 +165,12 @@ class FlowTraceFlowExitMapTool(ParentMapTool):
         if not rows:
             return
             
-        # Build an expression to select them
-        aux = f'"{elem_type}_id" IN ('
-        for row in rows:
-            aux += f"'{row[1]}', "
-        aux = aux[:-2] + ")"
-
-        # Get a featureIterator from this expression
-        expr = QgsExpression(aux)
-        if expr.hasParserError():
-            message = "Expression Error"
-            self.controller.show_warning(message, parameter=expr.parserErrorString())
-            return
-
         # Select features with these id's
         tablename = f'v_edit_{elem_type}'
         layer = self.controller.get_layer_by_tablename(tablename)
         if layer:
-            it = layer.getFeatures(QgsFeatureRequest(expr))
-            # Build a list of feature id's from the previous result
-            id_list = [i.id() for i in it]
-            # Select features with these id's
-            layer.selectByIds(id_list)
+            ids = [row[1] for row in rows]
+            self.controller.select_by_business_ids(layer, ids, f"{elem_type}_id")
 
 
     def activate(self):
@@ -528,6 +528,11 @@ class ReadsqlShowInfo(GwMainWindow, FORM_CLASS):
     pass
 
 
+FORM_CLASS = get_ui_class('readsql_log.ui')
+class ReadsqlLog(GwDialog, FORM_CLASS):
+    pass
+
+
 FORM_CLASS = get_ui_class('sections.ui')
 class Sections(GwDialog, FORM_CLASS):
     pass